@@ -56,7 +56,8 @@ from logging_config import handle_exceptions
 from database import (
     status,
     get_monitor_object,
-    check_repos_for_changes
+    check_repos_for_changes,
+    redis_stats
 )
 
 from config import AntBSConfig
@@ -131,6 +132,19 @@ def create_app():
             if '/rq' in request.path and not get_current_user().is_authenticated:
                 abort(403)
 
+        @current_app.before_request
+        def start_collecting_redis_stats():
+            redis_stats.start()
+
+        @current_app.after_request
+        def add_redis_stats_header(response):
+            stats = redis_stats.stop()
+
+            if stats is not None:
+                response.headers['X-Redis-Stats'] = stats.header()
+
+            return response
+
         @current_app.template_filter()
         def tpl_name(s):
             """ Extracts and returns the template name from a url path string. """
@@ -57,6 +57,15 @@ prepare_makepkg_and_pacman_configs() {
 	sed -i 's|unknown|x86_64|g' "${_MAKEPKG_CONF}"
 	echo 'PKGDEST=/result' >> "${_MAKEPKG_CONF}"
 
+	if [[ -d /srcdest ]]; then
+		echo 'SRCDEST=/srcdest' >> "${_MAKEPKG_CONF}"
+	fi
+
+	if [[ -d /ccache ]] && [[ -x /usr/bin/ccache ]]; then
+		sed -i 's|!ccache|ccache|g' "${_MAKEPKG_CONF}"
+		echo -e "cache_dir = /ccache\nmax_size = ${_CCACHE_MAXSIZE:-5G}" > /etc/ccache.conf
+	fi
+
 	export PACKAGER="Antergos Build Server <dev@antergos.com>"
 	echo "GPGKEY=24B445614FAC071891EDCE49CDBD406AA1AA7A1D" >> "${_MAKEPKG_CONF}"
 	sed -i 's|#PACKAGER="John Doe <john@doe.com>"|PACKAGER="Antergos Build Server <dev@antergos.com>"|g' "${_MAKEPKG_CONF}"
@@ -185,6 +194,14 @@ check_pkg_sums() {
 }
 
 
+_output_ccache_stats() {
+	[[ -x /usr/bin/ccache ]] && [[ -d /ccache ]] || return 0
+
+	ccache --print-stats > /result/ccache-stats 2>/dev/null
+	chmod a+rw /result/ccache-stats
+}
+
+
 _output_pkgbuild_generates() {
 	create_pkgbuild_generates_array
 	echo "${_generates[*]}" >> /result/generates
@@ -197,6 +214,8 @@ try_build() {
 	chmod 777 /pkg
 	mkdir -p /tmp/antbs
 	chown -R antbs:users /pkg /tmp/antbs
+	[[ -d /ccache ]] && chown -R antbs:users /ccache && ccache -z > /dev/null 2>&1
+	[[ -d /srcdest ]] && chown -R antbs:users /srcdest
 
 	cd /pkg && _log 'UPDATING SOURCE CHECKSUMS';
 
@@ -227,7 +246,9 @@ build_package() {
 		rm -rf /pkg/cnchi
 	fi
 
-	{ try_build 2>&1 && return 0; }
+	{ try_build 2>&1 && _output_ccache_stats && return 0; }
+
+	_output_ccache_stats
 
 	return 1;
 }
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# build_node_worker.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Build Node Worker: Registers this host as a build node (see `database.build_node`) and runs
+one RQ worker per build slot on the build queue for its architecture. Each worker's build
+containers are pinned to their own share of the host's cores.
+
+Several nodes can run on the same host (with different `--node-id`s), eg. to try out
+distributed builds without more hardware:
+
+    python build_node_worker.py --node-id local-1 --slots 2
+    python build_node_worker.py --node-id local-2 --slots 2
+
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+from rq import (
+    Connection,
+    Worker
+)
+
+from database import (
+    db,
+    status,
+    get_node_queue,
+    BuildLog,
+    BuildNode
+)
+
+from database.build_node import HEARTBEAT_INTERVAL
+from utils import get_cpuset
+
+logger = status.logger
+
+
+def get_memory_mb():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError):
+        return 0
+
+
+def run_worker(arch, cpuset):
+    os.environ['ANTBS_BUILD_CPUSET'] = cpuset
+
+    # Logs are served by the host that runs transactions, which can't read archives that
+    # are written here. Store them in redis instead (see `BuildLog.writer()`).
+    BuildLog.archive_dir = ''
+
+    with Connection(db):
+        Worker([get_node_queue(arch)]).work()
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    memory_mb = get_memory_mb()
+
+    parser = argparse.ArgumentParser(description='Run builds for AntBS transactions.')
+    parser.add_argument('--node-id', default=socket.gethostname(),
+                        help='Unique id for this node (default: hostname).')
+    parser.add_argument('--slots', type=int, default=max(min(cores // 3, memory_mb // 5120), 1),
+                        help='Number of builds to run at the same time.')
+    parser.add_argument('--arch', default='x86_64')
+    parser.add_argument('--base-path', default='/var/tmp/antbs',
+                        help='Where build directories are created.')
+    parser.add_argument('--artifact-host', default='',
+                        help='[user@]host to ship build artifacts to with rsync '
+                             '(default: this host is the one that runs transactions).')
+    args = parser.parse_args()
+
+    # Inherited by the workers, see `transaction.build_on_node()`.
+    os.environ['ANTBS_BUILD_NODE_ID'] = args.node_id
+
+    node = BuildNode(args.node_id)
+    node.register(
+        socket.gethostname(), args.arch, cores, memory_mb, args.slots, args.base_path,
+        args.artifact_host
+    )
+
+    workers = [
+        multiprocessing.Process(
+            target=run_worker, args=(args.arch, get_cpuset(slot, args.slots, cores))
+        )
+        for slot in range(args.slots)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    logger.info('Build node %s started with %s slots.', args.node_id, args.slots)
+
+    try:
+        while all(worker.is_alive() for worker in workers):
+            node.heartbeat()
+            time.sleep(HEARTBEAT_INTERVAL)
+    finally:
+        node.unregister()
+
+        for worker in workers:
+            if worker.is_alive():
+                # RQ workers finish their current job before exiting.
+                os.kill(worker.pid, signal.SIGTERM)
+
+        for worker in workers:
+            worker.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -35,13 +35,27 @@ from .base_objects import (
     RedisHashMCS,
     RedisSingleton,
     Singleton,
-    bool_string_helper
+    bool_string_helper,
+    child_objects,
+    redis_stats,
+    load_many,
+    load_snapshots
 )
 
-from .status import status, get_timeline_object
-from .build import get_build_object
-from .package import get_pkg_object
-from .repo import get_repo_object
+from .status import status, get_timeline_object, TimelineEvent
+from .build import get_build_object, rebuild_build_index, Build
+from .build_log import BuildLog
+from .build_index import (
+    build_index_is_ready,
+    builds_between,
+    builds_for,
+    count_builds_between,
+    search_builds
+)
+from .package import get_pkg_object, Package
+from .repo import get_repo_object, request_repo_updates
+from .build_node import get_build_capacity, get_build_nodes, get_node_queue, BuildNode
 from .transaction import get_trans_object
 from .monitor import get_monitor_object, check_repos_for_changes
 from .installation import AntergosInstallation, AntergosInstallationUser
+from .migrations import run_migrations, schedule_migrations
@@ -0,0 +1,399 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# alpm_db.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+A native writer for pacman repo databases (what `repo-add` and `repo-remove` do). The
+database (`<repo>.db.tar.gz`) and the files database (`<repo>.files.tar.gz`) are loaded into
+memory once, any number of packages can then be added or removed and both are written back
+(atomically) in one go.
+
+"""
+
+import base64
+import hashlib
+import os
+import tarfile
+import time
+from collections import OrderedDict
+from io import BytesIO
+
+# .PKGINFO keys that can appear more than once -> desc fields.
+PKGINFO_LISTS = OrderedDict([
+    ('group', 'GROUPS'),
+    ('license', 'LICENSE'),
+    ('replaces', 'REPLACES'),
+    ('conflict', 'CONFLICTS'),
+    ('provides', 'PROVIDES'),
+    ('depend', 'DEPENDS'),
+    ('optdepend', 'OPTDEPENDS'),
+    ('makedepend', 'MAKEDEPENDS'),
+    ('checkdepend', 'CHECKDEPENDS'),
+])
+MAX_SIG_SIZE = 16384
+
+
+def _format_entry(field, *values):
+    values = [value for value in values if value]
+
+    if not values:
+        return ''
+
+    return '%{0}%\n{1}\n\n'.format(field, '\n'.join(values))
+
+
+def get_desc_field(desc, field):
+    """ Get the first value of a field from a desc file's contents (`''` if it's missing). """
+    lines = desc.split('\n')
+    marker = '%{0}%'.format(field)
+
+    if marker in lines and lines.index(marker) + 1 < len(lines):
+        return lines[lines.index(marker) + 1]
+
+    return ''
+
+
+def _hash_file(path):
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+
+    with open(path, 'rb') as pkg_file:
+        for block in iter(lambda: pkg_file.read(1024 * 1024), b''):
+            md5.update(block)
+            sha256.update(block)
+
+    return md5.hexdigest(), sha256.hexdigest()
+
+
+def iter_db_entries(path, member_names=None):
+    """
+    Iterate over the files in a repo database in a single streaming pass (members are never
+    all loaded at once).
+
+    Args:
+        path (str):          The database's path.
+        member_names (list): Only read these files (eg. `['desc']`).
+
+    Yields:
+        tuple: `(dirname, member_name, content)` eg. `('foo-1.0-1', 'desc', '%FILENAME%...')`.
+
+    """
+    with tarfile.open(path, 'r|*') as alpm_db:
+        for member in alpm_db:
+            if not member.isfile() or '/' not in member.name:
+                continue
+
+            dirname, member_name = member.name.split('/', 1)
+
+            if member_names is not None and member_name not in member_names:
+                continue
+
+            content = alpm_db.extractfile(member).read().decode('UTF-8')
+
+            yield dirname, member_name, content
+
+
+def read_package(pkg_path):
+    """
+    Read the metadata and file list of a package in a single pass over its archive.
+
+    Args:
+        pkg_path (str): The package file's path.
+
+    Returns:
+        tuple: `(pkginfo, files)` where `pkginfo` maps each .PKGINFO key to a list of values.
+
+    Raises:
+        ValueError: If the file isn't a package.
+
+    """
+    pkginfo = OrderedDict()
+    files = []
+
+    try:
+        with tarfile.open(pkg_path, 'r|*') as pkg:
+            for member in pkg:
+                if '.PKGINFO' == member.name:
+                    for line in pkg.extractfile(member).read().decode('UTF-8').split('\n'):
+                        if not line.strip() or line.startswith('#') or '=' not in line:
+                            continue
+
+                        key, value = line.split('=', 1)
+                        pkginfo.setdefault(key.strip(), []).append(' '.join(value.split()))
+
+                elif not member.name.startswith('.'):
+                    files.append(member.name + '/' if member.isdir() else member.name)
+
+    except tarfile.TarError as err:
+        raise ValueError('{0} is not a package file: {1}'.format(pkg_path, err))
+
+    if not pkginfo.get('pkgname') or not pkginfo.get('pkgver'):
+        raise ValueError('Invalid package file: {0}'.format(pkg_path))
+
+    return pkginfo, files
+
+
+class AlpmDatabase:
+    """
+    A pacman repo database. Changes are only saved by `write()`.
+
+    Args:
+        repo_dir (str): The repo's directory.
+        name (str):     The repo's name.
+
+    Attributes:
+        db_path (str):     Path of the database (`<name>.db.tar.gz`).
+        files_path (str):  Path of the files database (`<name>.files.tar.gz`).
+        entries (dict):    Package name -> `dict(dirname, desc, files)`.
+
+    Raises:
+        RuntimeError: If the database is locked by someone else (`repo-add`).
+
+    """
+
+    def __init__(self, repo_dir, name):
+        self.repo_dir = repo_dir
+        self.name = name
+        self.db_path = os.path.join(repo_dir, '{0}.db.tar.gz'.format(name))
+        self.files_path = os.path.join(repo_dir, '{0}.files.tar.gz'.format(name))
+        self.lock_path = '{0}.lck'.format(self.db_path)
+        self.entries = {}
+        self.changed = False
+
+        self._load()
+
+    def _load(self):
+        files = {}
+
+        if os.path.exists(self.files_path):
+            for dirname, _, content in iter_db_entries(self.files_path, ['files']):
+                files[dirname] = content
+
+        if not os.path.exists(self.db_path):
+            return
+
+        for dirname, _, content in iter_db_entries(self.db_path, ['desc']):
+            pkgname = get_desc_field(content, 'NAME') or dirname.rsplit('-', 2)[0]
+
+            self.entries[pkgname] = dict(dirname=dirname, desc=content, files=files.get(dirname))
+
+    def __contains__(self, pkgname):
+        return pkgname in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_filename(self, pkgname):
+        """ Get the file name of the package that is in the database for `pkgname`. """
+        return get_desc_field(self.entries[pkgname]['desc'], 'FILENAME') if pkgname in self else ''
+
+    def add(self, pkg_path, remove_existing=True):
+        """
+        Add a package (replacing the package with the same name, if any).
+
+        Args:
+            pkg_path (str):         The package file's path.
+            remove_existing (bool): Remove the file (and signature) of the replaced package.
+
+        Returns:
+            str: The name of the package that was added.
+
+        Raises:
+            ValueError: If the file isn't a package or its signature is invalid.
+
+        """
+        pkginfo, files = read_package(pkg_path)
+        pkgname = pkginfo['pkgname'][0]
+        pkgver = pkginfo['pkgver'][0]
+        sig_path = '{0}.sig'.format(pkg_path)
+        pgpsig = ''
+
+        if os.path.exists(sig_path):
+            with open(sig_path, 'rb') as sig_file:
+                sig = sig_file.read()
+
+            if b'BEGIN PGP SIGNATURE' in sig:
+                msg = 'Cannot use armored signatures for packages: {0}'
+                raise ValueError(msg.format(sig_path))
+
+            if len(sig) > MAX_SIG_SIZE:
+                raise ValueError('Invalid package signature file: {0}'.format(sig_path))
+
+            pgpsig = base64.b64encode(sig).decode('ascii')
+
+        md5sum, sha256sum = _hash_file(pkg_path)
+        single = lambda key: pkginfo.get(key, [''])[0]
+
+        desc = ''.join([
+            _format_entry('FILENAME', os.path.basename(pkg_path)),
+            _format_entry('NAME', pkgname),
+            _format_entry('BASE', single('pkgbase')),
+            _format_entry('VERSION', pkgver),
+            _format_entry('DESC', single('pkgdesc')),
+            _format_entry('GROUPS', *pkginfo.get('group', [])),
+            _format_entry('CSIZE', str(os.stat(pkg_path).st_size)),
+            _format_entry('ISIZE', single('size')),
+            _format_entry('MD5SUM', md5sum),
+            _format_entry('SHA256SUM', sha256sum),
+            _format_entry('PGPSIG', pgpsig),
+            _format_entry('URL', single('url')),
+            _format_entry('LICENSE', *pkginfo.get('license', [])),
+            _format_entry('ARCH', single('arch')),
+            _format_entry('BUILDDATE', single('builddate')),
+            _format_entry('PACKAGER', single('packager')),
+        ] + [
+            _format_entry(field, *pkginfo.get(key, []))
+            for key, field in PKGINFO_LISTS.items() if key not in ['group', 'license']
+        ])
+
+        old_filename = self.get_filename(pkgname)
+
+        self.entries[pkgname] = dict(
+            dirname='{0}-{1}'.format(pkgname, pkgver),
+            desc=desc,
+            files='%FILES%\n{0}\n'.format('\n'.join(files)) if files else '%FILES%\n'
+        )
+        self.changed = True
+
+        if remove_existing and old_filename and old_filename != os.path.basename(pkg_path):
+            for path in [old_filename, '{0}.sig'.format(old_filename)]:
+                path = os.path.join(os.path.dirname(pkg_path), path)
+
+                if os.path.exists(path):
+                    os.remove(path)
+
+        return pkgname
+
+    def remove(self, pkgname):
+        """
+        Remove a package.
+
+        Returns:
+            bool: `True` if the package was in the database, `False` otherwise.
+
+        """
+        if pkgname not in self:
+            return False
+
+        del self.entries[pkgname]
+        self.changed = True
+
+        return True
+
+    def _write_db(self, path, include_files):
+        now = int(time.time())
+
+        with tarfile.open(path, 'w:gz') as alpm_db:
+            for pkgname in sorted(self.entries, key=lambda name: self.entries[name]['dirname']):
+                entry = self.entries[pkgname]
+                contents = [('desc', entry['desc'])]
+
+                if include_files and entry['files'] is not None:
+                    contents.append(('files', entry['files']))
+
+                dir_info = tarfile.TarInfo(entry['dirname'])
+                dir_info.type = tarfile.DIRTYPE
+                dir_info.mode = 0o755
+                dir_info.mtime = now
+
+                alpm_db.addfile(dir_info)
+
+                for member_name, content in contents:
+                    data = content.encode('UTF-8')
+                    info = tarfile.TarInfo('{0}/{1}'.format(entry['dirname'], member_name))
+                    info.size = len(data)
+                    info.mode = 0o644
+                    info.mtime = now
+
+                    alpm_db.addfile(info, BytesIO(data))
+
+    @staticmethod
+    def _rotate(tmp_path, path):
+        # Like repo-add, keep the previous version as `.old` and link `<name>.db` to the new one.
+        old_path = '{0}.old'.format(path)
+        link_path = path[:-len('.tar.gz')]
+
+        for ext in ['', '.sig']:
+            if os.path.exists(old_path + ext):
+                os.remove(old_path + ext)
+
+            if os.path.exists(path + ext):
+                os.link(path + ext, old_path + ext)
+
+            if os.path.exists(tmp_path + ext):
+                os.replace(tmp_path + ext, path + ext)
+            elif os.path.exists(path + ext):
+                # The new version isn't signed, don't leave the old signature next to it.
+                os.remove(path + ext)
+
+            if os.path.lexists(link_path + ext):
+                os.remove(link_path + ext)
+
+            if os.path.exists(path + ext):
+                os.symlink(os.path.basename(path + ext), link_path + ext)
+
+    def write(self, sign=None):
+        """
+        Write the database and the files database. Each one is written to a temporary file
+        next to it that is then moved into place (the previous version is kept as `.old`).
+
+        Args:
+            sign (callable): Called with the paths of the new files to create detached
+                             signatures for them (eg. `utils.batch_sign`). Must return a bool.
+
+        Raises:
+            RuntimeError: If the database is locked or signing fails.
+
+        """
+        try:
+            lock_fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise RuntimeError('{0} is locked ({1} exists).'.format(self.db_path, self.lock_path))
+
+        paths = [(self.db_path, True), (self.files_path, False)]
+        tmp_paths = [os.path.join(self.repo_dir, '.tmp.' + os.path.basename(p)) for p, _ in paths]
+
+        try:
+            for (path, is_db), tmp_path in zip(paths, tmp_paths):
+                self._write_db(tmp_path, include_files=not is_db)
+
+            if sign is not None and not sign(tmp_paths):
+                raise RuntimeError('Unable to sign {0}.'.format(self.db_path))
+
+            for (path, _), tmp_path in zip(paths, tmp_paths):
+                self._rotate(tmp_path, path)
+
+            self.changed = False
+        finally:
+            for tmp_path in tmp_paths:
+                for ext in ['', '.sig']:
+                    if os.path.exists(tmp_path + ext):
+                        os.remove(tmp_path + ext)
+
+            os.close(lock_fd)
+            os.remove(self.lock_path)
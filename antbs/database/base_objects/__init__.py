@@ -28,14 +28,25 @@
 
 from utils.utility_classes import Singleton
 
+from ._redis_stats import redis_stats, RedisStats
+
 from ._redis_data import (
     db,
     RedisDataHashField,
     RedisDataRedisObject,
-    bool_string_helper
+    bool_string_helper,
+    child_objects
 )
 
 from ._redis_object import RedisObject
 from .redis_list import RedisList
+from .redis_indexed_list import RedisIndexedList
 from .redis_zset import RedisZSet
-from .redis_hash import RedisHashMCS, RedisHash, RedisSingleton
+from .redis_hash import (
+    RedisHashMCS,
+    RedisHash,
+    RedisSingleton,
+    HashSnapshot,
+    load_many,
+    load_snapshots,
+)
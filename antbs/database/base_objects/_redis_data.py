@@ -28,13 +28,32 @@
 
 """ Descriptor objects for accessing data stored in redis. """
 
-import redis
+import os
 import logging
 import time
+import threading
+from collections import OrderedDict
+
+from ._redis_stats import db
 
-db = redis.StrictRedis(unix_socket_path='/var/run/redis/redis.sock', decode_responses=True)
 logger = logging.getLogger('antbs')
 
+# Get an expiring hash field, resetting it to its default value first if it has expired.
+# The current time is passed in by the client since that's what expire times are based on.
+#   KEYS: hash key  ARGV: field, expire field, default value, current time
+_GET_EXPIRING = db.register_script("""
+local expires = tonumber(redis.call('HGET', KEYS[1], ARGV[2]))
+
+if expires and tonumber(ARGV[4]) > expires then
+    redis.call('HDEL', KEYS[1], ARGV[2])
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+
+    return ARGV[3]
+end
+
+return redis.call('HGET', KEYS[1], ARGV[1])
+""")
+
 
 class RedisData:
     """
@@ -117,10 +136,13 @@ class RedisDataHashField(RedisData):
         self.expire_key = field_name + '__exp' if can_expire else ''
 
     def __get__(self, obj, obj_type):
-        if self.can_expire:
-            self._check_expire(obj)
+        if obj._has_snapshot_of(self.field_name):
+            val = self._get_from_snapshot(obj)
+        elif self.can_expire:
+            val = self._get_expiring(obj)
+        else:
+            val = db.hget(obj.full_key, self.field_name)
 
-        val = db.hget(obj.full_key, self.field_name)
         value = self._decode_value(val, self.default_value, self.value_type)
 
         self._type_check(value, self.value_type, self.__class__.__name__, self.field_name)
@@ -128,82 +150,164 @@ class RedisDataHashField(RedisData):
         return value
 
     def __set__(self, obj, value):
+        expire_time = None
+
         if self.can_expire and isinstance(value, tuple):
             value, expire_time = value
 
-            self._expire_in(obj, self.expire_key, expire_time)
-
         val = self._encode_value(value, self.default_value)
 
         self._type_check(val, str, self.__class__.__name__, self.field_name)
 
-        db.hset(obj.full_key, self.field_name, val)
+        if expire_time is None:
+            obj._writer.hset(obj.full_key, self.field_name, val)
+        else:
+            # Value and expire time are written together so that readers never see one without
+            # the other.
+            expires = str(int(time.time()) + expire_time)
 
-    def _check_expire(self, obj):
-        if self._will_expire(obj, self.expire_key) and self._is_expired(obj):
-            db.hdel(obj.full_key, self.expire_key)
-            self.__set__(obj, self.default_value)
+            obj._writer.hmset(obj.full_key, {self.field_name: val, self.expire_key: expires})
+            obj._update_snapshot(self.expire_key, expires)
 
-    @staticmethod
-    def _expire_in(obj, exp_key, seconds):
-        """ Set field to expire in redis. """
-        expires = int(time.time()) + seconds
+        obj._update_snapshot(self.field_name, val)
 
-        db.hset(obj.full_key, exp_key, expires)
+    def _get_expiring(self, obj):
+        """ Get field's raw value, atomically resetting it to the default if it has expired. """
+        default = self._encode_value(None, self.default_value)
 
-    @staticmethod
-    def _hget(key, field, default_value):
-        val = db.hget(key, field)
-        return val if val is not None else default_value
+        return _GET_EXPIRING(
+            keys=[obj.full_key],
+            args=[self.field_name, self.expire_key, default, int(time.time())],
+            client=db
+        )
 
-    def _is_expired(self, obj):
-        expire_time = self._hget(obj.full_key, self.expire_key, 0)
-        now = int(time.time())
+    def _get_from_snapshot(self, obj):
+        """ Get field's raw value from the object's snapshot, resetting it if it has expired. """
+        if self.can_expire:
+            expires = obj._snapshot.get(self.expire_key)
 
-        return now > int(expire_time)
+            if expires is not None and int(time.time()) > int(expires):
+                # Let redis decide, the field might have been updated since the snapshot was taken.
+                obj._update_snapshot(self.field_name, self._get_expiring(obj))
+                obj._snapshot.pop(self.expire_key, None)
+
+        return obj._snapshot.get(self.field_name)
 
-    @staticmethod
-    def _will_expire(obj, exp_key):
-        return db.hexists(obj.full_key, exp_key)
+
+class ChildObjectCache:
+    """
+       Bounded LRU identity map for the child objects (`RedisList`, `RedisZSet`) of redis
+       objects. It is shared by all `RedisDataRedisObject` descriptors so that long running
+       workers don't keep every child object they have ever touched in memory. It's safe to
+       use from multiple threads.
+
+       Attributes:
+           maxsize (int):   Maximum number of child objects to keep (`ANTBS_CHILD_CACHE_SIZE`).
+           hits (int):      Number of lookups that found a cached object.
+           misses (int):    Number of lookups that had to create a new object.
+           evictions (int): Number of objects dropped to stay within `maxsize`.
+
+    """
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self.hits = self.misses = self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, factory):
+        """ Get the object for `key`, creating it with `factory(key)` if it isn't cached. """
+        with self._lock:
+            try:
+                item = self._items[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return item
+
+        item = factory(key)
+        self.set(key, item)
+
+        return item
+
+    def set(self, key, item):
+        """ Cache `item` as the object for `key`, evicting the least recently used as needed. """
+        with self._lock:
+            self._items[key] = item
+            self._items.move_to_end(key)
+
+            while len(self._items) > max(self.maxsize, 0):
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def info(self):
+        """
+        Get usage stats for monitoring.
+
+        Returns:
+            dict: hits, misses, evictions, size, maxsize
+
+        """
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._items),
+            maxsize=self.maxsize
+        )
+
+
+child_objects = ChildObjectCache(maxsize=int(os.environ.get('ANTBS_CHILD_CACHE_SIZE', 2048)))
 
 
 class RedisDataRedisObject(RedisData):
     """
        Descriptor that facilitates attribute access to other redis objects from a redis object.
+       Child objects are kept in the shared `child_objects` identity map.
 
        Attributes:
            key (str): The name for the bound attribute (redis key = parent_key:name)
 
     """
 
-    _instances = None
-
     def __init__(self, key, default_value):
         super().__init__(default_value, default_value)
 
         self.key = key
 
-        if self._instances is None:
-            self._instances = {}
-
     def __get__(self, obj, obj_type):
         full_key = self._get_full_key_for_child_object(obj)
+        child = child_objects.get(full_key, self._new_child_object)
+        # Writes join the parent's batch, if there is one (see `RedisObject._pipeline`).
+        child._parent_key = obj.full_key
 
-        if full_key not in self._instances:
-            self._instances[full_key] = self.default_value.as_child(full_key, str)
-
-        return self._instances[full_key]
+        return child
 
     def __set__(self, obj, value):
         full_key = self._get_full_key_for_child_object(obj)
 
         self._type_check(value, self.value_type, self.__class__.__name__, None)
 
-        self._instances[full_key] = value
+        child_objects.set(full_key, value)
 
     def _get_full_key_for_child_object(self, obj):
         return '{0}:{1}'.format(obj.full_key, self.key)
 
+    def _new_child_object(self, full_key):
+        return self.default_value.as_child(full_key, str)
+
 
 def bool_string_helper(value):
     """
@@ -27,15 +27,30 @@
 # along with AntBS; If not, see <http://www.gnu.org/licenses/>.
 
 import json
+import math
+import threading
 
 from . import db
 
 
+class _Batches(threading.local):
+    """ This thread's active pipelines (see `RedisHash.batched()`) by the batched object's key. """
+
+    def __init__(self):
+        self.pipelines = {}
+
+
+_batches = _Batches()
+
+
 class RedisObject:
     """ A base object backed by redis. This class should not be used directly. """
 
     db = db
-    _subclass_names = ['RedisList', 'RedisZset']
+    chunk_size = 500
+    # The key of the object that this is a child object of (see `RedisDataRedisObject`).
+    _parent_key = None
+    _subclass_names = ['RedisList', 'RedisIndexedList', 'RedisZset']
     attrib_lists = dict(string=[], bool=[], int=[], list=[], set=[], path=[])
     all_attribs = []
 
@@ -73,7 +88,7 @@ class RedisObject:
                     'Cannot specify a step to a {0} object slice'.format(self.__class__.__name__)
                 )
 
-            if self.__class__.__name__ == 'RedisList':
+            if self.__class__.__name__ in ['RedisList', 'RedisIndexedList']:
                 return [
                     RedisObject.decode_value(self.item_type, el)
                     for el in self.db.lrange(self.full_key, index.start, index.stop)
@@ -108,17 +123,26 @@ class RedisObject:
 
         elif 'RedisHash' == self.__class__.__name__:
             as_dict = dict()
+            temporary_snapshot = not self.is_snapshot
 
-            for key in self.all_attribs:
-                if key in ['log_str', 'log', 'pkgbuild']:
-                    continue
+            if temporary_snapshot:
+                # Load all fields with one HGETALL instead of one HGET per field.
+                self.refresh()
 
-                val = getattr(self, key)
+            try:
+                for key in self.all_attribs:
+                    if key in ['log_str', 'log', 'pkgbuild']:
+                        continue
 
-                if not isinstance(val, (str, dict, bool, int)) and hasattr(val, '__json__'):
-                    as_dict[key] = val.__json__()
-                else:
-                    as_dict[key] = val
+                    val = getattr(self, key)
+
+                    if not isinstance(val, (str, dict, bool, int)) and hasattr(val, '__json__'):
+                        as_dict[key] = val.__json__()
+                    else:
+                        as_dict[key] = val
+            finally:
+                if temporary_snapshot:
+                    self.release_snapshot()
 
             res = as_dict
 
@@ -152,6 +176,34 @@ class RedisObject:
 
         return helper()
 
+    @staticmethod
+    def _page_bounds(total, page, per_page, limit=None):
+        """
+        Calculates which items are on a page of a paginated redis list/set.
+
+        Args:
+            total (int):    Total number of items in the list/set.
+            page (int):     The page number (starting at 1). Out of range values are clamped.
+            per_page (int): Number of items per page.
+            limit (int):    Only consider the first `limit` items (in page order).
+
+        Returns:
+            tuple: (offset, size, all_pages) where `offset` is the position of the page's
+                   first item counted from the start of the page order.
+
+        """
+        count = min(total, limit) if limit else total
+        all_pages = int(math.ceil(count / per_page))
+
+        if not all_pages:
+            return 0, 0, 0
+
+        page = min(max(int(page), 1), all_pages)
+        offset = (page - 1) * per_page
+        size = min(per_page, count - offset)
+
+        return offset, size, all_pages
+
     @staticmethod
     def decode_value(obj_type, value):
         """ Decode a value if it is non-None, otherwise, decode with no arguments. """
@@ -162,13 +214,53 @@ class RedisObject:
 
     def delete(self):
         """ Delete this object from redis. """
-        self.db.delete(self.full_key)
+        self._writer.delete(self.full_key)
 
     @staticmethod
     def encode_value(value):
         """ Encode a value using json.dumps, with default = str. """
         return str(value)
 
+    def iter_chunked(self, chunk_size=None):
+        """
+        Iterate over all items, fetching at most `chunk_size` items per request so that
+        memory use stays bounded no matter how large the key is.
+
+        Args:
+            chunk_size (int): Number of items to fetch per request (default: `chunk_size`).
+
+        Yields:
+            The decoded items.
+
+        """
+        for chunk in self.iter_chunks(chunk_size):
+            yield from chunk
+
+    def iter_chunks(self, chunk_size=None):
+        raise NotImplementedError
+
     def json(self):
         """ Return this object as a json serialized string. """
         return json.dumps(self.__json__(), sort_keys=True, indent=4)
+
+    @property
+    def _pipeline(self):
+        """
+        The active pipeline of this object or, for child objects, of their parent (see
+        `RedisHash.batched()`). It's looked up on each write and only visible to the thread
+        that started the batch, because objects (eg. cached child objects) are shared.
+
+        """
+        return _batches.pipelines.get(self._parent_key or self.full_key)
+
+    @_pipeline.setter
+    def _pipeline(self, pipeline):
+        if pipeline is None:
+            _batches.pipelines.pop(self.full_key, None)
+        else:
+            _batches.pipelines[self.full_key] = pipeline
+
+    @property
+    def _writer(self):
+        """ The client that writes should use (the active pipeline when writes are batched). """
+        return self._pipeline if self._pipeline is not None else self.db
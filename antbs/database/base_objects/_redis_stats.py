@@ -0,0 +1,275 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# _redis_stats.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+""" Instrumentation for the redis client shared by all redis objects. """
+
+import contextlib
+import functools
+import threading
+import time
+
+import redis
+import redis.client
+
+from redis_connection import get_redis
+
+# Commands whose first key isn't their first argument (`None` for commands without keys).
+_KEY_POSITION = {'EVAL': 3, 'EVALSHA': 3, 'SCRIPT': None, 'PING': None, 'INFO': None, 'TIME': None}
+
+_PipelineBase = getattr(redis.client, 'StrictPipeline', None) or redis.client.Pipeline
+
+
+def _size(value):
+    """ Approximate number of bytes a value takes on the wire. """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_size(k) + _size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(_size(v) for v in value)
+
+    return len(str(value))
+
+
+def _key_prefix(args):
+    """ The prefix (first two parts, eg. `antbs:build`) of the key a command operates on. """
+    position = _KEY_POSITION.get(str(args[0]).upper(), 1)
+
+    if position is None or len(args) <= position:
+        return '-'
+
+    return ':'.join(str(args[position]).split(':')[:2])
+
+
+class RedisStats:
+    """
+    Redis usage collected while handling a single request or job.
+
+    Attributes:
+        commands (int):       Number of commands issued.
+        round_trips (int):    Number of round trips (a pipeline is a single round trip).
+        bytes_sent (int):     Approximate size of the commands sent.
+        bytes_received (int): Approximate size of the replies received.
+        seconds (float):      Time spent waiting on redis.
+        by_prefix (dict):     Commands, bytes and seconds per key prefix.
+        by_phase (dict):      Commands, round trips and seconds per phase (see `phase()`).
+
+    """
+
+    def __init__(self):
+        self.commands = self.round_trips = self.bytes_sent = self.bytes_received = 0
+        self.seconds = 0.0
+        self.by_prefix = {}
+        self.by_phase = {}
+        self.current_phase = None
+
+    def record(self, commands, reply, seconds):
+        """
+        Record a round trip.
+
+        Args:
+            commands (list): The args of each command that was sent.
+            reply (mixed):   The reply (or list of replies for a pipeline).
+            seconds (float): How long the round trip took.
+
+        """
+        received = _size(reply)
+        share = seconds / len(commands)
+
+        self.round_trips += 1
+        self.commands += len(commands)
+        self.bytes_received += received
+        self.seconds += seconds
+
+        for args in commands:
+            sent = _size(args)
+            prefix = self.by_prefix.setdefault(
+                _key_prefix(args), dict(commands=0, bytes=0, seconds=0.0)
+            )
+
+            prefix['commands'] += 1
+            prefix['bytes'] += sent + received // len(commands)
+            prefix['seconds'] += share
+            self.bytes_sent += sent
+
+        if self.current_phase is not None:
+            phase = self.by_phase.setdefault(
+                self.current_phase, dict(commands=0, round_trips=0, seconds=0.0)
+            )
+            phase['commands'] += len(commands)
+            phase['round_trips'] += 1
+            phase['seconds'] += seconds
+
+    def header(self):
+        """ Summary suitable for a HTTP response header. """
+        prefixes = sorted(self.by_prefix.items(), key=lambda item: -item[1]['commands'])
+
+        return 'commands={0}; round_trips={1}; bytes={2}; ms={3:.1f}; {4}'.format(
+            self.commands,
+            self.round_trips,
+            self.bytes_sent + self.bytes_received,
+            self.seconds * 1000,
+            ', '.join('{0}={1}'.format(prefix, info['commands']) for prefix, info in prefixes)
+        )
+
+    def summary(self):
+        """ Summary as a `dict` (suitable for json and RQ job meta). """
+        return dict(
+            commands=self.commands,
+            round_trips=self.round_trips,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            seconds=round(self.seconds, 4),
+            by_prefix=self.by_prefix,
+            by_phase=self.by_phase,
+        )
+
+
+class RedisStatsCollector(threading.local):
+    """
+    Keeps track of the `RedisStats` for the request or job being handled by the current
+    thread (greenlet when gevent has patched `threading`). Nothing is recorded unless
+    collection has been started.
+
+    """
+
+    stats = None
+
+    def start(self):
+        """ Start collecting (discarding anything collected so far). """
+        self.stats = RedisStats()
+        return self.stats
+
+    def stop(self):
+        """ Stop collecting and return what was collected (`None` if not collecting). """
+        stats, self.stats = self.stats, None
+        return stats
+
+    def record(self, commands, reply, seconds):
+        if self.stats is not None:
+            self.stats.record(commands, reply, seconds)
+
+    @contextlib.contextmanager
+    def collect(self):
+        """
+        Collect stats for the duration of the context. Nested contexts share the outer stats.
+
+        """
+        if self.stats is not None:
+            yield self.stats
+            return
+
+        stats = self.start()
+
+        try:
+            yield stats
+        finally:
+            self.stop()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Attribute commands issued during the context to phase `name` (see `RedisStats`). """
+        if self.stats is None:
+            yield
+            return
+
+        stats = self.stats
+        outer, stats.current_phase = stats.current_phase, name
+
+        try:
+            yield
+        finally:
+            stats.current_phase = outer
+
+    def job(self, func):
+        """
+        Decorator for RQ job functions: collects stats while the job runs and stores their
+        summary in the job's meta (`job.meta['redis_stats']`).
+
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            from rq import get_current_job
+
+            with self.collect() as stats:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    job = get_current_job(connection=db)
+
+                    if job is not None:
+                        job.meta['redis_stats'] = stats.summary()
+                        job.save_meta()
+
+        return wrapper
+
+
+redis_stats = RedisStatsCollector()
+
+
+class InstrumentedPipeline(_PipelineBase):
+    """ Pipeline that records each execution as a single round trip. """
+
+    def execute(self, raise_on_error=True):
+        commands = [args for args, _ in self.command_stack]
+        start = time.perf_counter()
+        reply = None
+
+        try:
+            reply = super().execute(raise_on_error=raise_on_error)
+            return reply
+        finally:
+            if commands:
+                redis_stats.record(commands, reply, time.perf_counter() - start)
+
+
+class InstrumentedRedis(redis.StrictRedis):
+    """ `StrictRedis` client that reports every command to `redis_stats`. """
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        reply = None
+
+        try:
+            reply = super().execute_command(*args, **options)
+            return reply
+        finally:
+            redis_stats.record([args], reply, time.perf_counter() - start)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(
+            self.connection_pool,
+            self.response_callbacks,
+            transaction,
+            shard_hint
+        )
+
+
+db = get_redis(InstrumentedRedis)
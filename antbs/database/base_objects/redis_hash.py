@@ -26,6 +26,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
 
+import contextlib
 import errno
 import os
 import time
@@ -36,11 +37,44 @@ from . import (
     RedisDataHashField,
     RedisDataRedisObject,
     RedisList,
+    RedisIndexedList,
     RedisZSet,
     Singleton
 )
 
 
+class HashSnapshot(dict):
+    """
+    A local copy of (some of) the fields in a redis hash.
+
+    Args:
+        data (dict):   The field values loaded from redis.
+        fields (list): The fields that were requested when loading the snapshot. `None` means
+                       the entire hash was loaded.
+        exists (bool): Whether or not the hash exists in redis. Determined from `data` when
+                       the entire hash was loaded.
+
+    """
+
+    def __init__(self, data=None, fields=None, exists=None):
+        super().__init__(data or {})
+
+        self.fields = None if fields is None else set(fields)
+        self.exists = bool(self) if exists is None else exists
+
+    def covers(self, field_name):
+        """ Whether or not the value of `field_name` was loaded in this snapshot. """
+        return self.fields is None or field_name in self.fields
+
+    def store(self, field_name, value):
+        """ Apply a value that was just written to redis to this snapshot. """
+        self[field_name] = value
+        self.exists = True
+
+        if self.fields is not None:
+            self.fields.add(field_name)
+
+
 class RedisHashMCS(type):
     def __new__(mcs, cls, bases, cls_dict):
         instance = super().__new__(mcs, cls, bases, cls_dict)
@@ -63,6 +97,9 @@ class RedisHashMCS(type):
             elif attrib_name in instance.attrib_lists['int']:
                 value = RedisDataHashField(attrib_name, 0, int, can_expire)
 
+            elif attrib_name in instance.attrib_lists['list'] and attrib_name in instance.indexed:
+                value = RedisDataRedisObject(attrib_name, RedisIndexedList)
+
             elif attrib_name in instance.attrib_lists['list']:
                 value = RedisDataRedisObject(attrib_name, RedisList)
 
@@ -102,14 +139,36 @@ class RedisHash(RedisObject, metaclass=RedisHashMCS):
             attrib_lists (dict): Contains lists of class attributes that are stored in redis
                                  organized by their value type.
             all_keys (list):  List of all class attributes that are stored in redis.
+            key_prefix (str):    Class attribute. The `prefix` used by all objects of the subclass.
+            key_arg (str):       Class attribute. The name of the subclass constructor's argument
+                                 that identifies a single object (used by `load_many()`).
+            indexed (list):      Class attribute. Names of `list` attributes that should be
+                                 stored as `RedisIndexedList` (O(1) membership tests).
+
+        Snapshot Mode:
+            When `snapshot` is `True` the object's entire redis hash is loaded with a single
+            `HGETALL` and all subsequent reads of hash fields are served from that local copy.
+            Writes still go to redis immediately and are applied to the local copy as well.
+            Use `RedisHash.refresh()` to reload the snapshot from redis. A preloaded
+            `HashSnapshot` can also be given (see `load_many()`).
+
+        Batched Writes:
+            Inside a `with obj.batched():` block all writes to the object's hash fields and to
+            its child lists/sets are buffered in a redis pipeline and applied atomically
+            (`MULTI`/`EXEC`) when the block exits. See `RedisHash.batched()`.
 
     """
 
     all_attribs = []
     attrib_lists = dict(string=[], bool=[], int=[], list=[], set=[], path=[])
     can_expire = []
+    indexed = []
+    key_prefix = ''
+    key_arg = 'key'
+
+    _snapshot = None
 
-    def __init__(self, namespace='antbs', prefix='', key='', *args, **kwargs):
+    def __init__(self, namespace='antbs', prefix='', key='', *args, snapshot=False, **kwargs):
         if 'status' != prefix and not key and not prefix:
             raise ValueError('Both "prefix" and "key" are required')
 
@@ -125,6 +184,18 @@ class RedisHash(RedisObject, metaclass=RedisHashMCS):
         self.all_attribs = getattr(type(self), 'all_attribs')
         self.attrib_lists = getattr(type(self), 'attrib_lists')
 
+        if isinstance(snapshot, HashSnapshot):
+            self._snapshot = snapshot
+        elif snapshot:
+            self.refresh()
+
+    def __bool__(self):
+        """ Tests if this object currently exists in redis. """
+        if self._snapshot is not None:
+            return self._snapshot.exists
+
+        return super().__bool__()
+
     def __getitem__(self, item):
         """ Get and return the value of a field (item) from this objects redis hash."""
         return getattr(self, item)
@@ -142,6 +213,9 @@ class RedisHash(RedisObject, metaclass=RedisHashMCS):
         if self.full_key[-1] == ':':
             self.full_key = self.full_key[:-1]
 
+            if self._snapshot is not None:
+                self.refresh()
+
     def __setitem__(self, field_name, value):
         """ Set the value of a field (item) from this objects redis hash."""
         return setattr(self, field_name, value)
@@ -164,6 +238,21 @@ class RedisHash(RedisObject, metaclass=RedisHashMCS):
         """
         return dt.strftime("%m/%d/%Y %I:%M%p")
 
+    @staticmethod
+    def datetime_to_timestamp(dt):
+        """
+        Converts a datetime to a unix timestamp (stored alongside datetime strings so that
+        time windows and durations can be computed without parsing strings).
+
+        Args:
+            dt (datetime.datetime): `datetime` to be converted.
+
+        Returns:
+            int: The timestamp.
+
+        """
+        return int(dt.timestamp())
+
     @staticmethod
     def is_pathname_valid(pathname):
         """
@@ -205,3 +294,143 @@ class RedisHash(RedisObject, metaclass=RedisHashMCS):
 
     def iterkeys(self):
         return self.__iter__()
+
+    @property
+    def is_snapshot(self):
+        """ Whether or not hash field reads are currently being served from a snapshot. """
+        return self._snapshot is not None
+
+    def refresh(self):
+        """
+        Load (or reload) this object's snapshot from redis using a single `HGETALL`.
+
+        Returns:
+            RedisHash: This object (so calls can be chained).
+
+        """
+        self._snapshot = HashSnapshot(self.db.hgetall(self.full_key))
+
+        return self
+
+    def release_snapshot(self):
+        """ Discard this object's snapshot. Reads will go directly to redis again. """
+        self._snapshot = None
+
+    @contextlib.contextmanager
+    def batched(self):
+        """
+        Context manager that buffers all writes to this object (including writes to its child
+        `RedisList` and `RedisZSet` objects) and flushes them as a single atomic pipeline when
+        the context exits. If an exception is raised inside the context nothing is written.
+
+        Notes:
+            Reads are not buffered, so values read inside the context won't reflect the buffered
+            writes unless this object is in snapshot mode. Nested calls join the outer batch.
+            The batch is per thread and per key: other objects for the same hash (and child
+            objects, even ones fetched before the batch started) join it in this thread only.
+
+        Yields:
+            RedisHash: This object.
+
+        """
+        if self._pipeline is not None:
+            yield self
+            return
+
+        self._pipeline = self.db.pipeline(transaction=True)
+        flushed = False
+
+        try:
+            yield self
+            self._pipeline.execute()
+            flushed = True
+        finally:
+            pipeline, self._pipeline = self._pipeline, None
+            pipeline.reset()
+
+            if not flushed and self._snapshot is not None:
+                # Buffered writes were discarded, so the snapshot no longer matches redis.
+                self.refresh()
+
+    def _has_snapshot_of(self, field_name):
+        return self._snapshot is not None and self._snapshot.covers(field_name)
+
+    def _update_snapshot(self, field_name, value):
+        if self._snapshot is not None:
+            self._snapshot.store(field_name, value)
+
+
+def load_snapshots(cls, keys, fields=None, namespace='antbs'):
+    """
+    Loads the hashes for many objects of a `RedisHash` subclass using a single pipelined
+    round trip. See `load_many()` for args.
+
+    Returns:
+        list: A `HashSnapshot` for each key (in the same order as `keys`).
+
+    """
+
+    if not cls.key_prefix:
+        raise ValueError('{0} must set key_prefix to be used with load_many'.format(cls.__name__))
+
+    if not keys:
+        return []
+
+    if fields is not None:
+        fields = list(fields) + [
+            field + '__exp' for field in fields if field in cls.can_expire
+        ]
+
+    pipe = db.pipeline(transaction=False)
+
+    for key in keys:
+        full_key = '{0}:{1}:{2}'.format(namespace, cls.key_prefix, key)
+
+        if fields is None:
+            pipe.hgetall(full_key)
+        else:
+            pipe.hmget(full_key, fields)
+            pipe.exists(full_key)
+
+    results = pipe.execute()
+    snapshots = []
+
+    if fields is None:
+        snapshots = [HashSnapshot(data) for data in results]
+    else:
+        for values, exists in zip(results[::2], results[1::2]):
+            data = {field: val for field, val in zip(fields, values) if val is not None}
+            snapshots.append(HashSnapshot(data, fields=fields, exists=bool(exists)))
+
+    return snapshots
+
+
+def load_many(cls, keys, fields=None, namespace='antbs'):
+    """
+    Loads many objects of a `RedisHash` subclass using a single pipelined round trip.
+
+    Args:
+        cls (type):    The `RedisHash` subclass. It must set `key_prefix` and `key_arg`.
+        keys (list):   The keys of the objects to load (eg. a list of bnums for `Build`).
+        fields (list): Only load these fields (projection). Reading any other field falls back
+                       to a normal `HGET`. All fields are loaded when `None`.
+        namespace (str): See `RedisHash`.
+
+    Returns:
+        list: The objects (in the same order as `keys`), each in snapshot mode.
+
+    Raises:
+        ValueError: If `cls` doesn't set `key_prefix`.
+
+    Examples:
+        >>> builds = load_many(Build, [1001, 1002], fields=['pkgname', 'end_str'])
+
+    """
+
+    keys = [key for key in keys if key]
+    snapshots = load_snapshots(cls, keys, fields, namespace)
+
+    return [
+        cls(**{cls.key_arg: key, 'snapshot': snapshot})
+        for key, snapshot in zip(keys, snapshots)
+    ]
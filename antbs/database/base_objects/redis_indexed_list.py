@@ -0,0 +1,187 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# redis_indexed_list.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+from . import db, RedisList
+
+# Shared by all scripts: (re)builds the index from the list if it doesn't exist yet and
+# decrements/removes an item's count.
+_LUA_HELPERS = """
+local function ensure_index(list_key, index_key)
+    if redis.call('EXISTS', index_key) == 0 then
+        for _, item in ipairs(redis.call('LRANGE', list_key, 0, -1)) do
+            redis.call('HINCRBY', index_key, item, 1)
+        end
+    end
+end
+
+local function unindex(index_key, item, count)
+    if redis.call('HINCRBY', index_key, item, -count) <= 0 then
+        redis.call('HDEL', index_key, item)
+    end
+end
+
+ensure_index(KEYS[1], KEYS[2])
+"""
+
+_PUSH = db.register_script(_LUA_HELPERS + """
+redis.call(ARGV[1], KEYS[1], ARGV[2])
+redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+""")
+
+_POP = db.register_script(_LUA_HELPERS + """
+local item = redis.call(ARGV[1], KEYS[1])
+
+if item then
+    unindex(KEYS[2], item, 1)
+end
+
+return item
+""")
+
+_REMOVE = db.register_script(_LUA_HELPERS + """
+local removed = redis.call('LREM', KEYS[1], 0, ARGV[1])
+
+if removed > 0 then
+    unindex(KEYS[2], ARGV[1], removed)
+end
+
+return removed
+""")
+
+_DELITEM = db.register_script(_LUA_HELPERS + """
+local item = redis.call('LINDEX', KEYS[1], ARGV[1])
+
+if item then
+    redis.call('LSET', KEYS[1], ARGV[1], '__DELETED__')
+    redis.call('LREM', KEYS[1], 1, '__DELETED__')
+    unindex(KEYS[2], item, 1)
+end
+""")
+
+_SETITEM = db.register_script(_LUA_HELPERS + """
+local item = redis.call('LINDEX', KEYS[1], ARGV[1])
+
+redis.call('LSET', KEYS[1], ARGV[1], ARGV[2])
+
+if item then
+    unindex(KEYS[2], item, 1)
+end
+
+redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+""")
+
+_CONTAINS = db.register_script(_LUA_HELPERS + """
+local found = 0
+
+for _, item in ipairs(ARGV) do
+    if redis.call('HEXISTS', KEYS[2], item) == 1 then
+        found = found + 1
+    end
+end
+
+return found
+""")
+
+
+class RedisIndexedList(RedisList):
+    """
+    A `RedisList` that also maintains a companion hash (`full_key:index`) which maps each item
+    to the number of times it appears in the list. Every mutation updates the list and the
+    index atomically (in a single lua script) so that membership tests are O(1) and don't
+    transfer the list. The index is built automatically the first time it's needed for lists
+    that existed before they were indexed.
+
+    Args:
+        See `RedisList`.
+
+    """
+
+    def __init__(self, full_key=None, item_type=str, items=None):
+        self.index_key = '{0}:index'.format(full_key)
+
+        super().__init__(full_key=full_key, item_type=item_type, items=items)
+
+    def __contains__(self, item):
+        """ Check if item is in this list (`HEXISTS` on the index). """
+        return self.count_in([item]) > 0
+
+    def __delitem__(self, index):
+        """ Delete an item from this list by index. """
+        self._run(_DELITEM, index)
+
+    def __setitem__(self, index, val):
+        """ Update an item by index. """
+        self._run(_SETITEM, index, self.encode_value(val))
+
+    def _run(self, script, *args, client=None):
+        client = client if client is not None else self._writer
+        return script(keys=[self.full_key, self.index_key], args=args, client=client)
+
+    def count_in(self, items):
+        """
+        Count how many of `items` are in this list with a single round trip to the index.
+
+        Args:
+            items (list): The items to look for.
+
+        Returns:
+            int: The number of `items` that are in this list.
+
+        """
+        items = [self.encode_value(item) for item in items]
+
+        if not items:
+            return 0
+
+        return int(self._run(_CONTAINS, *items, client=self.db))
+
+    def delete(self):
+        """ Delete this list and its index from redis. """
+        self._writer.delete(self.full_key, self.index_key)
+
+    def lpop(self):
+        """ Remove and return a value from the left (low) end of the list. """
+        return self.decode_value(self.item_type, self._run(_POP, 'LPOP', client=self.db))
+
+    def lpush(self, val):
+        """ Add an item to the left (low) end of the list. """
+        if val:
+            self._run(_PUSH, 'LPUSH', self.encode_value(val))
+
+    def remove(self, val):
+        """ Remove all occurrences of `val` from the list. """
+        self._run(_REMOVE, self.encode_value(val))
+
+    def rpop(self):
+        """ Remove a value from the right (high) end of the list. """
+        return self.decode_value(self.item_type, self._run(_POP, 'RPOP', client=self.db))
+
+    def rpush(self, val):
+        """ Add an item to the right (high) end of the list. """
+        if val:
+            self._run(_PUSH, 'RPUSH', self.encode_value(val))
@@ -59,8 +59,8 @@ class RedisList(RedisObject, list):
 
     def __delitem__(self, index):
         """ Delete an item from this list by index. """
-        self.db.lset(self.full_key, index, '__DELETED__')
-        self.db.lrem(self.full_key, 1, '__DELETED__')
+        self._writer.lset(self.full_key, index, '__DELETED__')
+        self._writer.lrem(self.full_key, 1, '__DELETED__')
 
     def __iter__(self):
         """ Iterate over all items in this list. """
@@ -73,7 +73,7 @@ class RedisList(RedisObject, list):
 
     def __setitem__(self, index, val):
         """ Update an item by index. """
-        self.db.lset(self.full_key, index, super().encode_value(val))
+        self._writer.lset(self.full_key, index, super().encode_value(val))
 
     def __str__(self):
         """ Return this object as a string """
@@ -84,12 +84,55 @@ class RedisList(RedisObject, list):
         if val:
             self.rpush(val)
 
+    def count_in(self, items):
+        """
+        Count how many of `items` are in this list (transfers the list once).
+
+        Args:
+            items (list): The items to look for.
+
+        Returns:
+            int: The number of `items` that are in this list.
+
+        """
+        in_list = set(self.db.lrange(self.full_key, 0, -1))
+
+        return len([item for item in items if self.encode_value(item) in in_list])
+
     def extend(self, iterable):
         """ Append values in iterable to the end of this list """
         if iterable:
             for item in iterable:
                 self.append(item)
 
+    def iter_chunks(self, chunk_size=None):
+        """
+        Iterate over this list in order, one `LRANGE` window of `chunk_size` items at a time.
+
+        Items pushed to the right end while iterating will be included. Removing items
+        while iterating will cause other items to be skipped (use `list(self)` for that).
+
+        Args:
+            chunk_size (int): Number of items per chunk (default: `chunk_size`).
+
+        Yields:
+            list: The decoded items in the next chunk.
+
+        """
+        chunk_size = chunk_size or self.chunk_size
+        start = 0
+
+        while True:
+            items = self.db.lrange(self.full_key, start, start + chunk_size - 1)
+
+            if items:
+                yield [self.decode_value(self.item_type, el) for el in items]
+
+            if len(items) < chunk_size:
+                break
+
+            start += chunk_size
+
     def lpop(self):
         """ Remove and return a value from the left (low) end of the list. """
         return super().decode_value(self.item_type, self.db.lpop(self.full_key))
@@ -97,10 +140,37 @@ class RedisList(RedisObject, list):
     def lpush(self, val):
         """ Add an item to the left (low) end of the list. """
         if val:
-            self.db.lpush(self.full_key, super().encode_value(val))
+            self._writer.lpush(self.full_key, super().encode_value(val))
+
+    def paginate(self, page, per_page, reverse=True, limit=None):
+        """
+        Get a single page of items using `LLEN` + `LRANGE` (only the page is transferred).
+
+        Args:
+            page (int):     The page number (starting at 1). Out of range values are clamped.
+            per_page (int): Number of items per page.
+            reverse (bool): Page through the list starting at the right (newest) end.
+            limit (int):    Only consider the first `limit` items (in page order).
+
+        Returns:
+            tuple: (items on the page (list), total number of pages (int))
+
+        """
+        offset, size, all_pages = self._page_bounds(len(self), page, per_page, limit)
+
+        if not size:
+            return [], all_pages
+
+        if reverse:
+            items = self.db.lrange(self.full_key, -(offset + size), -(offset + 1))
+            items.reverse()
+        else:
+            items = self.db.lrange(self.full_key, offset, offset + size - 1)
+
+        return [self.decode_value(self.item_type, el) for el in items], all_pages
 
     def remove(self, val):
-        self.db.lrem(self.full_key, 0, val)
+        self._writer.lrem(self.full_key, 0, val)
 
     def reverse(self):
         cp = list(self.db.lrange(self.full_key, 0, -1))
@@ -113,4 +183,4 @@ class RedisList(RedisObject, list):
     def rpush(self, val):
         """ Add an item to the right (high) end of the list. """
         if val:
-            self.db.rpush(self.full_key, super().encode_value(val))
+            self._writer.rpush(self.full_key, super().encode_value(val))
@@ -76,7 +76,7 @@ class RedisZSet(RedisObject, set):
         for val in values:
             vals.extend([1, val])
 
-        self.db.zadd(self.full_key, *vals)
+        self._writer.zadd(self.full_key, *vals)
 
     def append(self, val):
         if val:
@@ -90,13 +90,62 @@ class RedisZSet(RedisObject, set):
         """ Check if value is a member of set. """
         return self.db.zrank(self.full_key, super().encode_value(val))
 
+    def iter_chunks(self, chunk_size=None):
+        """
+        Iterate over this set using `ZSCAN` with `chunk_size` as the `COUNT` hint. Members are
+        not returned in order and, like all `SCAN` based iteration, a member may be returned
+        more than once if the set is modified while iterating.
+
+        Args:
+            chunk_size (int): Number of members to request per chunk (default: `chunk_size`).
+
+        Yields:
+            list: The decoded members in the next chunk.
+
+        """
+        chunk_size = chunk_size or self.chunk_size
+        cursor = 0
+
+        while True:
+            cursor, items = self.db.zscan(self.full_key, cursor=cursor, count=chunk_size)
+
+            if items:
+                yield [self.decode_value(self.item_type, el) for el, _ in items]
+
+            if not cursor:
+                break
+
+    def paginate(self, page, per_page, reverse=True, limit=None):
+        """
+        Get a single page of members using `ZCARD` + `ZRANGE`/`ZREVRANGE`.
+
+        Args:
+            page (int):     The page number (starting at 1). Out of range values are clamped.
+            per_page (int): Number of members per page.
+            reverse (bool): Page through the set starting with the highest ranked member.
+            limit (int):    Only consider the first `limit` members (in page order).
+
+        Returns:
+            tuple: (members on the page (list), total number of pages (int))
+
+        """
+        offset, size, all_pages = self._page_bounds(len(self), page, per_page, limit)
+
+        if not size:
+            return [], all_pages
+
+        get_range = self.db.zrevrange if reverse else self.db.zrange
+        items = get_range(self.full_key, offset, offset + size - 1)
+
+        return [self.decode_value(self.item_type, el) for el in items], all_pages
+
     def remove(self, val):
         """ Remove a member from the set. """
-        self.db.zrem(self.full_key, super().encode_value(val))
+        self._writer.zrem(self.full_key, super().encode_value(val))
 
     def remove_range(self, start, stop):
         """ Remove all members at indexes from start to stop """
-        return self.db.zremrangebyrank(self.full_key, start, stop)
+        return self._writer.zremrangebyrank(self.full_key, start, stop)
 
     def sort(self, alpha=True):
         """ Get list of members sorted alphabetically. """
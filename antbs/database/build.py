@@ -33,18 +33,25 @@ from multiprocessing import Process
 
 import gevent
 from rq import Connection, get_current_job
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import BashLexer
 from unidiff import PatchSet
 
 from . import (
     RedisHash,
     status,
-    get_timeline_object
+    get_timeline_object,
+    load_many
+)
+
+from .build_log import BuildLog
+from .build_index import (
+    OUTCOMES,
+    end_str_to_timestamp,
+    index_build,
+    set_build_index_ready
 )
 
 from utils import (
+    BuildCacheVolumes,
     DockerUtils,
     CustomSet,
     remove,
@@ -68,6 +75,7 @@ class Build(RedisHash):
     Args:
         pkg_obj (Package): Create a new build for this package.
         bnum (int): Get an existing build identified by its `bnum`.
+        snapshot (bool): Load all fields with a single `HGETALL` (see `RedisHash`).
 
     Attributes:
         (str)
@@ -75,13 +83,13 @@ class Build(RedisHash):
             version_str: The package's version including pkgrel for displaying on the frontend.
             path: Absolute path to the package's directory (subdir of antergos-packages directory)
             build_path: Absolute path to the the package's build directory.
-            start_str: The build's start timestamp.
-            end_str: The build's end timestamp.
+            start_str: The build's start timestamp (for display).
+            end_str: The build's end timestamp (for display).
             container: The build's Docker container ID.
             review_status: The build's developer review status.
             review_dev: The developer who reviewed the build result.
             review_date: The review's timestamp.
-            log_str: The build log, fully processed into HTML for display on the front-end.
+            log_str: The build log as HTML (only for builds from before `build_log` existed).
 
 
         (bool)
@@ -92,9 +100,19 @@ class Build(RedisHash):
             bnum: ID assigned to the build.
             pkg_id: ID of the package that this build is for.
             tnum: ID of the transaction that this build is a part of.
+            start_ts, end_ts, review_ts: Unix timestamps for `start_str`, `end_str`, `review_date`.
+            cached_from: The build whose packages this build reused (see `build_cache`).
+            ccache_hits, ccache_misses: Compiler cache stats for the build.
+            duration: How long the build took in seconds (0 if unknown). Read-only.
+
+        (float)
+            ccache_hit_rate: Percentage of compilations served from ccache. Read-only.
 
         (list)
-            log: The build log, unprocessed, stored as lines in a list.
+            log: The build log as lines (only for builds from before `build_log` existed).
+
+        (BuildLog)
+            build_log: The build log (see `BuildLog`). Read-only.
 
     Raises:
         ValueError: If both `pkg_obj` and `bnum` are Falsey.
@@ -107,13 +125,16 @@ class Build(RedisHash):
                 'review_dev', 'review_date', 'log_str', 'pkg_id', 'bnum', 'tnum',
                 'repo_container', 'live_output_key', 'last_line_key', 'gh_diff'],
         bool=['failed', 'completed', 'is_iso'],
-        int=[],
+        int=['start_ts', 'end_ts', 'review_ts', 'cached_from', 'ccache_hits', 'ccache_misses'],
         list=['log'],
         set=['generated_pkgs', 'generated_files', 'staging_files'],
         path=['build_dir', 'result_dir', '_32build', '_32bit', 'cache', 'cache_i686']
     )
+    key_prefix = 'build'
+    key_arg = 'bnum'
 
-    def __init__(self, pkg_obj=None, bnum=None, tnum=None, trans_obj=None, prefix='build'):
+    def __init__(self, pkg_obj=None, bnum=None, tnum=None, trans_obj=None, prefix='build',
+                 snapshot=False):
         if not pkg_obj and not bnum:
             raise ValueError
 
@@ -121,28 +142,72 @@ class Build(RedisHash):
         if not bnum:
             the_bnum = self.db.incr('antbs:misc:bnum:next')
 
-        super().__init__(prefix=prefix, key=the_bnum)
+        super().__init__(prefix=prefix, key=the_bnum, snapshot=snapshot)
 
         self.__namespaceinit__()
 
         self._pkg_obj = None
         self._trans_obj = None
+        # Called with this build before a successful result is saved, must return a bool
+        # (see `transaction.build_on_node()`).
+        self._deliver_results = None
+        # The cores the build's container may use (see `Transaction.run_builds()`).
+        self._cpuset = None
+        # Called with a target to start a `Process` for it, used when the build runs in a
+        # worker thread (see `Transaction.run_builds()`).
+        self._start_process = None
 
         if pkg_obj and (not self or not self.bnum):
             self._pkg_obj = pkg_obj
             self._trans_obj = trans_obj
             attribs = [a for a in pkg_obj.all_attribs if a in self.all_attribs]
 
-            for attrib in attribs:
-                value = getattr(pkg_obj, attrib)
-                setattr(self, attrib, value)
+            with self.batched():
+                for attrib in attribs:
+                    value = getattr(pkg_obj, attrib)
+                    setattr(self, attrib, value)
 
-            self.bnum = the_bnum
-            self.tnum = tnum
-            self.failed = False
-            self.completed = False
-            self.live_output_key = 'live:build_output:{0}'.format(the_bnum)
-            self.last_line_key = 'tmp:build_log_last_line:{0}'.format(the_bnum)
+                self.bnum = the_bnum
+                self.tnum = tnum
+                self.failed = False
+                self.completed = False
+                self.live_output_key = 'live:build_output:{0}'.format(the_bnum)
+                self.last_line_key = 'tmp:build_log_last_line:{0}'.format(the_bnum)
+
+    @property
+    def build_log(self):
+        return BuildLog(self.bnum)
+
+    @property
+    def ccache_hit_rate(self):
+        total = self.ccache_hits + self.ccache_misses
+
+        return round(100 * self.ccache_hits / total, 1) if total else 0.0
+
+    @property
+    def duration(self):
+        if not self.start_ts or not self.end_ts:
+            return 0
+
+        return self.end_ts - self.start_ts
+
+    def start_publishing_build_output(self):
+        """
+        Starts a process that runs `publish_build_output()`. Forking from a thread other
+        than the main thread isn't safe, so that is left to `_start_process` when it is set.
+
+        Returns:
+            Process: The (started) process.
+
+        """
+
+        if self._start_process is not None:
+            return self._start_process(self.publish_build_output)
+
+        stream_process = Process(target=self.publish_build_output)
+        stream_process.start()
+
+        return stream_process
 
     def publish_build_output(self):
         if not self.container:
@@ -151,7 +216,7 @@ class Build(RedisHash):
 
         output = doc.logs(container=self.container, stream=True, follow=True)
         nodup = CustomSet()
-        content = []
+        log_writer = self.build_log.writer()
 
         for line in output:
             line = line.decode('UTF-8').rstrip()
@@ -163,9 +228,12 @@ class Build(RedisHash):
                 line = line.replace('"', '')
                 line = '[{0}]: {1}'.format(datetime.now().strftime("%m/%d/%Y %I:%M%p"), line)
 
-                content.append(line)
-                self.db.publish(self.live_output_key, line)
-                self.db.setex(self.last_line_key, 1800, line)
+                log_writer.write(line)
+
+                pipe = self.db.pipeline(transaction=False)
+                pipe.publish(self.live_output_key, line)
+                pipe.setex(self.last_line_key, 1800, line)
+                pipe.execute()
 
         result_ready = self.completed != self.failed
 
@@ -186,18 +254,7 @@ class Build(RedisHash):
         if self.failed:
             self.db.publish(self.live_output_key, 'ENDOFLOG')
 
-        if len(content) > 9001:
-            content = content[:3000] + content[-3000:]
-        elif len(content) > 6001:
-            content = content[:1500] + content[-1500:]
-
-        for line in content:
-            self.log.rpush(line)
-
-        log_content = '\n '.join(self.log)
-        self.log_str = highlight(log_content, BashLexer(),
-                                 HtmlFormatter(style='monokai', linenos='inline',
-                                               prestyles="background:#272822;color:#fff;"))
+        log_writer.close()
 
     def start(self, pkg_obj=None):
         if not self._pkg_obj and not pkg_obj:
@@ -218,6 +275,34 @@ class Build(RedisHash):
 
         return result
 
+    def start_from_cache(self, pkg_obj, cached):
+        """
+        Record a build that reuses the (signed) packages of an earlier build of the exact same
+        inputs instead of running a container.
+
+        Args:
+            pkg_obj (Package): The package.
+            cached (dict):     The cached result (see `build_cache.get_cached_build()`).
+
+        Returns:
+            bool: `True`
+
+        """
+        self._pkg_obj = pkg_obj
+
+        self.process_and_save_build_metadata(self._pkg_obj.version_str)
+
+        with self.build_log.writer() as log_writer:
+            now = datetime.now().strftime("%m/%d/%Y %I:%M%p")
+            tpl = '[{0}]: Build inputs are unchanged since build {1}. Reusing its packages.'
+            log_writer.write(tpl.format(now, cached['bnum']))
+
+        self.cached_from = cached['bnum']
+        self.generated_files.extend(cached['files'])
+        self.save_build_results(True)
+
+        return True
+
     def process_and_save_build_metadata(self, version_str=None):
         """
         Initializes the build metadata.
@@ -230,7 +315,9 @@ class Build(RedisHash):
 
         """
 
-        self.start_str = self.datetime_to_string(datetime.now())
+        started = datetime.now()
+        self.start_str = self.datetime_to_string(started)
+        self.start_ts = self.datetime_to_timestamp(started)
 
         if version_str:
             self.version_str = version_str
@@ -250,8 +337,11 @@ class Build(RedisHash):
 
         with Connection(self.db):
             current_job = get_current_job()
-            current_job.meta['building_num'] = self.bnum
-            current_job.save()
+
+            # Builds that run in a transaction's worker threads have no current job.
+            if current_job is not None:
+                current_job.meta['building_num'] = self.bnum
+                current_job.save()
 
     def save_build_results(self, result):
         pkg_link = '<a href="/package/{0}">{0}</a>'.format(self._pkg_obj.pkgname)
@@ -279,7 +369,12 @@ class Build(RedisHash):
 
         self._pkg_obj.tl_events.append(tl_event_obj.event_id)
 
-        self.end_str = self.datetime_to_string(datetime.now())
+        ended = datetime.now()
+        self.end_str = self.datetime_to_string(ended)
+        self.end_ts = self.datetime_to_timestamp(ended)
+
+        outcome = 'completed' if result is True else 'failed'
+        index_build(self.bnum, self.pkgname, outcome, self.end_ts)
 
     def get_save_pkgbuild_generates(self):
         try:
@@ -339,8 +434,15 @@ class Build(RedisHash):
         # else:
         build_env.append('_ALEXPKG=False')
 
+        volumes = BuildCacheVolumes()
+        build_env.append('_CCACHE_MAXSIZE={0}'.format(volumes.pkg_ccache_size))
+        ccache_dir = volumes.get_ccache_dir(self._pkg_obj.pkgname)
+
         hconfig = doc_util.get_host_config('packages', self.build_dir, self.result_dir, None,
-                                           None, self._32build, self._32bit)
+                                           None, self._32build, self._32bit,
+                                           ccache_dir=ccache_dir,
+                                           srcdest_dir=volumes.get_srcdest_dir(),
+                                           cpuset=self._cpuset)
         container = {}
         try:
             container = doc.create_container(
@@ -349,7 +451,7 @@ class Build(RedisHash):
                 volumes=['/var/cache/pacman', '/makepkg', '/antergos',
                          '/pkg', '/root/.gnupg', '/staging', '/32bit',
                          '/32build', '/result', '/tmp/antbs/.transifexrc',
-                         '/var/cache/pacman_i686'],
+                         '/var/cache/pacman_i686', '/ccache', '/srcdest'],
                 environment=build_env,
                 name=self._pkg_obj.pkgname,
                 host_config=hconfig
@@ -364,11 +466,10 @@ class Build(RedisHash):
 
         container_id = container.get('Id', '')
         self.container = container_id
-        stream_process = Process(target=self.publish_build_output)
 
         try:
             doc.start(container_id)
-            stream_process.start()
+            stream_process = self.start_publishing_build_output()
 
             result = doc.wait(container_id)
 
@@ -389,6 +490,13 @@ class Build(RedisHash):
 
         stream_process.join()
 
+        ccache_stats = volumes.read_ccache_stats(self.result_dir)
+
+        if ccache_stats:
+            with self.batched():
+                self.ccache_hits = ccache_stats['hits']
+                self.ccache_misses = ccache_stats['misses']
+
         if not self.failed:
             # self.get_save_pkgbuild_generates()
             self.get_save_generated_files_paths()
@@ -402,6 +510,13 @@ class Build(RedisHash):
                 self.save_build_results(False)
                 return False
 
+            self.get_save_generated_signatures_paths()
+
+            if self._deliver_results is not None and not self._deliver_results(self):
+                logger.error('Failed to deliver the results of build %s!', self.bnum)
+                self.save_build_results(False)
+                return False
+
             if self._pkg_obj.builds and len(self._pkg_obj.builds) > 1:
                 last_build = self._pkg_obj.builds[-2]
 
@@ -412,7 +527,6 @@ class Build(RedisHash):
                         last_bld_obj.review_status = 'skip'
 
             self.save_build_results(True)
-            self.get_save_generated_signatures_paths()
             return True
 
         self.save_build_results(False)
@@ -498,8 +612,7 @@ class Build(RedisHash):
         try:
             doc.start(self.container)
             cont = self.container
-            stream_process = Process(target=self.publish_build_output)
-            stream_process.start()
+            stream_process = self.start_publishing_build_output()
             result = doc.wait(cont)
             inspect = doc.inspect_container(cont)
             restarting = (
@@ -555,7 +668,7 @@ class Build(RedisHash):
             return False
 
 
-def get_build_object(pkg_obj=None, bnum=None, tnum=None, trans_obj=None):
+def get_build_object(pkg_obj=None, bnum=None, tnum=None, trans_obj=None, snapshot=False):
     """
     Gets an existing build or creates a new one.
 
@@ -563,6 +676,8 @@ def get_build_object(pkg_obj=None, bnum=None, tnum=None, trans_obj=None):
         pkg_obj (Package): Create a new build for this package.
         bnum (int): Get an existing build identified by `bnum`.
         tnum (int): The transaction number for this build (when creating new build)
+        snapshot (bool|HashSnapshot): Load all of the build's fields with a single round trip
+                                      (or use a snapshot preloaded with `load_snapshots()`).
 
     Returns:
         Build: A fully initiallized `Build`.
@@ -576,6 +691,29 @@ def get_build_object(pkg_obj=None, bnum=None, tnum=None, trans_obj=None):
     elif all([pkg_obj, bnum]):
         raise ValueError('Only one of [pkg_obj, bnum] can be given, not both.')
 
-    bld_obj = Build(pkg_obj=pkg_obj, bnum=bnum, tnum=tnum, trans_obj=trans_obj)
+    bld_obj = Build(pkg_obj=pkg_obj, bnum=bnum, tnum=tnum, trans_obj=trans_obj, snapshot=snapshot)
 
     return bld_obj
+
+
+def rebuild_build_index():
+    """
+    Adds all existing builds to the build indexes (see `build_index`). This runs as a
+    background job the first time the indexes are needed and is safe to run more than once.
+
+    """
+    for outcome in OUTCOMES:
+        for chunk in getattr(status, outcome).iter_chunks():
+            bnums = [bnum for bnum in chunk if bnum]
+            pipe = status.db.pipeline()
+
+            fields = ['bnum', 'pkgname', 'end_str', 'end_ts']
+
+            for bld_obj in load_many(Build, bnums, fields=fields):
+                if bld_obj.pkgname:
+                    ended = bld_obj.end_ts or end_str_to_timestamp(bld_obj.end_str)
+                    index_build(bld_obj.bnum, bld_obj.pkgname, outcome, ended, pipe=pipe)
+
+            pipe.execute()
+
+    set_build_index_ready()
@@ -0,0 +1,178 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# build_cache.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Build result cache. Successful builds are cached by a hash of everything that goes into
+them (see `get_build_cache_key()`) so that building the exact same inputs again (eg. when a
+transaction is rerun) can reuse the signed packages instead of running a container.
+
+    antbs:build_cache:<key>             (hash) bnum, pkgname, files (json list of paths)
+    antbs:build_cache:pkg:<pkgname>     (str)  the package's current key
+
+Only the most recent result of each package is kept. Its files are copied to
+`CACHE_DIR/<key>` because build result directories don't outlive their transaction.
+
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from .base_objects import db
+
+CACHE_DIR = os.environ.get('ANTBS_BUILD_CACHE_DIR', '/var/tmp/antbs/build_cache')
+KEY_PREFIX = 'antbs:build_cache'
+
+# Directories in a package's build directory that aren't build inputs.
+IGNORED_DIRS = ['.git', '32bit', '32build', 'pkg', 'src']
+
+# PKGBUILDs whose sources can change without the PKGBUILD changing can't be cached.
+VCS_PATTERN = re.compile(r'^\s*pkgver\s*\(\)|\b(git|svn|hg|bzr)(\+|://)', re.M)
+
+
+def _key(*parts):
+    return ':'.join([KEY_PREFIX] + [str(part) for part in parts])
+
+
+def is_cacheable(build_dir):
+    """ Whether or not the results of building the PKGBUILD in `build_dir` can be cached. """
+    try:
+        with open(os.path.join(build_dir, 'PKGBUILD')) as pkgbuild:
+            return not VCS_PATTERN.search(pkgbuild.read())
+    except OSError:
+        return False
+
+
+def hash_build_directory(build_dir, digest=None):
+    """ Hash the paths and contents of all files in `build_dir` (except `IGNORED_DIRS`). """
+    digest = digest or hashlib.sha256()
+
+    for root, dirs, files in os.walk(build_dir):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_DIRS or root != build_dir)
+
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, build_dir).encode('UTF-8') + b'\0')
+
+            with open(path, 'rb') as file_obj:
+                for block in iter(lambda: file_obj.read(65536), b''):
+                    digest.update(block)
+
+            digest.update(b'\0')
+
+    return digest
+
+
+def get_build_cache_key(build_dir, dep_versions, image_id, version_str=''):
+    """
+    Get the cache key for a build.
+
+    Args:
+        build_dir (str):     The package's build directory (before the build starts).
+        dep_versions (dict): Versions of the package's dependencies (name -> version).
+        image_id (str):      Id of the docker image the package is built in.
+        version_str (str):   The version that will be built.
+
+    Returns:
+        str: The key.
+
+    """
+    digest = hashlib.sha256()
+    inputs = dict(deps=sorted(dep_versions.items()), image=image_id, version=version_str)
+
+    digest.update(json.dumps(inputs).encode('UTF-8'))
+
+    return hash_build_directory(build_dir, digest).hexdigest()
+
+
+def get_cached_build(key):
+    """
+    Get the cached result for `key`.
+
+    Returns:
+        dict: `bnum` and `files` of the cached build (`None` if there isn't one or its
+              files have gone missing).
+
+    """
+    cached = db.hgetall(_key(key))
+
+    if not cached:
+        return None
+
+    files = json.loads(cached['files'])
+
+    if not files or not all(os.path.exists(f) for f in files):
+        remove_cached_build(key, cached.get('pkgname'))
+        return None
+
+    return dict(bnum=int(cached['bnum']), files=files)
+
+
+def cache_build_result(key, bld_obj):
+    """
+    Cache the result of a successful build (replacing the package's previous result).
+
+    Args:
+        key (str):       The build's cache key (see `get_build_cache_key()`).
+        bld_obj (Build): The build.
+
+    """
+    cache_dir = os.path.join(CACHE_DIR, key)
+    files = []
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    for pkg_file in bld_obj.generated_files:
+        dest = os.path.join(cache_dir, os.path.basename(pkg_file))
+
+        shutil.copy2(pkg_file, dest)
+        files.append(dest)
+
+    previous = db.getset(_key('pkg', bld_obj.pkgname), key)
+
+    if previous and previous != key:
+        remove_cached_build(previous)
+
+    db.hmset(_key(key), dict(bnum=bld_obj.bnum, pkgname=bld_obj.pkgname, files=json.dumps(files)))
+
+
+def remove_cached_build(key, pkgname=None):
+    pipe = db.pipeline()
+
+    pipe.delete(_key(key))
+
+    if pkgname:
+        # Only if it's still the package's current key.
+        if db.get(_key('pkg', pkgname)) == key:
+            pipe.delete(_key('pkg', pkgname))
+
+    pipe.execute()
+
+    shutil.rmtree(os.path.join(CACHE_DIR, key), ignore_errors=True)
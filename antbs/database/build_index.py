@@ -0,0 +1,198 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# build_index.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Secondary indexes for builds. They are updated when a build's result is saved so that
+views can look builds up by finish time, outcome and package without loading every build.
+
+    antbs:index:builds:ended                     (zset) bnum -> end time (all outcomes)
+    antbs:index:builds:ended:<outcome>           (zset) bnum -> end time
+    antbs:index:builds:pkg:<pkgname>:<outcome>   (zset) bnum -> end time
+    antbs:index:builds:pkgnames                  (set)  names of packages that have builds
+    antbs:index:builds:ready                     (str)  set once existing builds are indexed
+                                                        (see `build.rebuild_build_index()`)
+
+"""
+
+from datetime import datetime
+
+from .base_objects import db
+
+INDEX_PREFIX = 'antbs:index:builds'
+OUTCOMES = ['completed', 'failed']
+
+
+def _key(*parts):
+    return ':'.join([INDEX_PREFIX] + [str(part) for part in parts])
+
+
+def _timestamp(when, default=None):
+    if when is None:
+        return default
+
+    return when.timestamp() if isinstance(when, datetime) else when
+
+
+def _outcomes(outcome):
+    if outcome is None:
+        return OUTCOMES
+
+    if outcome not in OUTCOMES:
+        raise ValueError('outcome must be one of {0}, {1} given.'.format(OUTCOMES, outcome))
+
+    return [outcome]
+
+
+def end_str_to_timestamp(end_str):
+    """ Convert a `Build.end_str` to a unix timestamp (`None` if it's empty or invalid). """
+    try:
+        return int(datetime.strptime(end_str, '%m/%d/%Y %I:%M%p').timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def index_build(bnum, pkgname, outcome, ended, pipe=None):
+    """
+    Add a build to the indexes.
+
+    Args:
+        bnum (int):              The build's number.
+        pkgname (str):           The name of the package the build is for.
+        outcome (str):           Either 'completed' or 'failed'.
+        ended (datetime|int):    When the build ended (`None` if unknown).
+        pipe (redis.Pipeline):   Queue the writes on this pipeline instead of running them now.
+
+    """
+    _outcomes(outcome)
+
+    client = pipe if pipe is not None else db.pipeline()
+    score = _timestamp(ended, 0)
+
+    for other in OUTCOMES:
+        if other != outcome:
+            client.zrem(_key('ended', other), bnum)
+            client.zrem(_key('pkg', pkgname, other), bnum)
+
+    if ended is not None:
+        client.zadd(_key('ended'), score, bnum)
+        client.zadd(_key('ended', outcome), score, bnum)
+
+    client.zadd(_key('pkg', pkgname, outcome), score, bnum)
+    client.sadd(_key('pkgnames'), pkgname)
+
+    if pipe is None:
+        client.execute()
+
+
+def build_index_is_ready():
+    """ Whether or not all existing builds have been indexed. """
+    return bool(db.exists(_key('ready')))
+
+
+def builds_between(start=None, end=None, outcome=None, with_times=False):
+    """
+    Get the builds that ended between `start` and `end` (inclusive), oldest first.
+
+    Args:
+        start (datetime|int): Only include builds that ended at or after this time.
+        end (datetime|int):   Only include builds that ended at or before this time.
+        outcome (str):        Only include builds with this outcome ('completed' or 'failed').
+        with_times (bool):    Return `(bnum, timestamp)` tuples.
+
+    Returns:
+        list: Build numbers (or tuples, see `with_times`).
+
+    """
+    key = _key('ended') if outcome is None else _key('ended', *_outcomes(outcome))
+    items = db.zrangebyscore(
+        key, _timestamp(start, '-inf'), _timestamp(end, '+inf'), withscores=with_times
+    )
+
+    if with_times:
+        return [(int(bnum), int(ts)) for bnum, ts in items]
+
+    return [int(bnum) for bnum in items]
+
+
+def count_builds_between(start=None, end=None, outcome=None):
+    """ Count the builds that ended between `start` and `end`. See `builds_between()`. """
+    key = _key('ended') if outcome is None else _key('ended', *_outcomes(outcome))
+
+    return db.zcount(key, _timestamp(start, '-inf'), _timestamp(end, '+inf'))
+
+
+def builds_for(pkgname, outcome=None, with_times=False):
+    """
+    Get the builds for a package, oldest first.
+
+    Args:
+        pkgname (str):     The package's name.
+        outcome (str):     Only include builds with this outcome ('completed' or 'failed').
+        with_times (bool): Return `(bnum, timestamp)` tuples.
+
+    Returns:
+        list: Build numbers (or tuples, see `with_times`).
+
+    """
+    pipe = db.pipeline(transaction=False)
+
+    for _outcome in _outcomes(outcome):
+        pipe.zrange(_key('pkg', pkgname, _outcome), 0, -1, withscores=True)
+
+    items = sorted(
+        ((int(bnum), int(ts)) for result in pipe.execute() for bnum, ts in result),
+        key=lambda item: (item[1], item[0])
+    )
+
+    return items if with_times else [bnum for bnum, _ in items]
+
+
+def search_builds(query, outcome=None):
+    """
+    Get the builds for all packages whose name contains `query`, sorted by build number.
+
+    Args:
+        query (str):   Find builds for packages with this string in their name.
+        outcome (str): Only include builds with this outcome ('completed' or 'failed').
+
+    Returns:
+        list: Build numbers.
+
+    """
+    pkgnames = [name for name in db.sscan_iter(_key('pkgnames'), count=500) if query in name]
+    pipe = db.pipeline(transaction=False)
+
+    for pkgname in pkgnames:
+        for _outcome in _outcomes(outcome):
+            pipe.zrange(_key('pkg', pkgname, _outcome), 0, -1)
+
+    return sorted(set(int(bnum) for result in pipe.execute() for bnum in result))
+
+
+def set_build_index_ready():
+    db.set(_key('ready'), 'True')
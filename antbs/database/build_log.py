@@ -0,0 +1,372 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# build_log.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+""" Storage for build logs. """
+
+import base64
+import collections
+import logging
+import os
+import zlib
+
+from pygments import highlight
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import BashLexer
+
+from .base_objects import db
+from .log_archive import LogArchiveReader, LogArchiveWriter
+
+logger = logging.getLogger('antbs')
+
+
+def _compress(text):
+    return base64.b64encode(zlib.compress(text.encode('UTF-8'))).decode('ascii')
+
+
+def _decompress(data):
+    return zlib.decompress(base64.b64decode(data)).decode('UTF-8')
+
+
+class BuildLog:
+    """
+    A build's log. Complete logs are written to an on-disk archive file (see `log_archive`)
+    in `archive_dir` (`ANTBS_BUILD_LOG_DIR`). When that isn't possible they are stored in
+    redis as a list of compressed chunks of `chunk_lines` lines, keeping only the first
+    `head_bytes` and the last `tail_bytes` (the lines in between are replaced with a single
+    line saying how many were omitted).
+
+    The log is rendered to HTML (at most `html_max_lines` lines, from its head and tail) the
+    first time it's viewed and the result is cached (compressed) for `html_cache_seconds`.
+    Logs from before this existed (`Build.log` and `Build.log_str`) are still readable.
+
+    Args:
+        bnum (int): The build's number.
+
+    Attributes:
+        archive_path (str): Path of the log's archive file ('' when archiving is disabled).
+        chunks_key (str):   Redis key for the list of compressed chunks.
+        html_key (str):     Redis key for the cached HTML.
+
+    """
+
+    archive_dir = os.environ.get('ANTBS_BUILD_LOG_DIR', '/var/lib/antbs/build_logs')
+    chunk_lines = 500
+    head_bytes = 256 * 1024
+    tail_bytes = 768 * 1024
+    html_max_lines = 3000
+    html_cache_seconds = 7 * 24 * 60 * 60
+
+    def __init__(self, bnum):
+        self.bnum = bnum
+        self.chunks_key = 'antbs:build:{0}:log_chunks'.format(bnum)
+        self.html_key = 'antbs:build:{0}:log_html'.format(bnum)
+        self.archive_path = ''
+        self._build_key = 'antbs:build:{0}'.format(bnum)
+        self._legacy_key = '{0}:log'.format(self._build_key)
+
+        if self.archive_dir:
+            self.archive_path = os.path.join(
+                self.archive_dir, str(int(bnum) // 1000), '{0}.log'.format(bnum)
+            )
+
+    def __bool__(self):
+        return self.is_archived or bool(db.exists(self.chunks_key) or db.exists(self._legacy_key))
+
+    def __len__(self):
+        if self.is_archived:
+            with LogArchiveReader(self.archive_path) as archive:
+                return len(archive)
+
+        return sum(1 for _ in self.iter_lines())
+
+    @property
+    def is_archived(self):
+        return bool(self.archive_path) and os.path.exists(self.archive_path)
+
+    def archive(self):
+        """
+        Move this log from redis to an archive file (used to migrate existing logs).
+
+        Returns:
+            bool: `True` if the log was archived, `False` if there was nothing to archive.
+
+        """
+        if self.is_archived or not self.archive_path or not self:
+            return False
+
+        with LogArchiveWriter(self.archive_path) as archive:
+            for line in self.iter_lines():
+                archive.write(line)
+
+        pipe = db.pipeline()
+        pipe.delete(self.chunks_key, self._legacy_key)
+        pipe.hdel(self._build_key, 'log_str')
+        pipe.execute()
+
+        return True
+
+    def delete(self):
+        db.delete(self.chunks_key, self.html_key)
+
+        if self.is_archived:
+            os.remove(self.archive_path)
+
+    def _head_and_tail(self, read_lines, total):
+        """ Get at most `html_max_lines` lines from the head and tail of the log. """
+        if total <= self.html_max_lines:
+            return read_lines(0, total)
+
+        half = self.html_max_lines // 2
+        omitted = '[...]: {0} lines omitted'.format(total - (half * 2))
+
+        return read_lines(0, half) + [omitted] + read_lines(total - half, total)
+
+    def html(self):
+        """
+        Get the log as HTML (rendering and caching it if necessary).
+
+        Returns:
+            str: The HTML or an empty string if there is no log.
+
+        """
+        cached = db.get(self.html_key)
+
+        if cached:
+            return _decompress(cached)
+
+        if not self.is_archived and not db.exists(self.chunks_key):
+            # Logs from before chunked storage existed were rendered when the build finished.
+            legacy = db.hget(self._build_key, 'log_str')
+
+            if legacy:
+                return legacy
+
+        if self.is_archived:
+            with LogArchiveReader(self.archive_path) as archive:
+                lines = self._head_and_tail(archive.read_lines, len(archive))
+        else:
+            all_lines = self.read_lines()
+            lines = self._head_and_tail(lambda start, stop: all_lines[start:stop], len(all_lines))
+
+        if not lines:
+            return ''
+
+        html = highlight(
+            '\n '.join(lines),
+            BashLexer(),
+            HtmlFormatter(
+                style='monokai', linenos='inline', prestyles="background:#272822;color:#fff;"
+            )
+        )
+
+        db.setex(self.html_key, self.html_cache_seconds, _compress(html))
+
+        return html
+
+    def iter_lines(self):
+        """ Iterate over the log's lines, decompressing one chunk at a time. """
+        if self.is_archived:
+            with LogArchiveReader(self.archive_path) as archive:
+                for start in range(0, len(archive), self.chunk_lines):
+                    yield from archive.read_lines(start, start + self.chunk_lines)
+
+            return
+
+        if not db.exists(self.chunks_key):
+            yield from db.lrange(self._legacy_key, 0, -1)
+            return
+
+        start = 0
+
+        while True:
+            chunks = db.lrange(self.chunks_key, start, start + 9)
+
+            for chunk in chunks:
+                yield from _decompress(chunk).split('\n')
+
+            if len(chunks) < 10:
+                break
+
+            start += 10
+
+    def read_lines(self, start=0, stop=None):
+        """
+        Read a range of lines. Only the requested lines are read from archived logs.
+
+        Args:
+            start (int): Index of the first line (negative values count from the end).
+            stop (int):  Index after the last line (negative values count from the end).
+
+        Returns:
+            list: The lines.
+
+        """
+        if self.is_archived:
+            with LogArchiveReader(self.archive_path) as archive:
+                return archive.read_lines(start, stop)
+
+        return list(self.iter_lines())[start:stop]
+
+    def tail(self, count):
+        """ Get the last `count` lines. """
+        return self.read_lines(-count) if count > 0 else []
+
+    def writer(self):
+        """ Get a writer that replaces this log with new content. """
+        if self.archive_path:
+            try:
+                return ArchiveBuildLogWriter(self)
+            except OSError as err:
+                logger.error('Unable to archive build log, storing it in redis: %s', err)
+
+        return BuildLogWriter(self)
+
+
+class ArchiveBuildLogWriter:
+    """
+    Writes a complete `BuildLog` to its archive file as lines arrive. Has the same interface
+    as `BuildLogWriter`.
+
+    Args:
+        log (BuildLog): The log to write.
+
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.omitted = 0
+
+        self._archive = LogArchiveWriter(log.archive_path)
+
+        db.delete(log.chunks_key, log.html_key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def lines(self):
+        return self._archive.lines
+
+    def write(self, line):
+        """ Add a line to the log. """
+        self._archive.write(line)
+
+    def close(self):
+        """ Finish the archive (must be called once all lines are written). """
+        self._archive.close()
+        db.delete(self.log.html_key)
+
+
+class BuildLogWriter:
+    """
+    Writes a `BuildLog` as lines arrive. The head of the log is written every `chunk_lines`
+    lines (a single round trip for each chunk), the tail is kept in a bounded buffer until
+    `close()` is called. Can be used as a context manager.
+
+    Args:
+        log (BuildLog): The log to write.
+
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self.lines = 0
+        self.omitted = 0
+
+        self._head = []
+        self._head_size = 0
+        self._head_full = False
+        self._tail = collections.deque()
+        self._tail_size = 0
+
+        log.delete()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _push_chunks(self, lines, pipe):
+        for start in range(0, len(lines), self.log.chunk_lines):
+            chunk = lines[start:start + self.log.chunk_lines]
+            pipe.rpush(self.log.chunks_key, _compress('\n'.join(chunk)))
+
+    def write(self, line):
+        """ Add a line to the log. """
+        self.lines += 1
+        size = len(line) + 1
+
+        if not self._head_full and self._head_size + size <= self.log.head_bytes:
+            self._head.append(line)
+            self._head_size += size
+
+            if len(self._head) >= self.log.chunk_lines:
+                self.flush()
+
+            return
+
+        self._head_full = True
+        self._tail.append(line)
+        self._tail_size += size
+
+        while self._tail_size > self.log.tail_bytes and self._tail:
+            self._tail_size -= len(self._tail.popleft()) + 1
+            self.omitted += 1
+
+    def flush(self):
+        """ Write the buffered head lines. """
+        if not self._head:
+            return
+
+        pipe = db.pipeline()
+        self._push_chunks(self._head, pipe)
+        pipe.execute()
+
+        self._head = []
+
+    def close(self):
+        """ Write everything that is still buffered (call it once all lines are written). """
+        lines = self._head
+
+        if self.omitted:
+            lines.append('[...]: {0} lines omitted'.format(self.omitted))
+
+        lines.extend(self._tail)
+
+        pipe = db.pipeline()
+        self._push_chunks(lines, pipe)
+        pipe.delete(self.log.html_key)
+        pipe.execute()
+
+        self._head = []
+        self._tail.clear()
+        self._tail_size = 0
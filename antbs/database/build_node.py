@@ -0,0 +1,177 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# build_node.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Build nodes: hosts that run package builds for transactions. Each node registers itself
+here, advertising its capacity, and runs one RQ worker per build slot on the build queue for
+its architecture (see `build_node_worker.py`). Transactions hand their builds to these queues
+whenever live nodes are available (see `Transaction.run_build()`).
+
+    antbs:build_nodes             (zset) node_id -> time of the node's last heartbeat
+    antbs:build_node:<node_id>    (hash) the node (see `BuildNode`)
+
+"""
+
+import time
+from datetime import datetime
+
+from rq import Connection, Queue
+
+from . import RedisHash, db, load_many
+
+NODES_KEY = 'antbs:build_nodes'
+
+# A node that hasn't sent a heartbeat for this many seconds is considered dead.
+HEARTBEAT_INTERVAL = 15
+NODE_TIMEOUT = 4 * HEARTBEAT_INTERVAL
+
+
+class BuildNode(RedisHash):
+    """
+    A host that runs builds.
+
+    Args:
+        node_id (str): The node's unique id (defaults to its hostname, see `build_node_worker`).
+
+    Attributes:
+        (str)
+            node_id: The node's id.
+            hostname: The node's hostname.
+            arch: Architecture of the packages the node builds.
+            artifact_host: `[user@]host` to which the node ships build artifacts with rsync
+                           (empty if it runs on the same host as the transactions).
+            started_str: When the node was registered (for display).
+
+        (int)
+            cores, memory_mb: The node's resources.
+            slots: Number of builds the node runs at the same time.
+            running: Number of builds the node is running now.
+            last_seen: Unix timestamp of the node's last heartbeat.
+
+        (set)
+            builds: Builds the node has run (list of bnums).
+
+        (path)
+            base_path: Where the node creates build directories.
+
+    """
+
+    attrib_lists = dict(
+        string=['node_id', 'hostname', 'arch', 'artifact_host', 'started_str'],
+        bool=[],
+        int=['cores', 'memory_mb', 'slots', 'running', 'last_seen'],
+        list=[],
+        set=['builds'],
+        path=['base_path']
+    )
+    key_prefix = 'build_node'
+    key_arg = 'node_id'
+
+    def __init__(self, node_id=None, prefix='build_node', snapshot=False):
+        if not node_id:
+            raise ValueError('node_id is required.')
+
+        super().__init__(prefix=prefix, key=node_id, snapshot=snapshot)
+
+        self.__namespaceinit__()
+
+        if not self or not self.node_id:
+            self.node_id = node_id
+
+    @property
+    def is_alive(self):
+        return self.last_seen > time.time() - NODE_TIMEOUT
+
+    def register(self, hostname, arch, cores, memory_mb, slots, base_path, artifact_host=''):
+        """ Save the node's capacity and make it available to transactions. """
+        with self.batched():
+            self.hostname = hostname
+            self.arch = arch
+            self.cores = cores
+            self.memory_mb = memory_mb
+            self.slots = slots
+            self.running = 0
+            self.base_path = base_path
+            self.artifact_host = artifact_host
+            self.started_str = self.datetime_to_string(datetime.now())
+
+        self.heartbeat()
+
+    def heartbeat(self):
+        now = int(time.time())
+        pipe = self.db.pipeline()
+
+        pipe.hset(self.full_key, 'last_seen', now)
+        pipe.zadd(NODES_KEY, now, self.node_id)
+        pipe.execute()
+
+    def unregister(self):
+        """ Stop sending builds to this node. """
+        pipe = self.db.pipeline()
+
+        pipe.zrem(NODES_KEY, self.node_id)
+        pipe.hset(self.full_key, 'last_seen', 0)
+        pipe.execute()
+
+    def build_started(self, bnum):
+        pipe = self.db.pipeline()
+
+        pipe.hincrby(self.full_key, 'running', 1)
+        pipe.zadd(self.builds.full_key, 1, bnum)
+        pipe.execute()
+
+    def build_finished(self):
+        self.db.hincrby(self.full_key, 'running', -1)
+
+
+def get_node_queue(arch='x86_64'):
+    """ Get the queue that build nodes for `arch` take their builds from. """
+    with Connection(db):
+        return Queue('builds:{0}'.format(arch))
+
+
+def get_build_nodes(arch=None):
+    """
+    Get the nodes that are alive (have sent a heartbeat recently).
+
+    Args:
+        arch (str): Only include nodes for this architecture.
+
+    Returns:
+        list: The nodes (`BuildNode`).
+
+    """
+    node_ids = db.zrangebyscore(NODES_KEY, int(time.time()) - NODE_TIMEOUT, '+inf')
+    nodes = load_many(BuildNode, node_ids)
+
+    return [node for node in nodes if arch is None or node.arch == arch]
+
+
+def get_build_capacity(arch='x86_64'):
+    """ The total number of build slots of the live nodes for `arch` (0 if there are none). """
+    return sum(node.slots for node in get_build_nodes(arch))
@@ -0,0 +1,211 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# log_archive.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+"""
+On-disk log archive files. Each file holds one log as a sequence of zlib compressed blocks
+of `block_lines` lines followed by an index of the blocks, so that any range of lines can be
+read by memory-mapping the file and decompressing only the blocks that contain them.
+
+    MAGIC | block | block | ... | index (json) | index offset (8 bytes, big endian) | MAGIC
+
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+import zlib
+
+MAGIC = b'ANTBSLOG'
+_OFFSET = struct.Struct('>Q')
+_FOOTER_SIZE = _OFFSET.size + len(MAGIC)
+
+
+class LogArchiveWriter:
+    """
+    Writes a log archive file as lines arrive (memory use is bounded by `block_lines`). The
+    file is written to a temporary path and only moved into place by `close()`, so readers
+    never see partial archives. Can be used as a context manager (the archive is discarded
+    if an exception is raised).
+
+    Args:
+        path (str):        Where the archive should be written.
+        block_lines (int): Number of lines per compressed block.
+
+    """
+
+    def __init__(self, path, block_lines=1000):
+        self.path = path
+        self.block_lines = block_lines
+        self.lines = 0
+
+        self._tmp_path = '{0}.tmp'.format(path)
+        self._blocks = []
+        self._buffer = []
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write_block(self):
+        if not self._buffer:
+            return
+
+        data = zlib.compress('\n'.join(self._buffer).encode('UTF-8'))
+        offset = self._file.tell()
+
+        self._file.write(data)
+        self._blocks.append([offset, len(data), self.lines - len(self._buffer), len(self._buffer)])
+
+        self._buffer = []
+
+    def write(self, line):
+        """ Add a line to the archive. """
+        self._buffer.append(line)
+        self.lines += 1
+
+        if len(self._buffer) >= self.block_lines:
+            self._write_block()
+
+    def close(self):
+        """ Write the remaining lines and the index and move the archive into place. """
+        self._write_block()
+
+        index_offset = self._file.tell()
+        index = dict(lines=self.lines, blocks=self._blocks)
+
+        self._file.write(json.dumps(index).encode('UTF-8'))
+        self._file.write(_OFFSET.pack(index_offset))
+        self._file.write(MAGIC)
+        self._file.close()
+
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """ Discard the archive. """
+        self._file.close()
+
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class LogArchiveReader:
+    """
+    Reads ranges of lines from a log archive file. The file is memory-mapped and only the
+    blocks that contain the requested lines are decompressed. Can be used as a context manager.
+
+    Args:
+        path (str): The archive's path.
+
+    Raises:
+        ValueError: If the file isn't a (complete) log archive.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as archive:
+            self._mmap = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._load_index()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.lines
+
+    def _load_index(self):
+        size = len(self._mmap)
+
+        if size < len(MAGIC) + _FOOTER_SIZE or self._mmap[:len(MAGIC)] != MAGIC \
+                or self._mmap[size - len(MAGIC):] != MAGIC:
+            raise ValueError('{0} is not a log archive.'.format(self.path))
+
+        index_offset, = _OFFSET.unpack(self._mmap[size - _FOOTER_SIZE:size - len(MAGIC)])
+        index = json.loads(self._mmap[index_offset:size - _FOOTER_SIZE].decode('UTF-8'))
+
+        self.lines = index['lines']
+        self._blocks = index['blocks']
+        self._first_lines = [block[2] for block in self._blocks]
+
+    def _read_block(self, block):
+        offset, length, _, _ = block
+
+        return zlib.decompress(self._mmap[offset:offset + length]).decode('UTF-8').split('\n')
+
+    def close(self):
+        self._mmap.close()
+
+    def read_lines(self, start=0, stop=None):
+        """
+        Read a range of lines.
+
+        Args:
+            start (int): Index of the first line (negative values count from the end).
+            stop (int):  Index after the last line (negative values count from the end).
+
+        Returns:
+            list: The lines.
+
+        """
+        start, stop, _ = slice(start, stop).indices(self.lines)
+
+        if start >= stop:
+            return []
+
+        first = bisect.bisect_right(self._first_lines, start) - 1
+        lines = []
+
+        for block in self._blocks[first:]:
+            if block[2] >= stop:
+                break
+
+            block_lines = self._read_block(block)
+            lines.extend(block_lines[max(start - block[2], 0):stop - block[2]])
+
+        return lines
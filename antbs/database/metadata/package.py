@@ -111,6 +111,7 @@ class PackageMetadata(RedisHash):
             'makedepends',
         ]
     )
+    key_prefix = 'pkg'
 
     def __init__(self, namespace='antbs', prefix='pkg', key='', *args, **kwargs):
         super().__init__(namespace=namespace, prefix=prefix, key=key, *args, **kwargs)
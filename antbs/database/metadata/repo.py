@@ -43,6 +43,7 @@ class PacmanRepoMetadata(RedisHash):
     attrib_lists = dict(
         string=[
             'alpm_db',
+            'alpm_db_stat',
             'arch',
             'name'
         ],
@@ -53,7 +54,11 @@ class PacmanRepoMetadata(RedisHash):
 
         int=[
             'pkg_count_alpm',
-            'pkg_count_fs'
+            'pkg_count_fs',
+            'pkgs_synced',
+            'update_requested',
+            'update_completed',
+            'update_succeeded'
         ],
 
         list=[],
@@ -0,0 +1,165 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# migrations.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+"""
+One-off data migrations. Each migration runs once (in the background, on the repo worker)
+and is then recorded in `antbs:misc:migrations` so that it's never run again.
+
+"""
+
+from datetime import datetime
+
+from . import (
+    db,
+    status,
+    load_many,
+    Build,
+    BuildLog,
+    TimelineEvent
+)
+
+MIGRATIONS_KEY = 'antbs:misc:migrations'
+MIGRATIONS_LOCK_KEY = 'antbs:misc:migrations:running'
+
+# Once all migrations have been run there's no need to check again in this process.
+_all_done = False
+
+logger = status.logger
+
+
+def _string_to_timestamp(dt_str, dt_format='%m/%d/%Y %I:%M%p'):
+    try:
+        return int(datetime.strptime(dt_str, dt_format).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def backfill_build_timestamps():
+    """ Sets `start_ts`, `end_ts` and `review_ts` for builds that only have datetime strings. """
+    fields = {'start_ts': 'start_str', 'end_ts': 'end_str', 'review_ts': 'review_date'}
+
+    for build_status in ['completed', 'failed']:
+        for chunk in getattr(status, build_status).iter_chunks():
+            bnums = [bnum for bnum in chunk if bnum]
+            bld_objs = load_many(Build, bnums, fields=list(fields) + list(fields.values()))
+            pipe = db.pipeline()
+
+            for bld_obj in bld_objs:
+                for ts_field, str_field in fields.items():
+                    if not getattr(bld_obj, ts_field):
+                        timestamp = _string_to_timestamp(getattr(bld_obj, str_field))
+                        pipe.hset(bld_obj.full_key, ts_field, timestamp)
+
+            pipe.execute()
+
+
+def backfill_timeline_timestamps():
+    """ Sets `timestamp` for timeline events that only have date and time strings. """
+    for chunk in status.all_tl_events.iter_chunks():
+        event_ids = [event_id for event_id in chunk if event_id]
+        tl_objs = load_many(
+            TimelineEvent, event_ids,
+            fields=['event_id', 'message', 'timestamp', 'date_str', 'time_str']
+        )
+        pipe = db.pipeline()
+
+        for tl_obj in tl_objs:
+            if not tl_obj.timestamp:
+                dt_str = '{0} {1}'.format(tl_obj.date_str, tl_obj.time_str)
+                pipe.hset(tl_obj.full_key, 'timestamp', _string_to_timestamp(dt_str))
+
+        pipe.execute()
+
+
+def archive_build_logs():
+    """ Moves the logs of finished builds from redis to the on-disk log archive. """
+    if not BuildLog.archive_dir:
+        return
+
+    for build_status in ['completed', 'failed']:
+        for chunk in getattr(status, build_status).iter_chunks():
+            for bnum in [bnum for bnum in chunk if bnum]:
+                BuildLog(bnum).archive()
+
+
+# Migrations are run in this order. Never remove or rename a migration once it has been added.
+MIGRATIONS = [
+    ('build_timestamps', backfill_build_timestamps),
+    ('timeline_timestamps', backfill_timeline_timestamps),
+    ('archive_build_logs', archive_build_logs),
+]
+
+
+def get_pending_migrations():
+    """ Returns the names of the migrations that have not been run yet. """
+    done = db.smembers(MIGRATIONS_KEY)
+
+    return [name for name, _ in MIGRATIONS if name not in done]
+
+
+def run_migrations():
+    """ Runs all pending migrations (this is an RQ job, see `schedule_migrations()`). """
+    pending = get_pending_migrations()
+
+    try:
+        for name, migration in MIGRATIONS:
+            if name in pending:
+                logger.info('Running migration: %s', name)
+                migration()
+                db.sadd(MIGRATIONS_KEY, name)
+    finally:
+        db.delete(MIGRATIONS_LOCK_KEY)
+
+
+def schedule_migrations(queue):
+    """
+    Enqueues `run_migrations()` on `queue` if there are pending migrations and they aren't
+    already scheduled or running.
+
+    Args:
+        queue (rq.Queue): The queue to use.
+
+    Returns:
+        bool: `True` if the migrations were scheduled, `False` otherwise.
+
+    """
+    global _all_done
+
+    if _all_done:
+        return False
+
+    if not get_pending_migrations():
+        _all_done = True
+        return False
+
+    if not db.set(MIGRATIONS_LOCK_KEY, 'True', nx=True, ex=10800):
+        return False
+
+    queue.enqueue_call(run_migrations, timeout=10800)
+
+    return True
@@ -44,7 +44,9 @@ from . import (
     RedisHash,
     status,
     get_pkg_object,
-    get_repo_object
+    get_repo_object,
+    load_many,
+    Package
 )
 
 from utils import (
@@ -129,15 +131,16 @@ class Monitor(RedisHash):
     def _package_version_in_repos(self, pkgname, latest):
         version_in_repo = version_in_staging = None
 
-        if self.repo_obj.has_package_alpm(pkgname):
-            version_in_repo = self.repo_obj.get_pkgver_alpm(pkgname)
-            version_in_repo, pkgrel = version_in_repo.rsplit('-', 1)
-            logger.debug([self.repo_obj.name, version_in_repo, latest])
+        with self.repo_obj.pkgvers_lookups(), self.staging_repo_obj.pkgvers_lookups():
+            if self.repo_obj.has_package_alpm(pkgname):
+                version_in_repo = self.repo_obj.get_pkgver_alpm(pkgname)
+                version_in_repo, pkgrel = version_in_repo.rsplit('-', 1)
+                logger.debug([self.repo_obj.name, version_in_repo, latest])
 
-        if self.staging_repo_obj.has_package_alpm(pkgname):
-            version_in_staging = self.staging_repo_obj.get_pkgver_alpm(pkgname)
-            version_in_staging, pkgrel = version_in_staging.rsplit('-', 1)
-            logger.debug([self.staging_repo_obj.name, version_in_repo, latest])
+            if self.staging_repo_obj.has_package_alpm(pkgname):
+                version_in_staging = self.staging_repo_obj.get_pkgver_alpm(pkgname)
+                version_in_staging, pkgrel = version_in_staging.rsplit('-', 1)
+                logger.debug([self.staging_repo_obj.name, version_in_repo, latest])
 
         in_repo = version_in_repo is not None and version_in_repo == latest
         in_staging = version_in_staging is not None and version_in_staging == latest
@@ -168,8 +171,17 @@ class Monitor(RedisHash):
         return build_override, latest
 
     def _sync_packages_list(self):
-        pkg_objs = [get_pkg_object(name=p) for p in status.all_packages if p]
-        monitored = [p.pkgname for p in pkg_objs if p.is_monitored and not p.gh_path.endswith('.inactive')]
+        # `Package.__init__()` reads pkgbuild and pkg_id, include them to avoid extra HGETs.
+        fields = ['pkgname', 'pkg_id', 'pkgbuild', 'gh_path', 'is_initialized', 'is_monitored']
+        monitored = []
+
+        for chunk in status.all_packages.iter_chunks():
+            pkg_objs = load_many(Package, [p for p in chunk if p], fields=fields)
+            monitored.extend(
+                p.pkgname for p in pkg_objs
+                if p.is_monitored and not p.gh_path.endswith('.inactive')
+            )
+
         new_pkgs = list(set(monitored) - set(list(self.packages)))
         rm_pkgs = list(set(list(self.packages)) - set(monitored))
 
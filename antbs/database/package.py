@@ -33,7 +33,7 @@ from github3.exceptions import UnprocessableResponseBody
 from gitlab import Gitlab
 
 from .metadata.package import PackageMetadata
-from utils import Pkgbuild
+from utils import GitMirror, Pkgbuild
 from . import (
     status
 )
@@ -50,6 +50,8 @@ class Package(PackageMetadata):
 
     Args:
         name (str): The name of the package, AKA the pkgname.
+        fetch_pkgbuild (bool): Fetch the PKGBUILD from github and sync the database with it.
+        snapshot (bool): Load all fields with a single `HGETALL` (see `RedisHash`).
 
     Attributes:
         allowed_in        (list): The repos that the package is allowed to be in (repo names).
@@ -102,8 +104,11 @@ class Package(PackageMetadata):
         url               (str):  See `man PKGBUILD`.
         version_str       (str):  The full version suituble for display on the frontend.
     """
-    def __init__(self, name, fetch_pkgbuild=False):
-        super().__init__(key=name)
+
+    key_arg = 'name'
+
+    def __init__(self, name, fetch_pkgbuild=False, snapshot=False):
+        super().__init__(key=name, snapshot=snapshot)
 
         self._pkgbuild = None
 
@@ -226,11 +231,11 @@ class Package(PackageMetadata):
         if os.path.exists(os.path.join(dirpath, self.git_name)):
             shutil.rmtree(os.path.join(dirpath, self.git_name), ignore_errors=True)
         try:
-            res = subprocess.check_output(['/usr/bin/git', 'clone', self.git_url, self.git_name],
-                                          cwd=dirpath)
-            logger.info(res)
-        except subprocess.CalledProcessError as err:
-            logger.error(err.output)
+            mirror = GitMirror(self.git_url)
+            mirror.update()
+            mirror.clone_to(os.path.join(dirpath, self.git_name))
+        except RuntimeError as err:
+            logger.error(err)
 
     def determine_github_path(self):
         gh_repo_base_url = '{}/blob/master'.format(status.gh_repo_url)
@@ -585,7 +590,7 @@ class Package(PackageMetadata):
         self.sync_pkgbuild_array_by_key('groups')
 
 
-def get_pkg_object(name, fetch_pkgbuild=False):
-    pkg_obj = Package(name=name, fetch_pkgbuild=fetch_pkgbuild)
+def get_pkg_object(name, fetch_pkgbuild=False, snapshot=False):
+    pkg_obj = Package(name=name, fetch_pkgbuild=fetch_pkgbuild, snapshot=snapshot)
 
     return pkg_obj
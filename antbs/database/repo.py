@@ -27,9 +27,11 @@
 #  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
 
 
+import contextlib
 import os
 import tarfile
-from io import TextIOWrapper
+import threading
+import time
 from pkg_resources import parse_version
 
 import gevent
@@ -44,14 +46,18 @@ from . import (
     RedisSingleton,
     db,
     get_pkg_object,
+    redis_stats,
 )
 
 from utils import (
+    batch_sign,
     remove,
-    try_run_command,
+    set_server_status,
     DockerUtils,
+    MyLock,
 )
 
+from .alpm_db import AlpmDatabase, get_desc_field, iter_db_entries
 from .metadata.repo import PacmanRepoMetadata
 
 logger = status.logger
@@ -60,7 +66,28 @@ doc = doc_util.doc
 PKG_EXT = '.pkg.tar.xz'
 SIG_EXT = '.sig'
 DB_EXT = '.db.tar.gz'
-SCRIPTS_DIR = os.path.join(status.APP_DIR, 'scripts')
+# Create detached signatures for the alpm databases.
+SIGN_ALPM_DB = os.environ.get('ANTBS_SIGN_REPO_DB', '').lower() in ['1', 'true', 'yes', 'on']
+
+# A message (`<name>:<arch>:<request>:<ok|failed>`) is published here each time a repo update
+# finishes.
+REPO_UPDATES_CHANNEL = 'antbs:repo:updates'
+UPDATE_TIMEOUT = 9600
+# An update job that hasn't started after this many seconds is assumed to be lost, the next
+# request queues a new one.
+UPDATE_PENDING_TIMEOUT = 900
+# Update requests are collected for (at least) this many seconds before the update starts.
+UPDATE_WINDOW = int(os.environ.get('ANTBS_REPO_UPDATE_WINDOW', 5))
+
+
+class _PkgversPins(threading.local):
+    """ This thread's pinned `pkgs_synced` values by repo key (see `pkgvers_lookups()`). """
+
+    def __init__(self):
+        self.synced = {}
+
+
+_pkgvers_pins = _PkgversPins()
 
 
 class PacmanRepo(PacmanRepoMetadata):
@@ -88,47 +115,72 @@ class PacmanRepo(PacmanRepoMetadata):
                                 format as `packages`.
         pkgs_alpm       (set):  Packages that are in the repo's alpm database (what pacman sees).
                                 Uses same string format as `packages`.
+        pkgs_synced     (int):  Incremented each time `pkgs_alpm` or `pkgs_fs` is synced.
         path            (str):  See Args
         unaccounted_for (set):  Packages that are in either the alpm database or the
                                 filesystem, but not both. Uses same string format as `packages`.
+        update_completed (int): The last update request handled by a finished repo update.
+        update_requested (int): The number of the most recent update request.
+        update_succeeded (int): The last update request handled by a successful repo update.
 
     """
 
-    def _add_or_remove_package_alpm_database(self, action, pkgname=None, pkg_fname=None):
-        action = 'repo-{}'.format(action)
-        cmd = [os.path.join(SCRIPTS_DIR, action)]
-        pkg_or_file = pkgname if 'remove' in action else pkg_fname
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
 
-        if 'add' in action:
-            cmd.append('-R')
+        # 'pkgs_alpm'/'pkgs_fs' -> (pkgs_synced, {pkgname: [pkgver, ...]})
+        self._pkgvers_indexes = {}
 
-        cmd.extend([self.alpm_db, pkg_or_file])
-        logger.debug(cmd)
+    def _update_alpm_database(self, add_to_db, rm_from_db):
+        """
+        Add package files to and remove packages from the alpm database. The database is only
+        rewritten once for all of the changes (see `alpm_db`).
 
-        success, res = try_run_command(cmd, self.path)
-        lock_not_aquired = 'Failed to acquire lockfile'
-        waiting = 0
+        Args:
+            add_to_db (list):  Package file names.
+            rm_from_db (list): Package names.
 
-        if not success and lock_not_aquired in res:
-            logger.warning(res)
-            while not success and lock_not_aquired in res:
-                waiting += 10
-                gevent.sleep(10)
-                success, res = try_run_command(cmd, self.path)
+        Returns:
+            bool: `False` if any of the packages couldn't be added or the database couldn't
+                  be read or written, `True` otherwise.
 
-                if waiting > 300:
-                    logger.error('repo-add script timed out!')
-                    break
+        """
+        if not add_to_db and not rm_from_db:
+            return True
 
-        logger.debug(res)
+        try:
+            alpm_db = AlpmDatabase(self.path, self.name)
+        except (OSError, tarfile.TarError) as err:
+            logger.error('Unable to read %s alpm database: %s', self.name, err)
+            return False
 
-        if not success:
-            logger.error(
-                '%s command on alpm database failed for %s! Output was: %s',
-                action,
-                pkg_fname,
-                res
-            )
+        result = True
+
+        for pkg_fname in add_to_db:
+            try:
+                alpm_db.add(os.path.join(self.path, pkg_fname))
+            except (OSError, ValueError) as err:
+                logger.error('Unable to add %s to %s alpm database: %s', pkg_fname, self.name, err)
+                result = False
+
+        for pkgname in rm_from_db:
+            if not alpm_db.remove(pkgname):
+                logger.error('%s is not in %s alpm database!', pkgname, self.name)
+
+        if not alpm_db.changed:
+            return result
+
+        try:
+            alpm_db.write(sign=self._sign_alpm_database if SIGN_ALPM_DB else None)
+        except (OSError, RuntimeError) as err:
+            logger.error('Unable to write %s alpm database: %s', self.name, err)
+            return False
+
+        return result
+
+    @staticmethod
+    def _sign_alpm_database(paths):
+        return batch_sign(set(paths), db, uid=status.gpg_key, passphrase=status.gpg_password)
 
     def _compare_pkgvers(self, pkgvers):
         if len(pkgvers) == 1:
@@ -155,31 +207,50 @@ class PacmanRepo(PacmanRepoMetadata):
         return _pkgvers
 
     def _determine_current_repo_state_alpm(self):
-        self.pkgs_alpm.delete()
-
+        # The database is only replaced (never modified in place) so this changes with it.
         try:
-            with tarfile.open(self.alpm_db_path, 'r') as alpm_db:
-                pkg_info_files = [p for p in alpm_db.getmembers() if '/desc' in p.name]
+            db_stat = os.stat(self.alpm_db_path)
+        except OSError as err:
+            logger.error(err)
+            return
 
-                for pkg_info_file in pkg_info_files:
-                    pkg_info_bytes = alpm_db.extractfile(pkg_info_file)
-                    pkg_file_name = TextIOWrapper(pkg_info_bytes).readlines()[1].strip()
-                    pkg_file_name = pkg_file_name.replace('.pkg', '-pkg')
+        db_stat = '{0}:{1}:{2}'.format(db_stat.st_ino, db_stat.st_size, db_stat.st_mtime_ns)
 
-                    pkgname, ver, rel, arch, suffix = pkg_file_name.rsplit('-', 4)
+        if db_stat == self.alpm_db_stat:
+            return
+
+        pkgs = set()
 
-                    self.pkgs_alpm.add('{0}|{1}-{2}|{3}'.format(pkgname, ver, rel, arch))
+        try:
+            for _, _, desc in iter_db_entries(self.alpm_db_path, ['desc']):
+                pkg_file_name = get_desc_field(desc, 'FILENAME').replace('.pkg', '-pkg')
+                pkgname, ver, rel, arch, suffix = pkg_file_name.rsplit('-', 4)
 
-            self.pkg_count_alpm = len(self.pkgs_alpm)
+                pkgs.add('{0}|{1}-{2}|{3}'.format(pkgname, ver, rel, arch))
 
         except Exception as err:
             logger.error(err)
+            return
+
+        current = set(self.pkgs_alpm.iter_chunked())
+
+        with self.batched():
+            for pkg in current - pkgs:
+                self.pkgs_alpm.remove(pkg)
+
+            self.pkgs_alpm.add(*(pkgs - current))
+
+            self.pkg_count_alpm = len(pkgs)
+            self.alpm_db_stat = db_stat
+            self.pkgs_synced += 1
+
+        self._pkgs_synced_changed('pkgs_alpm')
 
     def _determine_current_repo_state_fs(self):
         self._maybe_remove_broken_symlinks()
         pkgs = [p for p in os.listdir(self.path) if '.pkg.' in p and not p.endswith('.sig')]
 
-        self.pkgs_fs.delete()
+        pkgs_fs = set()
 
         for pkg_file_name in pkgs:
             pkg_file_name = pkg_file_name.replace('.pkg', '-pkg')
@@ -190,15 +261,19 @@ class PacmanRepo(PacmanRepoMetadata):
                 logger.error("unexpected pkg: " + pkg_file_name)
                 continue
 
-            self.pkgs_fs.add('{0}|{1}-{2}|{3}'.format(pkg, version, rel, arch))
+            pkgs_fs.add('{0}|{1}-{2}|{3}'.format(pkg, version, rel, arch))
+
+        with self.batched():
+            self.pkgs_fs.delete()
+            self.pkgs_fs.add(*pkgs_fs)
 
-        self.pkg_count_fs = len(self.pkgs_fs)
+            self.pkg_count_fs = len(pkgs_fs)
+            self.pkgs_synced += 1
 
-    def _get_force_remove_packages(self):
-        pkgs_fs = set(list(self.pkgs_fs))
-        pkgs_alpm = set(list(self.pkgs_alpm))
-        pkgs = list(pkgs_fs & pkgs_alpm)
+        self._pkgs_synced_changed('pkgs_fs')
 
+    @staticmethod
+    def _get_force_remove_packages(pkgs):
         return [p for p in pkgs if get_pkg_object(p.split('|').pop(0)).gh_path.endswith('.inactive')]
 
     def _get_packages_unaccounted_for_info(self):
@@ -222,17 +297,70 @@ class PacmanRepo(PacmanRepoMetadata):
         return [p.split('|')[0] for p in location if p]
 
     def _get_pkgvers(self, pkgname, location):
-        pkgs = self._get_pkgnames(location)
+        return list(self._get_pkgvers_index(location).get(pkgname, []))
+
+    def _get_pkgvers_index(self, location):
+        """
+        Get an index of the packages in `location` ('pkgs_alpm' or 'pkgs_fs') by name. It's
+        built from a single scan of the set and reused until the repo is synced again. Checking
+        that costs a round trip, unless it's done once for a batch (see `pkgvers_lookups()`).
+
+        Returns:
+            dict: Package name -> list of versions.
 
-        if pkgname not in pkgs:
-            return []
+        """
+        synced = _pkgvers_pins.synced.get(self.full_key)
 
-        pkgvers = [p.split('|')[1] for p in location if p and p.split('|')[0] == pkgname]
+        if synced is None:
+            synced = self.pkgs_synced
 
-        return pkgvers
+        cached = self._pkgvers_indexes.get(location)
+
+        if cached is not None and cached[0] == synced:
+            return cached[1]
+
+        index = {}
+
+        for pkg in getattr(self, location).iter_chunked():
+            if pkg:
+                pkgname, pkgver = pkg.split('|')[:2]
+                index.setdefault(pkgname, []).append(pkgver)
+
+        self._pkgvers_indexes[location] = (synced, index)
+
+        return index
 
     def _has_package(self, pkgname, location):
-        return pkgname in self._get_pkgnames(location)
+        return pkgname in self._get_pkgvers_index(location)
+
+    def _pkgs_synced_changed(self, location):
+        # Syncs made in this process are noticed without asking redis.
+        self._pkgvers_indexes.pop(location, None)
+        _pkgvers_pins.synced.pop(self.full_key, None)
+
+    @contextlib.contextmanager
+    def pkgvers_lookups(self):
+        """
+        Check that this repo's package indexes are current once, when the context is entered,
+        instead of on every lookup (eg. `get_pkgver_alpm()`) made inside of it in this thread.
+        Syncs made by other processes in the meantime are not seen until the context exits.
+
+        Yields:
+            PacmanRepo: This repo.
+
+        """
+        pins = _pkgvers_pins.synced
+
+        if self.full_key in pins:
+            yield self
+            return
+
+        pins[self.full_key] = self.pkgs_synced
+
+        try:
+            yield self
+        finally:
+            pins.pop(self.full_key, None)
 
     def _maybe_remove_broken_symlinks(self):
         # If item returned by os.listdir doesn't exist then its a broken symlink.
@@ -250,24 +378,29 @@ class PacmanRepo(PacmanRepoMetadata):
         return parse_version(pkgver) > parse_version(compare_to)
 
     def _process_current_repo_states(self):
-        pkgs_fs = set(list(self.pkgs_fs))
-        pkgs_alpm = set(list(self.pkgs_alpm))
-        accounted_for = list(pkgs_fs & pkgs_alpm)
-        force_remove = self._get_force_remove_packages()
-        unaccounted_for = list(pkgs_fs - pkgs_alpm) + list(pkgs_alpm - pkgs_fs) + force_remove
-
-        self.packages.delete()
-        self.unaccounted_for.delete()
-        self.pkgnames.delete()
-
-        for pkg in accounted_for:
-            self.packages.add(pkg)
-
-        for pkg in unaccounted_for:
-            self.unaccounted_for.add(pkg)
-
-        for pkg in self._get_pkgnames(accounted_for):
-            self.pkgnames.append(pkg)
+        pkgs_fs = set(self.pkgs_fs.iter_chunked())
+        only_fs = set(pkgs_fs)
+        accounted_for = []
+        only_alpm = []
+
+        for pkg in self.pkgs_alpm.iter_chunked():
+            if pkg in pkgs_fs:
+                accounted_for.append(pkg)
+                only_fs.discard(pkg)
+            else:
+                only_alpm.append(pkg)
+
+        force_remove = self._get_force_remove_packages(accounted_for)
+        unaccounted_for = list(only_fs) + only_alpm + force_remove
+
+        with self.batched():
+            self.packages.delete()
+            self.unaccounted_for.delete()
+            self.pkgnames.delete()
+
+            self.packages.add(*accounted_for)
+            self.unaccounted_for.add(*unaccounted_for)
+            self.pkgnames.add(*self._get_pkgnames(accounted_for))
 
     def _process_repo_packages_data(self):
         unaccounted_for = self._get_packages_unaccounted_for_info()
@@ -336,34 +469,43 @@ class PacmanRepo(PacmanRepoMetadata):
         return pkg_info_string.split('|')
 
     def _handle_packages_unaccounted_for(self, add_to_db, rm_from_db, rm_from_fs):
-        if add_to_db:
-            for pkg in add_to_db:
-                self._add_or_remove_package_alpm_database('add', pkg_fname=pkg)
-
-        if rm_from_db:
-            for pkg in rm_from_db:
-                self._add_or_remove_package_alpm_database('remove', pkgname=pkg)
+        result = self._update_alpm_database(add_to_db, rm_from_db)
 
         if rm_from_fs:
             for pkg in rm_from_fs:
                 self._remove_package_from_filesystem(pkg)
 
+        return result
+
     def _update_repo(self):
-        self.sync_repo_packages_data()
+        with MyLock(db, self._update_lock_key):
+            self.sync_repo_packages_data()
+
+            if self.unaccounted_for:
+                with self.pkgvers_lookups():
+                    add_to_db, rm_from_db, rm_from_fs = self._process_repo_packages_data()
+
+                return self._handle_packages_unaccounted_for(add_to_db, rm_from_db, rm_from_fs)
 
-        if self.unaccounted_for:
-            add_to_db, rm_from_db, rm_from_fs = self._process_repo_packages_data()
-            self._handle_packages_unaccounted_for(add_to_db, rm_from_db, rm_from_fs)
+        return True
+
+    @property
+    def _update_lock_key(self):
+        return '{0}:update_lock'.format(self.full_key)
+
+    @property
+    def _update_pending_key(self):
+        return '{0}:update_pending'.format(self.full_key)
 
     def get_pkgnames_alpm(self):
-        return self._get_pkgnames(self.pkgs_alpm)
+        return list(self._get_pkgvers_index('pkgs_alpm'))
 
     def get_pkgnames_filesystem(self):
-        return self._get_pkgnames(self.pkgs_fs)
+        return list(self._get_pkgvers_index('pkgs_fs'))
 
     def get_pkgver_alpm(self, pkgname):
         pkgver = ''
-        pkgvers = self._get_pkgvers(pkgname, self.pkgs_alpm)
+        pkgvers = self._get_pkgvers(pkgname, 'pkgs_alpm')
 
         if pkgvers and len(pkgvers) == 1:
             pkgver = pkgvers[0]
@@ -373,13 +515,72 @@ class PacmanRepo(PacmanRepoMetadata):
         return pkgver
 
     def get_pkgvers_filesystem(self, pkgname):
-        return self._get_pkgvers(pkgname, self.pkgs_fs)
+        return self._get_pkgvers(pkgname, 'pkgs_fs')
 
     def has_package_filesystem(self, pkgname):
-        return self._has_package(pkgname, self.pkgs_fs)
+        return self._has_package(pkgname, 'pkgs_fs')
 
     def has_package_alpm(self, pkgname):
-        return self._has_package(pkgname, self.pkgs_alpm)
+        return self._has_package(pkgname, 'pkgs_alpm')
+
+    def request_update(self, queue):
+        """
+        Request an update of this repo. Only one update job is queued at a time: requests
+        made before it starts are handled by it, so the updates for builds that finish close
+        together are done in a single pass over the repo. The job waits until `UPDATE_WINDOW`
+        seconds have passed since the first of its requests before it starts.
+
+        Args:
+            queue (rq.Queue): The repo queue.
+
+        Returns:
+            int: The request's number (see `wait_for_update()`).
+
+        """
+        request = db.hincrby(self.full_key, 'update_requested', 1)
+
+        if db.set(self._update_pending_key, time.time(), nx=True, ex=UPDATE_PENDING_TIMEOUT):
+            job_id = 'update_repo:{0}:{1}:{2}'.format(self.name, self.arch, request)
+            queue.enqueue_call(self.update_repo, timeout=UPDATE_TIMEOUT, job_id=job_id)
+
+        return request
+
+    def wait_for_update(self, request, timeout=UPDATE_TIMEOUT):
+        """
+        Wait until an update that started after `request` was made has finished. Waiters are
+        notified on `REPO_UPDATES_CHANNEL`, the counter is checked again every few seconds in
+        case a message is missed.
+
+        Args:
+            request (int): A request number returned by `request_update()`.
+            timeout (int): Give up after this many seconds.
+
+        Returns:
+            bool: `True` if the update succeeded, `False` if it failed or we timed out.
+
+        """
+        pubsub = db.pubsub(ignore_subscribe_messages=True)
+        deadline = time.monotonic() + timeout
+
+        pubsub.subscribe(REPO_UPDATES_CHANNEL)
+
+        try:
+            while self.update_completed < request:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    logger.error('Timed out waiting for %s %s repo update.', self.name, self.arch)
+                    return False
+
+                pubsub.get_message(timeout=min(remaining, 5))
+        finally:
+            pubsub.close()
+
+        if self.update_succeeded < request:
+            logger.error('The %s %s repo update failed.', self.name, self.arch)
+            return False
+
+        return True
 
     def sync_repo_packages_data(self):
         logger.debug('sync repo packages data!')
@@ -387,6 +588,7 @@ class PacmanRepo(PacmanRepoMetadata):
         self._determine_current_repo_state_fs()
         self._process_current_repo_states()
 
+    @redis_stats.job
     def update_repo(self):
         with Connection(db):
             current_job = get_current_job()
@@ -411,7 +613,28 @@ class PacmanRepo(PacmanRepoMetadata):
         msg = excluded[0] if 'antergos' == self.name else excluded[1]
         status.current_status = msg
 
-        self._update_repo()
+        requested_at = float(db.get(self._update_pending_key) or 0)
+        wait = requested_at + UPDATE_WINDOW - time.time()
+
+        if requested_at and wait > 0:
+            gevent.sleep(min(wait, UPDATE_WINDOW))
+
+        # Requests made from now on need another update (see `request_update()`).
+        db.delete(self._update_pending_key)
+        request = self.update_requested
+        succeeded = False
+
+        try:
+            succeeded = self._update_repo()
+        finally:
+            # Waiters check `update_succeeded` once `update_completed` covers their request.
+            if succeeded:
+                self.update_succeeded = request
+
+            self.update_completed = request
+            db.publish(REPO_UPDATES_CHANNEL, '{0}:{1}:{2}:{3}'.format(
+                self.name, self.arch, request, 'ok' if succeeded else 'failed'
+            ))
 
         trans_running = status.transactions_running or status.transaction_queue
 
@@ -423,6 +646,60 @@ class PacmanRepo(PacmanRepoMetadata):
             status.current_status = 'Idle.'
 
 
+def request_repo_updates(queue):
+    """
+    Request updates of all repos (see `PacmanRepo.request_update()`). The server status shows
+    that a review result is being processed and `status.repos_syncing` is set until the
+    updates have finished (see `finish_repo_updates()`).
+
+    Args:
+        queue (rq.Queue): The repo queue.
+
+    Returns:
+        list: `(repo, request)` tuples.
+
+    """
+    saved_status = set_server_status(True, is_review=True)
+
+    with contextlib.ExitStack() as cleanup:
+        cleanup.callback(set_server_status, False, saved_status)
+        cleanup.enter_context(status.repos_syncing_lock())
+
+        repos = [
+            get_repo_object(name, arch) for arch in ['x86_64', 'i686'] for name in status.repos
+        ]
+        updates = [(repo, repo.request_update(queue)) for repo in repos]
+        requests = [(repo.name, repo.arch, request) for repo, request in updates]
+
+        queue.enqueue_call(
+            finish_repo_updates, args=(requests, saved_status), timeout=UPDATE_TIMEOUT
+        )
+
+        # Both are released by `finish_repo_updates()` from now on.
+        cleanup.pop_all()
+
+    return updates
+
+
+@redis_stats.job
+def finish_repo_updates(requests, saved_status):
+    """
+    Restore the server status once the updates requested by `request_repo_updates()` have
+    finished. This is queued after the update jobs, so they have usually finished already.
+
+    Args:
+        requests (list): `(name, arch, request)` tuples.
+        saved_status (str|bool): The status returned by `set_server_status()`.
+
+    """
+    try:
+        with status.repos_syncing_lock():
+            for name, arch, request in requests:
+                get_repo_object(name, arch).wait_for_update(request)
+    finally:
+        set_server_status(False, saved_status)
+
+
 def get_repo_object(name, arch, path=None):
     path = path if path else status.REPO_BASE_DIR
 
@@ -53,7 +53,7 @@ class ServerStatus(RedisHash, metaclass=RedisSingleton):
               'docker_image_building', 'repo_locked_antergos', 'repo_locked_staging',
               'debug_toolbar_enabled', 'repos_synced_recently', 'repos_syncing'],
 
-        int=['building_num'],
+        int=['building_num', 'max_parallel_builds'],
 
         list=['completed', 'failed', 'transaction_queue', 'pending_review',
               'all_tl_events', 'build_queue', 'transactions_running', 'now_building'],
@@ -68,6 +68,7 @@ class ServerStatus(RedisHash, metaclass=RedisSingleton):
               'ISO_TRANSLATIONS_DESTDIR', 'ANTERGOS_ISO_DIR', 'TRANSIFEXRC']
     )
     can_expire = ['repos_synced_recently']
+    indexed = ['completed', 'failed']
     logger = None
 
     def __init__(self, prefix='status', key='', *args, **kwargs):
@@ -76,11 +77,12 @@ class ServerStatus(RedisHash, metaclass=RedisSingleton):
         super().__namespaceinit__()
 
         if not self or not self.status:
-            self.status = True
-            self.current_status = 'Idle'
-            self.idle = True
-            self.iso_flag = False
-            self.iso_building = False
+            with self.batched():
+                self.status = True
+                self.current_status = 'Idle'
+                self.idle = True
+                self.iso_flag = False
+                self.iso_building = False
 
         if self.logger is None:
             self.logger = get_logger_object(self)
@@ -101,22 +103,28 @@ class ServerStatus(RedisHash, metaclass=RedisSingleton):
     @contextlib.contextmanager
     def repos_syncing_lock(self):
         self.repos_syncing = True
-        yield
-        self.repos_syncing = False
+
+        try:
+            yield
+        finally:
+            self.repos_syncing = False
 
 
 class TimelineEvent(RedisHash, DateTimeStrings):
 
     attrib_lists = dict(
         string=['event_type', 'date_str', 'time_str', 'message', 'tnum'],
-        int=['event_id', 'tl_type'],
+        int=['event_id', 'tl_type', 'timestamp'],
         bool=[],
         list=['packages'],
         set=[],
         path=[]
     )
+    key_prefix = 'timeline'
+    key_arg = 'event_id'
 
-    def __init__(self, msg=None, tl_type=None, event_id=None, packages=None, tnum='', prefix='timeline'):
+    def __init__(self, msg=None, tl_type=None, event_id=None, packages=None, tnum='',
+                 prefix='timeline', snapshot=False):
         if not event_id and any(True for i in [msg, tl_type] if not i and 0 != i):
             raise ValueError('msg and tl_type required when event_id is not provided.')
 
@@ -124,29 +132,38 @@ class TimelineEvent(RedisHash, DateTimeStrings):
         if not event_id:
             the_id = self.db.incr('antbs:misc:event_id:next')
 
-        super().__init__(prefix=prefix, key=the_id)
+        super().__init__(prefix=prefix, key=the_id, snapshot=snapshot)
         self.__namespaceinit__()
 
         if not self or not self.event_id:
-            self.event_id = the_id
-            self.tnum = tnum
-            status.all_tl_events.append(self.event_id)
-            self.tl_type = tl_type
-            self.message = msg
             dt = datetime.datetime.now()
-            self.date_str = self.dt_date_to_string(dt)
-            self.time_str = self.dt_time_to_string(dt)
-            if packages:
-                packages = [p for p in packages if p]
-                for p in packages:
-                    self.packages.append(p)
+
+            with self.batched():
+                self.event_id = the_id
+                self.tnum = tnum
+                self.tl_type = tl_type
+                self.message = msg
+                self.date_str = self.dt_date_to_string(dt)
+                self.time_str = self.dt_time_to_string(dt)
+                self.timestamp = self.datetime_to_timestamp(dt)
+
+                if packages:
+                    packages = [p for p in packages if p]
+                    for p in packages:
+                        self.packages.append(p)
+
+            status.all_tl_events.append(the_id)
 
         if '/pkg/' in self.message:
             self.message = self.message.replace('/pkg/', '/package/')
 
 
-def get_timeline_object(event_id=None, msg=None, tl_type=None, packages=None, ret=True, tnum=''):
-    tl_obj = TimelineEvent(event_id=event_id, msg=msg, tl_type=tl_type, packages=packages, tnum=tnum)
+def get_timeline_object(event_id=None, msg=None, tl_type=None, packages=None, ret=True, tnum='',
+                        snapshot=False):
+    tl_obj = TimelineEvent(
+        event_id=event_id, msg=msg, tl_type=tl_type, packages=packages, tnum=tnum,
+        snapshot=snapshot
+    )
     if ret:
         return tl_obj
 
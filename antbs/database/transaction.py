@@ -24,18 +24,30 @@ import os
 import shutil
 import subprocess
 import tempfile
-import gevent
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    wait
+)
+from multiprocessing import Process
 
 from rq import (
     Connection,
     Queue,
+    get_current_job
 )
 
 from utils import (
     all_file_paths_exist,
     copy_or_symlink,
+    get_cpuset,
+    BuildCacheVolumes,
     try_run_command,
     DockerUtils,
+    GitMirror,
     PacmanPackageCache,
     remove
 )
@@ -45,7 +57,20 @@ from . import (
     get_build_object,
     get_pkg_object,
     status,
-    get_repo_object
+    get_repo_object,
+    redis_stats
+)
+
+from .build_cache import (
+    cache_build_result,
+    get_build_cache_key,
+    get_cached_build,
+    is_cacheable
+)
+from .build_node import (
+    BuildNode,
+    get_build_capacity,
+    get_node_queue
 )
 
 logger = status.logger
@@ -56,6 +81,102 @@ pkg_cache_obj = PacmanPackageCache()
 
 with Connection(status.db):
     repo_queue = Queue('update_repo')
+    maintenance_queue = Queue('maintenance')
+
+DEFAULT_MAX_PARALLEL_BUILDS = int(os.environ.get('ANTBS_MAX_PARALLEL_BUILDS', 2))
+
+# Where build nodes ship artifacts to (on the host that runs transactions).
+ARTIFACTS_DIR = os.environ.get('ANTBS_ARTIFACTS_DIR', '/var/tmp/antbs/artifacts')
+
+# These need more than a checkout of antergos-packages to build (see `handle_special_cases()`).
+LOCAL_ONLY_PKGS = ['cnchi-dev', 'cnchi']
+
+# Directories (under `antergos`) in which antergos-packages keeps packages.
+PKG_SUBDIRS = ['mate', 'cinnamon', 'liri', '']
+
+# Package cache cleanups run in the background at most once every `CACHE_CLEANUP_INTERVAL` seconds.
+CACHE_CLEANUP_KEY = 'antbs:misc:cache_cleanup'
+CACHE_CLEANUP_INTERVAL = 1800
+CACHE_CLEANUP_TIME_BUDGET = int(os.environ.get('ANTBS_CACHE_CLEANUP_TIME_BUDGET', 300))
+
+
+def find_build_directory(path, pkg):
+    """
+    Find a package's directory in an antergos-packages checkout.
+
+    Args:
+        path (str): Path to the checkout's `antergos` directory.
+        pkg (str):  The package's name.
+
+    Returns:
+        str: The package's directory.
+
+    Raises:
+        RuntimeError: If the package's directory can't be found.
+
+    """
+    for subdir in PKG_SUBDIRS:
+        pbpath = os.path.join(path, subdir, pkg)
+
+        if os.path.exists(pbpath):
+            return pbpath
+
+    raise RuntimeError('Unable to determine pb_path for {0}'.format(pkg))
+
+
+def checkout_packages(dest, packages, ref='HEAD'):
+    """
+    Check out the directories of `packages` from antergos-packages at `dest` (a worktree of
+    the local mirror, which is updated first).
+
+    Args:
+        dest (str):      Where to check out antergos-packages.
+        packages (list): Names of the packages that are needed.
+        ref (str):       What to check out.
+
+    Returns:
+        GitMirror: The mirror (see `GitMirror.remove_worktree()`).
+
+    """
+    mirror = GitMirror(status.gh_repo_url)
+    paths = [os.path.join('antergos', subdir, pkg) for pkg in packages for subdir in PKG_SUBDIRS]
+
+    mirror.update()
+    mirror.add_worktree(dest, ref=ref, paths=paths)
+
+    return mirror
+
+
+def cleanup_caches(time_budget=CACHE_CLEANUP_TIME_BUDGET):
+    """
+    Removes outdated packages from the pacman package cache and evicts build volumes (RQ job).
+
+    """
+    removed = PacmanPackageCache().maybe_do_cache_cleanup(time_budget=time_budget)
+
+    logger.info('Removed %s outdated packages from the pacman package cache.', removed)
+
+    BuildCacheVolumes().maybe_do_cache_cleanup()
+
+
+def schedule_cache_cleanup(queue):
+    """
+    Enqueues `cleanup_caches()` on `queue` unless a cleanup was scheduled within the last
+    `CACHE_CLEANUP_INTERVAL` seconds.
+
+    Args:
+        queue (rq.Queue): The queue to use.
+
+    Returns:
+        bool: `True` if the cleanup was scheduled, `False` otherwise.
+
+    """
+    if not status.db.set(CACHE_CLEANUP_KEY, 'True', nx=True, ex=CACHE_CLEANUP_INTERVAL):
+        return False
+
+    queue.enqueue_call(cleanup_caches, timeout=CACHE_CLEANUP_TIME_BUDGET * 2)
+
+    return True
 
 
 class TransactionMeta(RedisHash):
@@ -84,6 +205,8 @@ class TransactionMeta(RedisHash):
         set=['packages', 'builds', 'completed', 'failed', 'generated_pkgs'],
         path=['base_path', 'path', 'result_dir', 'cache', 'cache_i686', 'upd_repo_result']
     )
+    key_prefix = 'trans'
+    key_arg = 'tnum'
 
     def __init__(self, packages=None, tnum=None, base_path='/var/tmp/antbs', namespace='antbs',
                  prefix='trans', repo_queue=None):
@@ -104,18 +227,22 @@ class TransactionMeta(RedisHash):
         self._internal_deps = []
         self._build_dirpaths = {}
         self._pkgvers = {}
+        self._results_lock = threading.Lock()
+        self._repo_updates = {}
+        # Processes that builds running in worker threads need started (see `start_process()`).
+        self._process_requests = deque()
 
         if not self or not self.tnum:
-            self.tnum = the_tnum
-            self.base_path = base_path
-            self.cache = pkg_cache_obj.cache
-            self.cache_i686 = pkg_cache_obj.cache_i686
+            with self.batched():
+                self.tnum = the_tnum
+                self.base_path = base_path
+                self.cache = pkg_cache_obj.cache
+                self.cache_i686 = pkg_cache_obj.cache_i686
 
-            if packages:
-                packages = [p for p in packages if p]
+                if packages:
+                    packages = [p for p in packages if p]
 
-                for pkg in packages:
-                    self.packages.add(pkg)
+                    self.packages.add(*packages)
 
         for pkg in self.packages:
             self._build_dirpaths[pkg] = {'build_dir': '', '32bit': '', '32build': ''}
@@ -157,81 +284,390 @@ class Transaction(TransactionMeta):
             logger.debug('self._repo_queue is: %s', self._repo_queue)
             raise AttributeError('_repo_queue is required to start a transaction.')
 
-        status.current_status = 'Initializing build transaction.'
-        self.is_running = True
+        with redis_stats.phase('setup'):
+            status.current_status = 'Initializing build transaction.'
+            self.is_running = True
 
-        status.transactions_running.append(self.tnum)
-        self.setup_transaction_directory()
+            status.transactions_running.append(self.tnum)
+            self.setup_transaction_directory()
 
-        status.current_status = 'Processing packages.'
+        with redis_stats.phase('process_packages'):
+            status.current_status = 'Processing packages.'
 
-        self.process_packages()
+            self.process_packages()
 
         if self.sync_pkgbuilds_only:
             return
 
-        status.current_status = 'Cleaning pacman package cache.'
+        with redis_stats.phase('cache_cleanup'):
+            schedule_cache_cleanup(maintenance_queue)
 
-        if len(status.transactions_running) == 1:
-            PacmanPackageCache().maybe_do_cache_cleanup()
+        with redis_stats.phase('build'):
+            self.run_builds()
 
-        while self.queue:
-            pkg = self.queue.lpop()
-            build_dir = self.get_build_directory(pkg)
+        self.is_running = False
+        self.is_finished = True
+        status.transactions_running.remove(self.tnum)
 
-            if not build_dir:
-                raise RuntimeError('build_dir cannot be None.')
+        self.remove_transaction_directory()
 
-            pkg_obj = get_pkg_object(name=pkg)
-            bld_obj = get_build_object(pkg_obj=pkg_obj, tnum=self.tnum, trans_obj=self)
+    @staticmethod
+    def get_max_parallel_builds():
+        """
+        The number of builds a transaction may run at the same time: the total number of build
+        slots of the live build nodes (see `build_node`) or, when there are none, the number of
+        builds to run locally (`status.max_parallel_builds` or `ANTBS_MAX_PARALLEL_BUILDS`).
 
-            if pkg_obj.is_iso:
-                self.fetch_and_compile_translations(
-                    translations_for=["cnchi_updater", "antergos-gfxboot"]
-                )
-                result = bld_obj.start(pkg_obj)
-            else:
-                bld_obj = self.setup_build_directory(bld_obj, build_dir)
-                result = bld_obj.start(pkg_obj)
+        """
+        return get_build_capacity() or Transaction.get_max_local_builds()
+
+    @staticmethod
+    def get_max_local_builds():
+        """
+        The number of builds that may run on this host at the same time
+        (`status.max_parallel_builds` or `ANTBS_MAX_PARALLEL_BUILDS`). The host's cores are
+        split between them.
+
+        """
+        return max(status.max_parallel_builds or DEFAULT_MAX_PARALLEL_BUILDS, 1)
+
+    @staticmethod
+    def runs_on_node(pkg_obj):
+        """ Whether or not `pkg_obj` is built on a build node (see `run_build()`). """
+        return bool(
+            not pkg_obj.is_iso and pkg_obj.name not in LOCAL_ONLY_PKGS and get_build_capacity()
+        )
+
+    def run_builds(self):
+        """
+        Builds the packages in `queue`. Packages that don't depend on each other are built at
+        the same time (each one in its own container), up to `get_max_parallel_builds()` at a
+        time (and no more than `get_max_local_builds()` of them on this host). A package is only
+        started once all of the packages it depends on (in this transaction) have finished and
+        been added to the staging repos. Packages that depend on a failed build are skipped.
+        ISO builds always run on their own and staging repo updates are never run concurrently.
+
+        """
+        deps = {pkg: set(pkg_deps) for pkg, pkg_deps in self._internal_deps}
+        pending = [pkg for pkg in self.queue if pkg]
+        failed = set()
+        max_builds = self.get_max_parallel_builds()
+        max_local_builds = self.get_max_local_builds()
+        running = {}
+        # Each local build gets a slot and only uses the cores of its slot.
+        free_slots = list(range(max_local_builds))
+        slots = {}
+        iso_running = False
+
+        executor = ThreadPoolExecutor(max_workers=max_builds)
+
+        try:
+            while pending or running:
+                unfinished = set(pending) | set(running.values())
+                ready = [pkg for pkg in pending if not (deps.get(pkg, set()) & unfinished) - {pkg}]
+
+                if not ready and not running:
+                    # Only possible when there's a dependency cycle. Fall back to queue order.
+                    logger.error('Unable to satisfy build dependencies for: %s', pending)
+                    ready = pending[:1]
+
+                for pkg in ready:
+                    if iso_running or len(running) >= max_builds:
+                        break
+
+                    pkg_obj = get_pkg_object(name=pkg)
+                    on_node = self.runs_on_node(pkg_obj)
+
+                    if pkg_obj.is_iso and running:
+                        break
+
+                    if not on_node and not free_slots:
+                        continue
+
+                    pending.remove(pkg)
+                    self.queue.remove(pkg)
+
+                    bld_obj = self.prepare_build(pkg, pkg_obj)
+                    bld_obj._start_process = self.start_process
+
+                    if not on_node:
+                        slot = free_slots.pop(0)
+                        bld_obj._cpuset = get_cpuset(slot, max_local_builds)
+
+                    future = executor.submit(self.run_build, pkg_obj, bld_obj, on_node)
+                    running[future] = pkg
+                    slots[future] = None if on_node else slot
+                    iso_running = pkg_obj.is_iso
+
+                finished, _ = wait(running, timeout=1, return_when=FIRST_COMPLETED)
+                self.start_requested_processes()
+
+                for future in finished:
+                    pkg = running.pop(future)
+                    slot = slots.pop(future)
+                    iso_running = False
+
+                    if slot is not None:
+                        free_slots.append(slot)
+
+                    if future.exception() is not None:
+                        # Don't start anything else, the builds that are running are finished
+                        # below (they can't be interrupted).
+                        self.skip_builds(pending, 'build of {0} raised an error'.format(pkg))
+
+                        for other in running:
+                            other.cancel()
+
+                        raise future.exception()
+
+                    if future.result() is False:
+                        failed.add(pkg)
+                        self.skip_failed_dependents(pending, deps, failed)
+        finally:
+            # Builds that are still running may still need us to start processes for them.
+            while running:
+                finished, _ = wait(running, timeout=1)
+                self.start_requested_processes()
+
+                for future in finished:
+                    del running[future]
+
+            executor.shutdown()
+
+    def skip_failed_dependents(self, pending, deps, failed):
+        """
+        Removes the packages that depend on a failed build (directly or through other packages
+        in `pending`) from `pending` and `queue`.
+
+        Args:
+            pending (list): The packages that haven't been started yet.
+            deps (dict): The internal dependencies of each package (see `_internal_deps`).
+            failed (set): The packages whose builds failed. Skipped packages are added.
+
+        """
+        skipped = True
+
+        while skipped:
+            skipped = [pkg for pkg in pending if deps.get(pkg, set()) & failed]
+
+            for pkg in skipped:
+                failed_deps = ', '.join(sorted(deps[pkg] & failed))
+                self.skip_builds([pkg], 'its dependencies failed: {0}'.format(failed_deps))
+                pending.remove(pkg)
+                failed.add(pkg)
+
+    def skip_builds(self, pkgs, reason):
+        """ Removes `pkgs` from `queue` without building them. """
+        for pkg in pkgs:
+            logger.error('Not building %s, %s.', pkg, reason)
+            self.queue.remove(pkg)
+
+    def start_process(self, target):
+        """
+        Starts a `Process` for `target` from the thread running `run_builds()` and waits for it.
+        Builds run in worker threads and forking from them isn't safe (the child inherits any
+        locks that other threads are holding at the time).
+
+        Returns:
+            Process: The (started) process.
+
+        """
+
+        request = [target, threading.Event(), None]
+        self._process_requests.append(request)
+        request[1].wait()
+
+        if isinstance(request[2], Exception):
+            raise request[2]
+
+        return request[2]
+
+    def start_requested_processes(self):
+        """ Starts the processes that were requested with `start_process()`. """
+
+        while self._process_requests:
+            request = self._process_requests.popleft()
+            target, started, _ = request
+
+            try:
+                request[2] = Process(target=target)
+                request[2].start()
+            except Exception as err:
+                request[2] = err
+            finally:
+                started.set()
+
+    def prepare_build(self, pkg, pkg_obj):
+        build_dir = self.get_build_directory(pkg)
+
+        if not build_dir:
+            raise RuntimeError('build_dir cannot be None.')
+
+        bld_obj = get_build_object(pkg_obj=pkg_obj, tnum=self.tnum, trans_obj=self)
+
+        if pkg_obj.is_iso:
+            self.fetch_and_compile_translations(
+                translations_for=["cnchi_updater", "antergos-gfxboot"]
+            )
+        else:
+            bld_obj = self.setup_build_directory(bld_obj, build_dir)
+
+        return bld_obj
+
+    def run_build(self, pkg_obj, bld_obj, on_node=False):
+        """
+        Runs a single build and saves its results (this runs in a worker thread). The build
+        runs on a build node when `on_node` is set (see `runs_on_node()`), otherwise it
+        runs here.
+
+        Returns:
+            bool: The build's result (`None` if it didn't finish).
+
+        """
+        deps_ready = self.wait_for_staging_repo_updates(pkg_obj.name)
+
+        cache_key = self.get_build_cache_key(pkg_obj, bld_obj)
+        cached = cache_key and get_cached_build(cache_key)
+
+        if not deps_ready:
+            logger.error('Dependencies of %s are missing from the staging repos!', pkg_obj.name)
+            bld_obj.process_and_save_build_metadata(pkg_obj.version_str)
+            bld_obj.save_build_results(False)
+            result = False
+        elif cached:
+            logger.info('Reusing the result of build %s for %s', cached['bnum'], pkg_obj.name)
+            result = bld_obj.start_from_cache(pkg_obj, cached)
+        elif on_node:
+            result = self.run_build_on_node(pkg_obj, bld_obj)
+        else:
+            result = bld_obj.start(pkg_obj)
 
-            if result in [True, False]:
-                blds = pkg_obj.builds
-                total = len(blds)
+        if result is True and cache_key and not cached:
+            try:
+                cache_build_result(cache_key, bld_obj)
+            except OSError as err:
+                logger.error('Unable to cache the result of build %s: %s', bld_obj.bnum, err)
+
+        if result in [True, False]:
+            blds = list(pkg_obj.builds)
+            total = len(blds)
 
-                if total > 0:
-                    success = len([x for x in blds if x in status.completed])
-                    failure = len([x for x in blds if x in status.failed])
+            if total > 0:
+                success = status.completed.count_in(blds)
+                failure = status.failed.count_in(blds)
 
-                    if success > 0:
-                        success = 100 * success / total
+                if success > 0:
+                    success = 100 * success / total
 
-                    if failure > 0:
-                        failure = 100 * failure / total
+                if failure > 0:
+                    failure = 100 * failure / total
 
-                    pkg_obj.success_rate = success
-                    pkg_obj.failure_rate = failure
+                pkg_obj.success_rate = success
+                pkg_obj.failure_rate = failure
 
-                if result is True:
-                    if not pkg_obj.is_iso:
-                        gevent.sleep(2)
+            if result is True:
+                if not pkg_obj.is_iso:
+                    with self._results_lock:
                         self.move_files_to_staging_repo(bld_obj)
-                        repo_queue.enqueue_call(self._staging_repo.update_repo)
-                        repo_queue.enqueue_call(self._staging_repo32.update_repo)
-                        gevent.sleep(12)
 
-                    self.completed.append(bld_obj.bnum)
-                    doc_util.do_docker_clean(pkg_obj.name)
+                        if on_node:
+                            remove(os.path.join(ARTIFACTS_DIR, str(bld_obj.bnum)))
 
-                elif result is False:
-                    self.failed.append(bld_obj.bnum)
+                    self._repo_updates[pkg_obj.name] = [
+                        (repo, repo.request_update(self._repo_queue))
+                        for repo in [self._staging_repo, self._staging_repo32]
+                    ]
 
-            status.now_building.remove(bld_obj.bnum)
+                self.completed.append(bld_obj.bnum)
+                doc_util.do_docker_clean(pkg_obj.name)
 
-        self.is_running = False
-        self.is_finished = True
-        status.transactions_running.remove(self.tnum)
+            elif result is False:
+                self.failed.append(bld_obj.bnum)
+
+        status.now_building.remove(bld_obj.bnum)
+
+        return result
+
+    def wait_for_staging_repo_updates(self, pkg):
+        """
+        Wait until the packages built for `pkg`'s dependencies (in this transaction) have been
+        added to the staging repos, so that its build can install them.
+
+        Returns:
+            bool: `False` if any of the updates failed (or we timed out), `True` otherwise.
+
+        """
+        deps = dict(self._internal_deps).get(pkg, [])
+        result = True
 
-        remove(self.path)
+        for dep in deps:
+            for repo, request in self._repo_updates.get(dep, []):
+                result = repo.wait_for_update(request) and result
+
+        return result
+
+    def get_build_cache_key(self, pkg_obj, bld_obj):
+        """
+        Get the build cache key for a build (see `build_cache`). It covers the package's build
+        directory, the versions of its dependencies that are in our repos and the builder image.
+
+        Returns:
+            str: The key or an empty string if the build's result can't be cached.
+
+        """
+        if pkg_obj.is_iso or pkg_obj.name in LOCAL_ONLY_PKGS:
+            return ''
+
+        if not is_cacheable(bld_obj.build_dir):
+            return ''
+
+        deps = set(pkg_obj.get_deps()) | set(pkg_obj.get_deps(makedepends=True))
+        dep_versions = {}
+
+        # Staging is checked last so that its versions take precedence.
+        for repo in [self._main_repo, self._staging_repo]:
+            with repo.pkgvers_lookups():
+                for dep in deps:
+                    version = repo.get_pkgver_alpm(dep)
+
+                    if version:
+                        dep_versions[dep] = version
+
+        try:
+            image_id = doc.inspect_image('antergos/makepkg')['Id']
+        except Exception as err:
+            logger.error('Unable to get the builder image id: %s', err)
+            return ''
+
+        return get_build_cache_key(bld_obj.build_dir, dep_versions, image_id, pkg_obj.version_str)
+
+    def run_build_on_node(self, pkg_obj, bld_obj):
+        """ Hands a build to the build nodes and waits for its result. """
+        job = get_node_queue().enqueue_call(
+            build_on_node, args=(self.tnum, bld_obj.bnum, pkg_obj.name), timeout=84600
+        )
+
+        while True:
+            time.sleep(5)
+            job.refresh()
+
+            if job.is_finished or job.is_failed:
+                break
+
+            node_id = job.meta.get('build_node')
+
+            if node_id and not BuildNode(node_id).is_alive:
+                tpl = 'Build node %s stopped responding during build %s'
+                logger.error(tpl, node_id, bld_obj.bnum)
+                job.cancel()
+                break
+
+        if not job.is_finished and bld_obj.completed == bld_obj.failed:
+            # The node didn't get as far as saving the build's results.
+            logger.error('Build %s failed on its build node: %s', bld_obj.bnum, job.exc_info)
+            bld_obj.save_build_results(False)
+
+        return job.result if job.is_finished else False
 
     def setup_transaction_directory(self):
         path = tempfile.mkdtemp(prefix='{0}_'.format(str(self.tnum)), dir=self.base_path)
@@ -243,28 +679,13 @@ class Transaction(TransactionMeta):
         os.mkdir(self.result_dir, mode=0o777)
         os.mkdir(self.upd_repo_result, mode=0o777)
 
-        try:
-            subprocess.check_output(['/usr/bin/git', 'clone', status.gh_repo_url], cwd=path)
-        except subprocess.CalledProcessError as err:
-            raise RuntimeError(err.output)
+        checkout_packages(os.path.dirname(self.path), [p for p in self.packages if p])
 
-    def get_build_directory(self, pkg):
-        pbpath = None
-        paths = [
-            os.path.join(self.path, 'mate', pkg),
-            os.path.join(self.path, 'cinnamon', pkg),
-            os.path.join(self.path, 'liri', pkg),
-            os.path.join(self.path, pkg)
-        ]
-
-        for p in paths:
-            if os.path.exists(p):
-                pbpath = p
-                break
-        else:
-            raise RuntimeError('Unable to determine pb_path for {0}'.format(pkg))
+    def remove_transaction_directory(self):
+        GitMirror(status.gh_repo_url).remove_worktree(os.path.dirname(self.path))
 
-        return pbpath
+    def get_build_directory(self, pkg):
+        return find_build_directory(self.path, pkg)
 
     def setup_build_directory(self, bld_obj, build_dir):
 
@@ -287,7 +708,7 @@ class Transaction(TransactionMeta):
         return bld_obj
 
     def handle_special_cases(self, pkg, pkg_obj):
-        if pkg not in ['cnchi-dev', 'cnchi']:
+        if pkg not in LOCAL_ONLY_PKGS:
             return
 
         pkg_obj.prepare_package_source(self.get_build_directory(pkg))
@@ -515,6 +936,104 @@ class Transaction(TransactionMeta):
             logger.error(err)
 
 
+def ship_build_artifacts(bld_obj, node):
+    """
+    Copy a build's packages (and signatures) to `ARTIFACTS_DIR` on the host that runs
+    transactions and point `bld_obj.generated_files` at the copies.
+
+    Args:
+        bld_obj (Build):    The build.
+        node (BuildNode):   The node the build ran on.
+
+    Returns:
+        bool: `True` if the artifacts were copied, `False` otherwise.
+
+    """
+    dest_dir = os.path.join(ARTIFACTS_DIR, str(bld_obj.bnum))
+    files = list(bld_obj.generated_files)
+    cmd = ['/usr/bin/rsync', '-a']
+
+    if node.artifact_host:
+        cmd.extend(['--rsync-path', 'mkdir -p {0} && rsync'.format(dest_dir)])
+        cmd.extend(files + ['{0}:{1}/'.format(node.artifact_host, dest_dir)])
+    else:
+        os.makedirs(dest_dir, exist_ok=True)
+        cmd.extend(files + [dest_dir + '/'])
+
+    success, res = try_run_command(cmd, cwd=node.base_path, logger=logger)
+
+    if not success:
+        logger.error('Unable to ship artifacts for build %s: %s', bld_obj.bnum, res)
+        return False
+
+    bld_obj.generated_files.delete()
+    bld_obj.generated_files.extend([os.path.join(dest_dir, os.path.basename(f)) for f in files])
+
+    return True
+
+
+def build_on_node(tnum, bnum, pkgname):
+    """
+    Runs a build for a transaction on this build node (this is an RQ job, see
+    `Transaction.run_build_on_node()`). The node uses its own checkout of antergos-packages and
+    ships the build's artifacts back to the host that runs transactions.
+
+    Args:
+        tnum (int):    The transaction's number.
+        bnum (int):    The build's number.
+        pkgname (str): The package to build.
+
+    Returns:
+        bool: The build's result.
+
+    """
+    node = BuildNode(os.environ.get('ANTBS_BUILD_NODE_ID'))
+    pkg_obj = get_pkg_object(name=pkgname)
+    bld_obj = get_build_object(bnum=bnum)
+    bld_obj._trans_obj = get_trans_object(tnum=tnum)
+    path = tempfile.mkdtemp(prefix='{0}_'.format(bnum), dir=node.base_path)
+
+    with Connection(status.db):
+        current_job = get_current_job()
+        current_job.meta['build_node'] = node.node_id
+        current_job.save_meta()
+
+    node.build_started(bnum)
+
+    checkout = os.path.join(path, 'antergos-packages')
+    mirror = None
+
+    try:
+        ref = bld_obj._trans_obj.gh_sha_after or 'HEAD'
+        mirror = checkout_packages(checkout, [pkgname], ref=ref)
+
+        build_dir = find_build_directory(os.path.join(checkout, 'antergos'), pkgname)
+        build_dirs = {
+            'build_dir': build_dir,
+            '_32bit': os.path.join(build_dir, '32bit'),
+            '_32build': os.path.join(build_dir, '32build'),
+            'result_dir': os.path.join(path, 'result', pkgname)
+        }
+
+        for attrib, build_path in build_dirs.items():
+            os.makedirs(build_path, mode=0o777, exist_ok=True)
+            setattr(bld_obj, attrib, build_path)
+
+        # Ship before the result is saved so that a build is never recorded as successful
+        # unless its packages made it to the host that runs transactions.
+        bld_obj._deliver_results = lambda bld: ship_build_artifacts(bld, node)
+
+        return bld_obj.start(pkg_obj)
+
+    finally:
+        node.build_finished()
+
+        if mirror is not None:
+            mirror.remove_worktree(checkout)
+
+        remove(path)
+
+
 def get_trans_object(packages=None, tnum=None, repo_queue=None):
     """
     Gets an existing transaction or creates a new one.
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  redis_connection.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Redis connection factory. Everything that talks to redis gets its connections from here so
+that they can be configured in one place using these environment variables:
+
+    ANTBS_REDIS_URL                    `unix:///path/to.sock`, `redis://host:port/db` or
+                                       `fakeredis://` (in-process server, for tests and
+                                       benchmarks). Default: `unix:///var/run/redis/redis.sock`
+    ANTBS_REDIS_MAX_CONNECTIONS        Max connections per process. When set, a blocking pool
+                                       is used (callers wait for a free connection).
+    ANTBS_REDIS_POOL_TIMEOUT           Seconds to wait for a free connection before raising
+                                       `ConnectionError`. Default: 20
+    ANTBS_REDIS_SOCKET_TIMEOUT         Socket timeout in seconds. Default: no timeout
+    ANTBS_REDIS_SOCKET_KEEPALIVE       Enable TCP keepalive (`redis://` only). Default: False
+    ANTBS_REDIS_HEALTH_CHECK_INTERVAL  Ping idle connections before reuse after this many
+                                       seconds (requires redis-py >= 3.3). Default: disabled
+
+"""
+
+import inspect
+import logging
+import os
+
+import redis
+
+DEFAULT_URL = 'unix:///var/run/redis/redis.sock'
+
+logger = logging.getLogger('antbs')
+
+_pools = {}
+_fake_server = None
+
+
+def _env(name, value_type=str, default=None):
+    value = os.environ.get(name, '')
+
+    if '' == value:
+        return default
+
+    if value_type is bool:
+        return value.lower() in ['1', 'true', 'yes', 'on']
+
+    return value_type(value)
+
+
+def _supports(option):
+    return option in inspect.signature(redis.Connection.__init__).parameters
+
+
+def _fakeredis_pool_kwargs():
+    global _fake_server
+
+    try:
+        import fakeredis
+    except ImportError:
+        raise RuntimeError('fakeredis must be installed to use a fakeredis:// url.')
+
+    if _fake_server is None:
+        _fake_server = fakeredis.FakeServer()
+
+    return dict(connection_class=fakeredis.FakeConnection, server=_fake_server)
+
+
+def get_redis_url():
+    """ The url of the redis server we should connect to (see module docstring). """
+    return _env('ANTBS_REDIS_URL', default=DEFAULT_URL)
+
+
+def get_connection_pool(url=None, decode_responses=True):
+    """
+    Get the connection pool for `url`, creating it on first use. Pools are shared by all
+    clients in the process that connect to the same url.
+
+    Args:
+        url (str):               Redis url. Default: `get_redis_url()`
+        decode_responses (bool): Decode responses to `str`.
+
+    Returns:
+        redis.ConnectionPool: The pool.
+
+    """
+    url = url or get_redis_url()
+    pool_key = (url, decode_responses)
+
+    if pool_key in _pools:
+        return _pools[pool_key]
+
+    max_connections = _env('ANTBS_REDIS_MAX_CONNECTIONS', int)
+    socket_timeout = _env('ANTBS_REDIS_SOCKET_TIMEOUT', float)
+    health_check_interval = _env('ANTBS_REDIS_HEALTH_CHECK_INTERVAL', int)
+    pool_cls = redis.ConnectionPool
+    kwargs = dict(decode_responses=decode_responses)
+
+    if max_connections:
+        pool_cls = redis.BlockingConnectionPool
+        kwargs['max_connections'] = max_connections
+        kwargs['timeout'] = _env('ANTBS_REDIS_POOL_TIMEOUT', int, 20)
+
+    if socket_timeout:
+        kwargs['socket_timeout'] = socket_timeout
+
+    if url.startswith('redis://') and _env('ANTBS_REDIS_SOCKET_KEEPALIVE', bool, False):
+        kwargs['socket_keepalive'] = True
+
+    if health_check_interval and _supports('health_check_interval'):
+        kwargs['health_check_interval'] = health_check_interval
+    elif health_check_interval:
+        logger.warning('Redis health checks require redis-py >= 3.3, ignoring.')
+
+    if url.startswith('fakeredis://'):
+        kwargs.update(_fakeredis_pool_kwargs())
+        kwargs.pop('socket_timeout', None)
+        pool = pool_cls(**kwargs)
+    else:
+        pool = pool_cls.from_url(url, **kwargs)
+
+    _pools[pool_key] = pool
+
+    return pool
+
+
+def get_redis(client_cls=redis.StrictRedis, url=None, decode_responses=True):
+    """
+    Get a redis client that uses the shared connection pool for `url`.
+
+    Args:
+        client_cls (type):       The client class to instantiate.
+        url (str):               Redis url. Default: `get_redis_url()`
+        decode_responses (bool): Decode responses to `str`.
+
+    Returns:
+        redis.StrictRedis: The client (an instance of `client_cls`).
+
+    """
+    return client_cls(connection_pool=get_connection_pool(url, decode_responses))
@@ -37,10 +37,10 @@ from rq import (
 )
 
 from database import (
-    get_repo_object,
     db,
     status,
-    get_trans_object
+    get_trans_object,
+    redis_stats
 )
 
 from utils import (
@@ -59,6 +59,7 @@ with Connection(db):
     w2 = Worker([repo_queue])
 
 
+@redis_stats.job
 def handle_hook():
     saved_status = set_server_status(first=True)
 
@@ -98,20 +99,3 @@ def handle_hook():
         status.building_start = ''
         status.iso_building = False
         logger.info('All builds completed.')
-
-
-def update_repo_databases():
-    with Connection(db):
-        current_job = get_current_job()
-        if 'update_repo' != current_job.origin:
-            logger.error('Only the repo worker can update repos!')
-            return
-
-    saved_status = set_server_status(True, is_review=True)
-    repos = [get_repo_object(repo, arch) for arch in ['x86_64', 'i686'] for repo in status.repos]
-
-    with status.repos_syncing_lock():
-        for antergos_repo in repos:
-            antergos_repo.update_repo()
-
-    set_server_status(False, saved_status)
@@ -24,12 +24,14 @@
 from .utility_functions import (
     truncate_middle,
     try_run_command,
+    vercmp,
     remove,
     symlink,
     copy_or_symlink,
     quiet_down_noisy_loggers,
     all_file_paths_exist,
     get_build_queue,
+    get_cpuset,
     recursive_chown,
     set_server_status,
     get_current_user,
@@ -40,12 +42,14 @@ from .utility_classes import (
     Singleton,
     DateTimeStrings,
     PacmanPackageCache,
+    BuildCacheVolumes,
     CustomSet,
     RQWorkerCustomExceptionHandler,
     MyLock
 )
 
 from .docker_util import DockerUtils
+from .git_mirror import GitMirror
 from .sign_pkgs import sign_packages, batch_sign
 from .pkgbuild import Pkgbuild
 from .pagination import Pagination
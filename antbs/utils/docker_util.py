@@ -88,13 +88,17 @@ class DockerUtils(metaclass=Singleton):
             return host_configs[config_for](*args, **kwargs)
 
     def create_pkgs_host_config(self, pkgbuild_dir, result_dir=None, cache_dir_x86_64=None,
-                                cache_dir_i686=None, _32build=None, _32bit=None):
+                                cache_dir_i686=None, _32build=None, _32bit=None, ccache_dir=None,
+                                srcdest_dir=None, cpuset=None):
         """
 
         :param cache_i686:
         :param cache:
         :param pkgbuild_dir:
         :param result_dir:
+        :param ccache_dir: The package's ccache directory (see `BuildCacheVolumes`)
+        :param srcdest_dir: The shared source download directory (see `BuildCacheVolumes`)
+        :param cpuset: The cores the container may use (see `utils.get_cpuset`)
         :return:
         """
         required_args = [result_dir, _32build, _32bit, pkgbuild_dir]
@@ -152,8 +156,18 @@ class DockerUtils(metaclass=Singleton):
 
         binds[result_dir] = {'bind': '/result', 'ro': False}
 
+        if ccache_dir:
+            binds[ccache_dir] = {'bind': '/ccache', 'ro': False}
+
+        if srcdest_dir:
+            binds[srcdest_dir] = {'bind': '/srcdest', 'ro': False}
+
+        # Concurrent builds each get their own cores: transactions pass the cores of the
+        # build's slot, build node workers set ANTBS_BUILD_CPUSET (see build_node_worker.py).
+        cpuset = cpuset or os.environ.get('ANTBS_BUILD_CPUSET', '0-2')
+
         pkgs_hconfig = self.doc.create_host_config(
-            binds=binds, privileged=True, mem_limit='5G', memswap_limit='-1', cpuset_cpus='0-2'
+            binds=binds, privileged=True, mem_limit='5G', memswap_limit='-1', cpuset_cpus=cpuset
         )
         return pkgs_hconfig
 
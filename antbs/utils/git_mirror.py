@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# git_mirror.py
+#
+# Copyright © 2013-2017 Antergos
+#
+# This file is part of The Antergos Build Server, (AntBS).
+#
+# AntBS is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# AntBS is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# The following additional terms are in effect as per Section 7 of the license:
+#
+# The preservation of all legal notices and author attributions in
+# the material or in the Appropriate Legal Notices displayed
+# by works containing it is required.
+#
+# You should have received a copy of the GNU General Public License
+# along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+""" Persistent Local Git Mirrors """
+
+import contextlib
+import fcntl
+import os
+import re
+import shutil
+import subprocess
+
+MIRRORS_DIR = os.environ.get('ANTBS_GIT_MIRRORS_DIR', '/var/tmp/antbs/mirrors')
+
+
+class GitMirror:
+    """
+    A bare mirror of a remote git repository that is kept on disk and updated incrementally.
+    Checkouts are created from the mirror (as worktrees or local clones) instead of cloning
+    the remote repository every time. All operations that change the mirror hold a lock so
+    that it can be used by several processes at once.
+
+    Args:
+        url (str):         The remote repository's url.
+        mirrors_dir (str): Where mirrors are stored (`ANTBS_GIT_MIRRORS_DIR`).
+
+    Attributes:
+        path (str): The mirror's path.
+
+    """
+
+    def __init__(self, url, mirrors_dir=MIRRORS_DIR):
+        self.url = url
+        name = re.sub(r'[^\w.-]+', '_', url.split('://')[-1])
+        self.path = os.path.join(mirrors_dir, name + '.git')
+
+    @staticmethod
+    def _git(*args, cwd=None):
+        try:
+            return subprocess.check_output(
+                ['/usr/bin/git'] + list(args), cwd=cwd, stderr=subprocess.STDOUT,
+                universal_newlines=True
+            )
+        except subprocess.CalledProcessError as err:
+            raise RuntimeError(err.output)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update(self):
+        """ Create the mirror or fetch what's new from the remote repository. """
+        with self._locked():
+            if not os.path.exists(self.path):
+                self._git('clone', '--mirror', self.url, self.path)
+            else:
+                self._git('fetch', '--prune', 'origin', cwd=self.path)
+
+    def add_worktree(self, dest, ref='HEAD', paths=None):
+        """
+        Check out `ref` at `dest` as a worktree of the mirror (`dest` must not exist).
+
+        Args:
+            dest (str):   Where the worktree should be created.
+            ref (str):    What to check out.
+            paths (list): Only check out these directories (and files in the top directory).
+                          Directories that don't exist are ignored. Everything when `None`.
+
+        """
+        with self._locked():
+            if not paths:
+                self._git('worktree', 'add', '--detach', dest, ref, cwd=self.path)
+                return
+
+            self._git('worktree', 'add', '--no-checkout', '--detach', dest, ref, cwd=self.path)
+
+        self._git('sparse-checkout', 'set', *paths, cwd=dest)
+        self._git('reset', '--quiet', '--hard', cwd=dest)
+
+    def remove_worktree(self, dest):
+        """ Delete a worktree created by `add_worktree()`. """
+        with self._locked():
+            shutil.rmtree(dest, ignore_errors=True)
+            self._git('worktree', 'prune', cwd=self.path)
+
+    def clone_to(self, dest):
+        """
+        Create a standalone clone of the mirror at `dest` (objects are hardlinked when possible)
+        whose `origin` is the remote repository.
+
+        """
+        with self._locked():
+            self._git('clone', '--quiet', self.path, dest)
+
+        self._git('remote', 'set-url', 'origin', self.url, cwd=dest)
@@ -28,14 +28,15 @@
 
 """ Various utility classes, metaclasses, and mixins """
 
-import glob
+import json
 import logging
 import os
+import time
 
 import gevent
 from redis.exceptions import LockError
 
-from . import remove
+from . import remove, vercmp
 
 
 class Singleton(type):
@@ -64,13 +65,227 @@ class DateTimeStrings:
 
 
 class PacmanPackageCache(metaclass=Singleton):
+    """
+    The pacman package caches that are shared by makepkg containers. Cleaning them up removes
+    every package file (and its signature) that isn't the newest version of its package for
+    its architecture, as determined by `vercmp()`.
+
+    Each cache directory is scanned once per cleanup. When `use_index` is enabled the newest
+    file of each package is saved to an index next to the directory (along with the
+    directory's mtime) so that unchanged directories are skipped and only files added since
+    the last cleanup have to be compared.
+
+    Args:
+        cache_dir (str):  The (x86_64) cache directory. The i686 cache is derived from it.
+        use_index (bool): Keep an on-disk index for each cache directory.
+
+    """
 
     doing_cache_cleanup = False
 
-    def __init__(self, cache_dir='/var/tmp/pkg_cache/pkg'):
+    def __init__(self, cache_dir='/var/tmp/pkg_cache/pkg', use_index=True):
         self.cache = cache_dir
         self.cache_i686 = cache_dir.replace('cache', 'cache_i686')
         self.all_caches = [self.cache, self.cache_i686]
+        self.use_index = use_index
+
+    @staticmethod
+    def _get_index_path(cache_dir):
+        # Not inside the cache dir, writing it would change the dir's mtime.
+        return '{0}.antbs-index.json'.format(cache_dir.rstrip('/'))
+
+    @staticmethod
+    def parse_package_filename(filename):
+        """
+        Parse a package file's name (eg. `name-1:1.0-1-x86_64.pkg.tar.xz`).
+
+        Returns:
+            tuple: `(name, version, arch)` or `None` if it's not a package file.
+
+        """
+        base, sep, ext = filename.partition('.pkg.tar')
+
+        if not sep or ext.endswith('.sig') or ext.endswith('.part'):
+            return None
+
+        try:
+            name, pkgver, pkgrel, arch = base.rsplit('-', 3)
+        except ValueError:
+            return None
+
+        return name, '{0}-{1}'.format(pkgver, pkgrel), arch
+
+    def _load_index(self, cache_dir):
+        try:
+            with open(self._get_index_path(cache_dir)) as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, cache_dir, newest):
+        index_path = self._get_index_path(cache_dir)
+        tmp_path = '{0}.tmp'.format(index_path)
+        index = dict(mtime=os.stat(cache_dir).st_mtime_ns, newest=newest)
+
+        with open(tmp_path, 'w') as index_file:
+            json.dump(index, index_file)
+
+        os.replace(tmp_path, index_path)
+
+    def _cleanup_cache_dir(self, cache_dir, deadline=None):
+        index = self._load_index(cache_dir) if self.use_index else {}
+
+        if index and index.get('mtime') == os.stat(cache_dir).st_mtime_ns:
+            # Nothing was added or removed since the last cleanup.
+            return 0, True
+
+        filenames = set(entry.name for entry in os.scandir(cache_dir) if entry.is_file())
+        # '<name> <arch>' -> [version, filename]
+        newest = {
+            key: kept for key, kept in index.get('newest', {}).items() if kept[1] in filenames
+        }
+        known = set(kept[1] for kept in newest.values())
+        outdated = []
+
+        for filename in filenames - known:
+            parsed = self.parse_package_filename(filename)
+
+            if parsed is None:
+                continue
+
+            name, version, arch = parsed
+            key = '{0} {1}'.format(name, arch)
+            kept = newest.get(key)
+
+            if kept is None:
+                newest[key] = [version, filename]
+            elif vercmp(version, kept[0]) > 0:
+                outdated.append(kept[1])
+                newest[key] = [version, filename]
+            else:
+                outdated.append(filename)
+
+        removed = 0
+
+        for filename in outdated:
+            if deadline is not None and time.monotonic() > deadline:
+                return removed, False
+
+            for path in [filename, '{0}.sig'.format(filename)]:
+                if path in filenames:
+                    remove(os.path.join(cache_dir, path))
+
+            removed += 1
+
+        if self.use_index:
+            self._save_index(cache_dir, newest)
+
+        return removed, True
+
+    def maybe_do_cache_cleanup(self, time_budget=None):
+        """
+        Remove outdated package files from the caches.
+
+        Args:
+            time_budget (int): Stop removing files after this many seconds (the next cleanup
+                               picks up where this one stopped).
+
+        Returns:
+            int: The number of package files that were removed.
+
+        """
+        if self.doing_cache_cleanup:
+            return 0
+
+        self.doing_cache_cleanup = True
+        deadline = None if time_budget is None else time.monotonic() + time_budget
+        removed = 0
+
+        try:
+            for cache_dir in self.all_caches:
+                if not os.path.exists(cache_dir):
+                    os.makedirs(cache_dir, mode=0o777)
+                    continue
+
+                count, finished = self._cleanup_cache_dir(cache_dir, deadline)
+                removed += count
+
+                if not finished:
+                    logging.info('Pacman package cache cleanup ran out of time.')
+                    break
+        finally:
+            self.doing_cache_cleanup = False
+
+        return removed
+
+
+class BuildCacheVolumes(metaclass=Singleton):
+    """
+    Persistent volumes for makepkg containers: a ccache directory for each package (mounted at
+    `/ccache`) and a source download directory shared by all packages (`SRCDEST`, mounted at
+    `/srcdest`). Both are kept under their size limit by removing whatever was used least
+    recently (package ccache directories are marked as used when a build gets them, sources
+    by their access time).
+
+    Args:
+        base_dir (str): Where the volumes are kept (`ANTBS_BUILD_VOLUMES_DIR`).
+
+    Attributes:
+        ccache_max_size (int):  Max size of all ccache directories in bytes
+                                (`ANTBS_CCACHE_MAX_GB`).
+        srcdest_max_size (int): Max size of `SRCDEST` in bytes (`ANTBS_SRCDEST_MAX_GB`).
+        pkg_ccache_size (str):  Max size of a package's ccache directory, enforced by ccache
+                                itself (`ANTBS_CCACHE_PKG_MAX_SIZE`).
+
+    """
+
+    doing_cache_cleanup = False
+
+    def __init__(self, base_dir=None):
+        base_dir = base_dir or os.environ.get('ANTBS_BUILD_VOLUMES_DIR', '/var/tmp/antbs/volumes')
+        self.ccache_dir = os.path.join(base_dir, 'ccache')
+        self.srcdest_dir = os.path.join(base_dir, 'srcdest')
+        self.ccache_max_size = int(os.environ.get('ANTBS_CCACHE_MAX_GB', 50)) * 1024 ** 3
+        self.srcdest_max_size = int(os.environ.get('ANTBS_SRCDEST_MAX_GB', 100)) * 1024 ** 3
+        self.pkg_ccache_size = os.environ.get('ANTBS_CCACHE_PKG_MAX_SIZE', '5G')
+
+    @staticmethod
+    def _get_size(path):
+        if not os.path.isdir(path):
+            return os.lstat(path).st_size
+
+        return sum(
+            os.lstat(os.path.join(root, name)).st_size
+            for root, dirs, files in os.walk(path)
+            for name in files
+        )
+
+    def _evict_least_recently_used(self, cache_dir, max_size, last_used):
+        entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)]
+        sizes = {entry: self._get_size(entry) for entry in entries}
+        total = sum(sizes.values())
+
+        for entry in sorted(entries, key=last_used):
+            if total <= max_size:
+                break
+
+            logging.info('Removing %s from build cache volume (least recently used).', entry)
+            remove(entry)
+            total -= sizes[entry]
+
+    def get_ccache_dir(self, pkgname):
+        """ Get the ccache directory for a package (and mark it as used). """
+        path = os.path.join(self.ccache_dir, pkgname)
+
+        os.makedirs(path, mode=0o777, exist_ok=True)
+        os.utime(path)
+
+        return path
+
+    def get_srcdest_dir(self):
+        os.makedirs(self.srcdest_dir, mode=0o777, exist_ok=True)
+
+        return self.srcdest_dir
 
     def maybe_do_cache_cleanup(self):
         if self.doing_cache_cleanup:
@@ -78,39 +293,49 @@ class PacmanPackageCache(metaclass=Singleton):
 
         self.doing_cache_cleanup = True
 
-        for cache_dir in self.all_caches:
-            if not os.path.exists(cache_dir):
-                os.mkdir(cache_dir, mode=0o777)
-            elif os.path.exists(cache_dir):
-                already_checked = []
-                for path, dir_name, pkg_files in os.walk(cache_dir):
-                    for pkg_file in pkg_files:
-                        try:
-                            pkg, version, rel, suffix = pkg_file.rsplit('-', 3)
-                        except ValueError:
-                            logging.error('value error for %s', pkg_file)
-                            continue
-                        # Use globbing to check for multiple versions of the package.
-                        all_versions = glob.glob('{0}/{1}***.xz'.format(cache_dir, pkg))
-                        if pkg in already_checked:
-                            # We've already handled all versions of this package.
-                            continue
-                        elif len(all_versions) < 2:
-                            # There is only one version of the package in this cache dir, keep it.
-                            already_checked.append(pkg)
-                            continue
-                        elif pkg not in already_checked and len(all_versions) > 1:
-                            # There are multiple versions of the package. Determine the latest.
-                            newest = max(glob.iglob('{0}/{1}**.xz'.format(cache_dir, pkg)),
-                                         key=os.path.getctime)
-                            logging.debug(newest)
-                            logging.debug(all_versions)
-                            for package_file in all_versions:
-                                if package_file != newest:
-                                    # This file is not the newest. Remove it.
-                                    remove(package_file)
-
-        self.doing_cache_cleanup = False
+        try:
+            if os.path.exists(self.ccache_dir):
+                self._evict_least_recently_used(
+                    self.ccache_dir, self.ccache_max_size, lambda path: os.stat(path).st_mtime
+                )
+
+            if os.path.exists(self.srcdest_dir):
+                self._evict_least_recently_used(
+                    self.srcdest_dir,
+                    self.srcdest_max_size,
+                    lambda path: max(os.stat(path).st_atime, os.stat(path).st_mtime)
+                )
+        finally:
+            self.doing_cache_cleanup = False
+
+    @staticmethod
+    def read_ccache_stats(result_dir):
+        """
+        Read the ccache stats written by the makepkg container (`ccache --print-stats`).
+
+        Returns:
+            dict: `hits` and `misses` (empty if there are no stats).
+
+        """
+        stats_file = os.path.join(result_dir, 'ccache-stats')
+        stats = {}
+
+        if not os.path.exists(stats_file):
+            return {}
+
+        with open(stats_file) as stats_data:
+            for line in stats_data:
+                key, _, value = line.strip().partition('\t')
+
+                if value.isdigit():
+                    stats[key] = int(value)
+
+        remove(stats_file)
+
+        return dict(
+            hits=stats.get('direct_cache_hit', 0) + stats.get('preprocessed_cache_hit', 0),
+            misses=stats.get('cache_miss', 0)
+        )
 
 
 class CustomSet(set):
@@ -27,6 +27,7 @@
 #  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import multiprocessing
 import os
 import shutil
 import subprocess
@@ -78,11 +79,20 @@ def set_uid_and_gid():
     os.setresuid(33, 33, uid)
 
 
+HTTP_UID = HTTP_GID = 33
+
+
+def _chown_to_http_user(path):
+    # Builds run in threads that share the process, so files are handed over with chown
+    # instead of switching the (process-wide) effective uid while we work on them.
+    os.lchown(path, HTTP_UID, HTTP_GID)
+
+
 def copy_or_symlink(src, dst, logger=None):
     """
     Copies the file at `src` to `dst`. If `src` is a symlink the link will be
     followed to get the file that will be copied. If `dst` is a symlink then it will
-    be removed.
+    be removed. The result is owned by the http user.
 
     Args:
         src (str): The path to the file that will be copied.
@@ -90,14 +100,12 @@ def copy_or_symlink(src, dst, logger=None):
 
     """
 
-    uid = os.geteuid()
-    gid = os.getegid()
-
-    os.setegid(33)
-    os.seteuid(33)
-
     if logger:
         logger.debug([src, dst])
+
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+
     if os.path.islink(src):
         linkto = os.readlink(src)
         os.symlink(linkto, dst)
@@ -105,47 +113,49 @@ def copy_or_symlink(src, dst, logger=None):
         try:
             shutil.copy(src, dst)
         except shutil.SameFileError:
-            if os.path.islink(dst):
-                os.unlink(dst)
-                shutil.copy(src, dst)
+            if not os.path.islink(dst):
+                return
+            os.unlink(dst)
+            shutil.copy(src, dst)
         except Exception as err:
-            logger.error(err)
+            if logger:
+                logger.error(err)
+            return
 
-    os.setegid(gid)
-    os.seteuid(uid)
+    _chown_to_http_user(dst)
 
 
 def symlink(src, dst, relative_to=None):
     """
     Creates a symbolic link at `dst` to the file at `src`. If `src` is a symlink the
     link will be followed to get the actual file that will be linked at `dst`. If `dst`
-    is a symlink then it will be removed.
+    is a symlink then it will be removed. The link is owned by the http user.
 
     Args:
         src (str): The path to the file that will be linked.
         dst (str): The path at which the link to the file at `src` should be created.
+        relative_to (str): Resolve relative paths against this directory.
 
     """
 
-    uid = os.geteuid()
-    gid = os.getegid()
-
-    os.setegid(33)
-    os.seteuid(33)
-
     if relative_to:
-        os.chdir(relative_to)
+        # Don't chdir(), the working directory is shared by all threads.
+        src_path = os.path.join(relative_to, src)
+        dst = os.path.join(relative_to, dst)
+    else:
+        src_path = src
 
-    if os.path.islink(src):
-        src = os.readlink(src) if not relative_to else os.path.relpath(os.readlink(src))
+    if os.path.islink(src_path):
+        src = os.readlink(src_path)
+
+        if relative_to:
+            src = os.path.relpath(os.path.join(relative_to, src), relative_to)
 
     if os.path.islink(dst):
         os.unlink(dst)
 
     os.symlink(src, dst)
-
-    os.setegid(gid)
-    os.seteuid(uid)
+    _chown_to_http_user(dst)
 
 
 def quiet_down_noisy_loggers():
@@ -194,6 +204,114 @@ def try_run_command(cmd, cwd, logger=None):
     return success, res
 
 
+def _rpmvercmp(one, two):
+    # Port of rpmvercmp() from libalpm's version.c
+    if one == two:
+        return 0
+
+    i = j = 0
+
+    while i < len(one) and j < len(two):
+        start_i, start_j = i, j
+
+        while i < len(one) and not one[i].isalnum():
+            i += 1
+
+        while j < len(two) and not two[j].isalnum():
+            j += 1
+
+        if i >= len(one) or j >= len(two):
+            break
+
+        # Different separator lengths, we are done.
+        if (i - start_i) != (j - start_j):
+            return -1 if (i - start_i) < (j - start_j) else 1
+
+        start_i, start_j = i, j
+        is_num = one[i].isdigit()
+        same_type = str.isdigit if is_num else str.isalpha
+
+        while i < len(one) and same_type(one[i]):
+            i += 1
+
+        while j < len(two) and same_type(two[j]):
+            j += 1
+
+        seg_one, seg_two = one[start_i:i], two[start_j:j]
+
+        # Segments of different types: numeric segments are always newer.
+        if not seg_two:
+            return 1 if is_num else -1
+
+        if is_num:
+            seg_one, seg_two = seg_one.lstrip('0'), seg_two.lstrip('0')
+
+            if len(seg_one) != len(seg_two):
+                return 1 if len(seg_one) > len(seg_two) else -1
+
+        if seg_one != seg_two:
+            return 1 if seg_one > seg_two else -1
+
+    if i >= len(one) and j >= len(two):
+        return 0
+
+    # A remaining alpha segment never beats an empty string.
+    if (i >= len(one) and not two[j].isalpha()) or (i < len(one) and one[i].isalpha()):
+        return -1
+
+    return 1
+
+
+def _split_version(version):
+    epoch, _, rest = version.rpartition(':') if ':' in version else ('0', '', version)
+    pkgver, _, pkgrel = rest.rpartition('-') if '-' in rest else (rest, '', '')
+
+    return epoch or '0', pkgver, pkgrel
+
+
+def vercmp(version1, version2):
+    """
+    Compare two package versions (`[epoch:]pkgver[-pkgrel]`) the way pacman does.
+
+    Returns:
+        int: -1 if `version1` is older than `version2`, 0 if they are equal, 1 if it's newer.
+
+    """
+    if version1 == version2:
+        return 0
+
+    epoch1, pkgver1, pkgrel1 = _split_version(version1)
+    epoch2, pkgver2, pkgrel2 = _split_version(version2)
+
+    result = _rpmvercmp(epoch1, epoch2) or _rpmvercmp(pkgver1, pkgver2)
+
+    if not result and pkgrel1 and pkgrel2:
+        result = _rpmvercmp(pkgrel1, pkgrel2)
+
+    return result
+
+
+def get_cpuset(slot, slots, cores=None):
+    """
+    Get the cores that build containers running in `slot` (of `slots`) may use, so that
+    concurrent builds don't compete for the same cores.
+
+    Args:
+        slot (int):  The slot's index.
+        slots (int): The number of slots.
+        cores (int): The number of cores to share (default: all of this host's cores).
+
+    Returns:
+        str: A docker `cpuset_cpus` value (eg. '0-2').
+
+    """
+    cores = cores or multiprocessing.cpu_count()
+    per_slot = max(cores // slots, 1)
+    first = (slot * per_slot) % cores
+
+    return '{0}-{1}'.format(first, min(first + per_slot, cores) - 1)
+
+
 def get_build_queue(status_obj, get_transaction):
     if not status_obj.transactions_running and not status_obj.transaction_queue:
         return []
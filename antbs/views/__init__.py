@@ -66,13 +66,28 @@ from database import (
     get_trans_object,
     db,
     get_monitor_object,
-    check_repos_for_changes
+    check_repos_for_changes,
+    child_objects,
+    load_many,
+    load_snapshots,
+    build_index_is_ready,
+    builds_between,
+    builds_for,
+    count_builds_between,
+    rebuild_build_index,
+    request_repo_updates,
+    schedule_migrations,
+    search_builds,
+    Build,
+    BuildLog,
+    Package,
+    TimelineEvent,
 )
 
 from utils import *
 
 from webhook import Webhook
-from transaction_handler import handle_hook, update_repo_databases
+from transaction_handler import handle_hook
 from iso_utility import iso_release_job
 from extensions import (
     FlaskView,
@@ -82,6 +97,12 @@ from extensions import (
 
 logger = status.logger
 
+# Build fields that are rendered in build listings (used as a `load_many()` projection).
+BUILD_LISTING_FIELDS = [
+    'bnum', 'tnum', 'pkgname', 'version_str', 'start_str', 'end_str', 'failed', 'completed',
+    'review_status', 'review_dev', 'review_date',
+]
+
 
 # Setup rq (background task queue manager)
 exc_handler = RQWorkerCustomExceptionHandler(status, logger)
@@ -90,9 +111,12 @@ with Connection(db):
     transaction_queue = Queue('transactions')
     repo_queue = Queue('update_repo')
     webhook_queue = Queue('webook')
+    # Long running housekeeping jobs, kept off of the queues that builds wait on.
+    maintenance_queue = Queue('maintenance')
     w1 = Worker([transaction_queue], exception_handlers=[exc_handler.handle_worker_exception])
     w2 = Worker([repo_queue])
     w3 = Worker([webhook_queue], exception_handlers=[exc_handler.handle_worker_exception])
+    w4 = Worker([maintenance_queue])
 
 
 def try_render_template(*args, **kwargs):
@@ -103,6 +127,10 @@ def try_render_template(*args, **kwargs):
 
 
 def get_paginated(item_list, per_page, page, reverse=True):
+    if hasattr(item_list, 'paginate'):
+        # RedisList/RedisZSet: only fetch the items for the requested page from redis.
+        return item_list.paginate(page, per_page, reverse=reverse)
+
     if len(item_list) < 1:
         return item_list, 0
 
@@ -127,6 +155,17 @@ def get_paginated(item_list, per_page, page, reverse=True):
     return this_page, all_pages
 
 
+def build_index_available():
+    """ Whether or not the build indexes can be used (schedules a backfill if they can't). """
+    if build_index_is_ready():
+        return True
+
+    if db.set('antbs:misc:build_index:rebuilding', 'True', nx=True, ex=3600):
+        maintenance_queue.enqueue_call(rebuild_build_index, timeout=9600)
+
+    return False
+
+
 def match_pkgname_with_build_number(bnum=None, match=None):
     if not bnum or not match:
         return False
@@ -198,14 +237,8 @@ def get_build_history_chart_data(pkg_obj=None):
 
     if not chart_data or chart_data in ['[]', '_']:
         chart_data = dict()
-        builds = [b for b in builds if b]
-        for bld in builds:
-            bld_obj = get_build_object(bnum=bld)
-            if not bld_obj.end_str:
-                continue
-
-            dt = datetime.strptime(bld_obj.end_str, "%m/%d/%Y %I:%M%p")
 
+        for dt in _get_build_end_datetimes(builds, pkg_obj):
             if datetime_older_than_days(dt):
                 continue
 
@@ -232,6 +265,28 @@ def get_build_history_chart_data(pkg_obj=None):
     return json.dumps(timestamps)
 
 
+def _get_build_end_datetimes(builds, pkg_obj=None):
+    if build_index_available():
+        if pkg_obj is None:
+            start = datetime.now() - timedelta(days=364)
+            ended = builds_between(start, with_times=True)
+        else:
+            ended = [(bnum, ts) for bnum, ts in builds_for(pkg_obj.pkgname, with_times=True) if ts]
+
+        for bnum, ts in ended:
+            yield datetime.fromtimestamp(ts)
+
+        return
+
+    builds = [b for b in builds if b]
+
+    for bld_obj in load_many(Build, builds, fields=['bnum', 'end_ts', 'end_str']):
+        if bld_obj.end_ts:
+            yield datetime.fromtimestamp(bld_obj.end_ts)
+        elif bld_obj.end_str:
+            yield datetime.strptime(bld_obj.end_str, "%m/%d/%Y %I:%M%p")
+
+
 def build_failed(bnum):
     bld_obj = get_build_object(bnum=bnum)
     return bld_obj.failed
@@ -29,6 +29,7 @@
 from . import *
 
 EMPTY_RESPONSE = json.dumps({})
+MAX_LOG_LINES = 5000
 
 
 class APIView(FlaskView):
@@ -88,7 +89,8 @@ class APIView(FlaskView):
             return dict(error=True, msg=err)
 
         errmsg = dict(error=True, msg=None)
-        dt = datetime.now().strftime("%m/%d/%Y %I:%M%p")
+        now = datetime.now()
+        dt = now.strftime("%m/%d/%Y %I:%M%p")
 
         bld_obj = get_build_object(bnum=bnum)
         pkg_obj = get_pkg_object(name=bld_obj.pkgname)
@@ -105,6 +107,7 @@ class APIView(FlaskView):
 
         bld_obj.review_dev = dev
         bld_obj.review_date = dt
+        bld_obj.review_ts = bld_obj.datetime_to_timestamp(now)
         bld_obj.review_status = result
 
         if result == 'skip':
@@ -152,7 +155,7 @@ class APIView(FlaskView):
 
             remove(pkg_file)
 
-        repo_queue.enqueue_call(update_repo_databases, timeout=9600)
+        request_repo_updates(repo_queue)
         errmsg = dict(error=False, msg=None)
 
         return errmsg
@@ -251,7 +254,7 @@ class APIView(FlaskView):
                 transaction_queue.enqueue_call(handle_hook, timeout=84600)
 
         elif update_repos:
-            repo_queue.enqueue_call(update_repo_databases, timeout=9600)
+            request_repo_updates(repo_queue)
 
         return json.dumps(message)
 
@@ -289,6 +292,37 @@ class APIView(FlaskView):
             headers=headers
         )
 
+    @route('/build_log/<int:bnum>')
+    def build_log(self, bnum):
+        build_log = BuildLog(bnum)
+
+        if not build_log:
+            abort(404)
+
+        start = max(request.args.get('start', 0, type=int), 0)
+        count = min(max(request.args.get('count', 500, type=int), 0), MAX_LOG_LINES)
+        lines = build_log.read_lines(start, start + count)
+
+        return json.dumps(dict(bnum=bnum, start=start, lines=lines, total=len(build_log)))
+
+    @route('/build_log/<int:bnum>/tail')
+    def build_log_tail(self, bnum):
+        build_log = BuildLog(bnum)
+
+        if not build_log:
+            abort(404)
+
+        count = min(max(request.args.get('lines', 100, type=int), 0), MAX_LOG_LINES)
+        total = len(build_log)
+        lines = build_log.tail(count)
+
+        return json.dumps(dict(bnum=bnum, start=total - len(lines), lines=lines, total=total))
+
+    @route('/cache_stats')
+    @auth_required
+    def cache_stats(self):
+        return json.dumps(dict(child_objects=child_objects.info()))
+
     @route('/hook', methods=['POST', 'GET'])
     def hook(self):
         hook = Webhook(request)
@@ -62,21 +62,16 @@ class BuildView(FlaskView):
         if not all_builds:
             return [], 1, []
 
-        if search is not None:
+        if search is not None and build_index_available():
+            all_builds = search_builds(search, build_status)
+        elif search is not None:
             search_all_builds = [x for x in all_builds if
                                  x and match_pkgname_with_build_number(x, search)]
             all_builds = search_all_builds
 
         if all_builds:
             builds, all_pages = get_paginated(all_builds, 10, page)
-            for bnum in builds:
-                try:
-                    bld_obj = get_build_object(bnum=bnum)
-                except Exception as err:
-                    logger.error(err)
-                    continue
-
-                builds_list.append(bld_obj)
+            builds_list = load_many(Build, builds, fields=BUILD_LISTING_FIELDS)
 
             if current_user.is_authenticated:
                 for bld_obj in builds_list:
@@ -122,12 +117,11 @@ class BuildView(FlaskView):
         bld_obj = None
 
         try:
-            bld_obj = get_build_object(bnum=bnum)
+            bld_obj = get_build_object(bnum=bnum, snapshot=True)
         except Exception:
             abort(500)
 
-        if not bld_obj.log_str:
-            bld_obj.log_str = 'Unavailable'
+        log_html = bld_obj.build_log.html() or 'Unavailable'
 
         if bld_obj.container:
             container = bld_obj.container[:20]
@@ -140,7 +134,8 @@ class BuildView(FlaskView):
             'build/build_info.html',
             bld_obj=bld_obj,
             container=container,
-            result=result
+            result=result,
+            log_html=log_html
         )
 
 
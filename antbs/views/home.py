@@ -33,15 +33,32 @@ class HomeView(FlaskView):
     route_base = '/'
 
     def _get_timeline(self, tlpage=1):
-        timeline = []
+        event_ids, all_pages = status.all_tl_events.paginate(tlpage, 6, limit=250)
+        timeline = load_many(TimelineEvent, event_ids)
 
-        for event_id in status.all_tl_events[-250:-1]:
-            event = get_timeline_object(event_id=event_id)
-            timeline.append(event)
+        return timeline, all_pages
 
-        this_page, all_pages = get_paginated(timeline, 6, tlpage)
+    @staticmethod
+    def _get_number_of_builds_within_48_hours(build_status):
+        if build_index_available():
+            return count_builds_between(datetime.now() - timedelta(hours=48), outcome=build_status)
 
-        return this_page, all_pages
+        builds = getattr(status, build_status)
+        builds = builds[2500:-1] if 'failed' == build_status else builds[5000:-1]
+        builds = [x for x in builds if x]
+        since = int((datetime.now() - timedelta(hours=48)).timestamp())
+        within = 0
+
+        for bld_obj in load_many(Build, builds, fields=['bnum', 'end_ts', 'end_str']):
+            end = bld_obj.end_ts
+
+            if not end and bld_obj.end_str:
+                end = int(datetime.strptime(bld_obj.end_str, '%m/%d/%Y %I:%M%p').timestamp())
+
+            if end and end > since:
+                within += 1
+
+        return within
 
     def _get_number_of_packages_in_repo(self, repo_name):
         main_repo = get_repo_object('antergos', 'x86_64')
@@ -66,6 +83,8 @@ class HomeView(FlaskView):
                 check_repos_for_changes, args=(do_check, do_sync, Webhook), timeout=9600
             )
 
+        schedule_migrations(maintenance_queue)
+
     @route('/timeline/<int:tlpage>')
     @route('/')
     def index(self, tlpage=None):
@@ -86,26 +105,7 @@ class HomeView(FlaskView):
         }
 
         for stat in check_stats:
-            builds = getattr(status, stat)
-            builds = builds[2500:-1] if 'failed' == stat else builds[5000:-1]
-            res = len(builds) or '0'
-            builds = [x for x in builds if x]
-            within = []
-            for bnum in builds:
-                try:
-                    bld_obj = get_build_object(bnum=bnum)
-                except (ValueError, AttributeError):
-                    continue
-
-                end = ''
-                if bld_obj.end_str:
-                    end = datetime.strptime(bld_obj.end_str, '%m/%d/%Y %I:%M%p')
-                    end = end if (datetime.now() - end) < timedelta(hours=48) else ''
-
-                if end:
-                    within.append(bld_obj.bnum)
-
-            stats[stat] = len(within)
+            stats[stat] = self._get_number_of_builds_within_48_hours(stat)
 
         return try_render_template(
             'home.html', stats=stats, tl_events=tl_events, all_pages=all_pages, page=tlpage, timestamps=timestamps
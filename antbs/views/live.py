@@ -44,7 +44,9 @@ class LiveView(FlaskView):
 
         if status.now_building and not status.idle:
             try:
-                bld_objs = {b: get_build_object(bnum=b) for b in status.now_building if b}
+                bld_objs = {
+                    b: get_build_object(bnum=b, snapshot=True) for b in status.now_building if b
+                }
             except Exception as err:
                 logger.error(err)
                 abort(500)
@@ -33,17 +33,10 @@ class PackageView(FlaskView):
     route_base = '/package'
 
     def _get_build_events_timeline(self, pkg_obj, tlpage=1):
-        timeline = []
-        start_at = len(pkg_obj.tl_events) - 300
-        start_at = max(0, start_at)
+        event_ids, all_pages = pkg_obj.tl_events.paginate(tlpage, 6, limit=300)
+        timeline = load_many(TimelineEvent, event_ids)
 
-        for event_id in pkg_obj.tl_events[start_at:-1]:
-            event = get_timeline_object(event_id=event_id)
-            timeline.append(event)
-
-        this_page, all_pages = get_paginated(timeline, 6, tlpage)
-
-        return this_page, all_pages
+        return timeline, all_pages
 
     def _get_build_counts(self, pkg_obj):
         completed = [b for b in pkg_obj.builds if b and not build_failed(b)]
@@ -45,7 +45,6 @@ class RepoView(FlaskView):
                 abort(404)
 
         pkgs = []
-        bld_obj = None
         all_pages = 0
         repo_obj = get_repo_object(repo_name, 'x86_64')
 
@@ -70,28 +69,34 @@ class RepoView(FlaskView):
             repo_packages = [p for p in sorted(repo_obj.pkgnames) if package_is(p, _filter)]
 
         else:
-            repo_packages = [p for p in sorted(repo_obj.pkgnames)]
+            # Members all share the same score so redis already keeps them sorted by name.
+            repo_packages = repo_obj.pkgnames
 
         packages, all_pages = get_paginated(repo_packages, 10, page, reverse=False)
+        packages = [p for p in packages if 'dummy' not in p and 'grub-zfs' not in p]
+
+        # Fetch the packages and their last builds with one pipelined round trip each.
+        pkg_snapshots = load_snapshots(Package, packages)
+        pipe = db.pipeline(transaction=False)
 
         for pkg in packages:
-            if 'dummy' in pkg or 'grub-zfs' in pkg:
-                continue
+            pipe.lindex('antbs:pkg:{0}:builds'.format(pkg), -1)
+
+        last_builds = dict(zip(packages, pipe.execute()))
+        # LINDEX returns strings, key the builds the same way no matter how bnum is decoded.
+        bld_objs = {
+            str(bld_obj.bnum): bld_obj
+            for bld_obj in load_many(Build, [b for b in last_builds.values() if b])
+        }
 
+        for pkg, pkg_snapshot in zip(packages, pkg_snapshots):
             try:
-                pkg_obj = get_pkg_object(pkg)
+                pkg_obj = get_pkg_object(pkg, snapshot=pkg_snapshot)
             except Exception as err:
                 logger.error(err)
                 continue
 
-            try:
-                bnum = pkg_obj.builds[-1]
-                if bnum:
-                    bld_obj = get_build_object(bnum=bnum)
-            except Exception:
-                continue
-
-            pkg_obj._build = bld_obj
+            pkg_obj._build = bld_objs.get(str(last_builds[pkg]))
             pkgs.append(pkg_obj)
 
         return pkgs, rev_pending, all_pages
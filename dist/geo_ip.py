@@ -26,10 +26,16 @@
 #  You should have received a copy of the GNU General Public License
 #  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import sys
+
 import geoip2.database
-import redis
 
-db = redis.StrictRedis(unix_socket_path='/var/run/redis/redis.sock', decode_responses=True)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'antbs'))
+
+from redis_connection import get_redis
+
+db = get_redis()
 
 reader = geoip2.database.Reader('GeoLite2-Country.mmdb')
 
@@ -27,9 +27,14 @@
 #  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-import redis
+import os
+import sys
 
-_db = redis.StrictRedis(unix_socket_path='/var/run/redis/redis.sock', decode_responses=True)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'antbs'))
+
+from redis_connection import get_redis
+
+_db = get_redis()
 _logger = logging.getLogger('antbs')
 
 _namespace = 'antbs'
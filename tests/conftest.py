@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  conftest.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+import bugsnag
+import pytest
+
+# The app's modules import each other relative to antbs/ and connect to redis on import.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'antbs'))
+os.environ.setdefault('ANTBS_REDIS_URL', 'fakeredis://')
+
+# Errors logged by the code under test must not be reported.
+bugsnag.configure(release_stage='test', notify_release_stages=['production'])
+
+
+@pytest.fixture
+def redis_db():
+    """ The redis client used by the redis objects, emptied before each test. """
+    from database.base_objects import db
+
+    db.flushdb()
+
+    return db
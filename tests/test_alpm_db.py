@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_alpm_db.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import base64
+import hashlib
+import os
+import tarfile
+from io import BytesIO
+
+import pytest
+
+from database.alpm_db import AlpmDatabase, get_desc_field, iter_db_entries
+
+PKGINFO = """# Generated by makepkg
+pkgname = {name}
+pkgbase = {name}
+pkgver = {version}
+pkgdesc = The {name}   package
+url = https://antergos.com
+builddate = 1500000000
+packager = Antergos Build Server <dev@antergos.com>
+size = 1024
+arch = any
+license = GPL
+depend = glibc
+depend = bash>=4
+optdepend = python: for the scripts
+"""
+
+
+def make_package(repo_dir, name, version, files=('usr/', 'usr/bin/', 'usr/bin/{name}')):
+    """ Create a package file with a .PKGINFO and (empty) `files`. """
+    path = os.path.join(repo_dir, '{0}-{1}-any.pkg.tar.xz'.format(name, version))
+    members = [('.PKGINFO', PKGINFO.format(name=name, version=version).encode('UTF-8'))]
+    members += [(f.format(name=name), None) for f in files]
+
+    with tarfile.open(path, 'w:xz') as pkg:
+        for member_name, data in members:
+            info = tarfile.TarInfo(member_name.rstrip('/'))
+
+            if member_name.endswith('/'):
+                info.type = tarfile.DIRTYPE
+                pkg.addfile(info)
+            else:
+                info.size = len(data or b'')
+                pkg.addfile(info, BytesIO(data or b''))
+
+    return path
+
+
+def make_db(path, members, mode='w:gz'):
+    """ Create a database from `members` (name -> content, `None` for directories). """
+    with tarfile.open(path, mode) as alpm_db:
+        for member_name, content in members:
+            info = tarfile.TarInfo(member_name)
+
+            if content is None:
+                info.type = tarfile.DIRTYPE
+                alpm_db.addfile(info)
+            else:
+                info.size = len(content.encode('UTF-8'))
+                alpm_db.addfile(info, BytesIO(content.encode('UTF-8')))
+
+    return path
+
+
+@pytest.fixture
+def repo_dir(tmpdir):
+    return str(tmpdir)
+
+
+def test_add_write_and_load(repo_dir):
+    foo = make_package(repo_dir, 'foo', '1.0-1')
+    bar = make_package(repo_dir, 'bar', '1:2.0-3')
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+
+    assert 'foo' == alpm_db.add(foo)
+    assert 'bar' == alpm_db.add(bar)
+    assert alpm_db.changed
+
+    alpm_db.write()
+
+    assert not alpm_db.changed
+    assert os.path.islink(os.path.join(repo_dir, 'antergos.db'))
+    assert os.path.islink(os.path.join(repo_dir, 'antergos.files'))
+    assert not os.path.exists(alpm_db.lock_path)
+
+    loaded = AlpmDatabase(repo_dir, 'antergos')
+    desc = loaded.entries['foo']['desc']
+
+    with open(foo, 'rb') as pkg_file:
+        sha256sum = hashlib.sha256(pkg_file.read()).hexdigest()
+
+    assert ['bar', 'foo'] == sorted(loaded.entries)
+    assert 'bar-1:2.0-3' == loaded.entries['bar']['dirname']
+    assert os.path.basename(foo) == loaded.get_filename('foo')
+    assert '1.0-1' == get_desc_field(desc, 'VERSION')
+    assert 'The foo package' == get_desc_field(desc, 'DESC')
+    assert str(os.stat(foo).st_size) == get_desc_field(desc, 'CSIZE')
+    assert sha256sum == get_desc_field(desc, 'SHA256SUM')
+    assert '' == get_desc_field(desc, 'PGPSIG')
+    assert '%DEPENDS%\nglibc\nbash>=4\n\n' in desc
+    assert '%OPTDEPENDS%\npython: for the scripts\n\n' in desc
+    assert '%FILES%\nusr/\nusr/bin/\nusr/bin/foo\n' == loaded.entries['foo']['files']
+
+
+def test_remove(repo_dir):
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+    alpm_db.add(make_package(repo_dir, 'foo', '1.0-1'))
+    alpm_db.add(make_package(repo_dir, 'bar', '1.0-1'))
+    alpm_db.write()
+
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+
+    assert alpm_db.remove('foo')
+    assert not alpm_db.remove('missing')
+
+    alpm_db.write()
+    loaded = AlpmDatabase(repo_dir, 'antergos')
+
+    assert ['bar'] == list(loaded.entries)
+    assert '' == loaded.get_filename('foo')
+    assert os.path.exists(os.path.join(repo_dir, 'antergos.db.tar.gz.old'))
+
+
+def test_add_replaces_older_version(repo_dir):
+    old = make_package(repo_dir, 'foo', '1.0-1')
+    new = make_package(repo_dir, 'foo', '1.0-2')
+    open(old + '.sig', 'wb').close()
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+    alpm_db.add(old)
+    alpm_db.add(new)
+
+    assert 1 == len(alpm_db)
+    assert 'foo-1.0-2' == alpm_db.entries['foo']['dirname']
+    assert not os.path.exists(old)
+    assert not os.path.exists(old + '.sig')
+    assert os.path.exists(new)
+
+
+def test_add_signed_package(repo_dir):
+    pkg = make_package(repo_dir, 'foo', '1.0-1')
+
+    with open(pkg + '.sig', 'wb') as sig_file:
+        sig_file.write(b'\x89\x01\x33signature')
+
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+    alpm_db.add(pkg)
+    pgpsig = get_desc_field(alpm_db.entries['foo']['desc'], 'PGPSIG')
+
+    assert b'\x89\x01\x33signature' == base64.b64decode(pgpsig)
+
+
+@pytest.mark.parametrize('sig', [b'-----BEGIN PGP SIGNATURE-----', b'0' * 20000])
+def test_add_invalid_signature(repo_dir, sig):
+    pkg = make_package(repo_dir, 'foo', '1.0-1')
+
+    with open(pkg + '.sig', 'wb') as sig_file:
+        sig_file.write(sig)
+
+    with pytest.raises(ValueError):
+        AlpmDatabase(repo_dir, 'antergos').add(pkg)
+
+
+def test_add_invalid_package(repo_dir):
+    path = os.path.join(repo_dir, 'foo-1.0-1-any.pkg.tar.xz')
+
+    with open(path, 'w') as not_a_pkg:
+        not_a_pkg.write('foo')
+
+    with pytest.raises(ValueError):
+        AlpmDatabase(repo_dir, 'antergos').add(path)
+
+
+def test_write_locked(repo_dir):
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+    alpm_db.add(make_package(repo_dir, 'foo', '1.0-1'))
+    open(alpm_db.lock_path, 'w').close()
+
+    with pytest.raises(RuntimeError):
+        alpm_db.write()
+
+    assert os.path.exists(alpm_db.lock_path)
+    assert not os.path.exists(alpm_db.db_path)
+
+
+def test_write_signed(repo_dir):
+    signed = []
+
+    def sign(paths):
+        for path in paths:
+            open(path + '.sig', 'w').close()
+            signed.append(os.path.basename(path))
+
+        return True
+
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+    alpm_db.add(make_package(repo_dir, 'foo', '1.0-1'))
+    alpm_db.write(sign=sign)
+
+    assert ['.tmp.antergos.db.tar.gz', '.tmp.antergos.files.tar.gz'] == signed
+    assert os.path.exists(alpm_db.db_path + '.sig')
+    assert os.path.islink(os.path.join(repo_dir, 'antergos.db.sig'))
+
+    # An unsigned write must not leave the old signature next to the new database.
+    alpm_db.write()
+
+    assert not os.path.exists(alpm_db.db_path + '.sig')
+    assert not os.path.lexists(os.path.join(repo_dir, 'antergos.db.sig'))
+
+
+def test_write_signing_failed(repo_dir):
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+    alpm_db.add(make_package(repo_dir, 'foo', '1.0-1'))
+
+    with pytest.raises(RuntimeError):
+        alpm_db.write(sign=lambda paths: False)
+
+    assert alpm_db.changed
+    assert not os.path.exists(alpm_db.db_path)
+    assert not os.path.exists(alpm_db.lock_path)
+    assert not [f for f in os.listdir(repo_dir) if f.startswith('.tmp.')]
+
+
+DB_MEMBERS = [
+    ('foo-1.0-1', None),
+    ('foo-1.0-1/desc', '%FILENAME%\nfoo-1.0-1-any.pkg.tar.xz\n\n%NAME%\nfoo\n\n'),
+    ('foo-1.0-1/files', '%FILES%\nusr/\n'),
+    ('bar-baz-2.0-1', None),
+    ('bar-baz-2.0-1/desc', '%FILENAME%\nbar-baz-2.0-1-any.pkg.tar.xz\n\n'),
+    ('README', 'not in a package directory'),
+]
+
+
+@pytest.mark.parametrize('mode', ['w:gz', 'w:xz', 'w'])
+def test_iter_db_entries(repo_dir, mode):
+    path = make_db(os.path.join(repo_dir, 'antergos.db.tar.gz'), DB_MEMBERS, mode)
+
+    assert [
+        ('foo-1.0-1', 'desc', DB_MEMBERS[1][1]),
+        ('foo-1.0-1', 'files', DB_MEMBERS[2][1]),
+        ('bar-baz-2.0-1', 'desc', DB_MEMBERS[4][1]),
+    ] == list(iter_db_entries(path))
+
+
+def test_iter_db_entries_member_names(repo_dir):
+    path = make_db(os.path.join(repo_dir, 'antergos.db.tar.gz'), DB_MEMBERS)
+
+    assert ['foo-1.0-1', 'bar-baz-2.0-1'] == [
+        dirname for dirname, _, _ in iter_db_entries(path, ['desc'])
+    ]
+    assert [] == list(iter_db_entries(path, ['missing']))
+
+
+def test_load_existing_db(repo_dir):
+    make_db(os.path.join(repo_dir, 'antergos.db.tar.gz'), DB_MEMBERS)
+    make_db(os.path.join(repo_dir, 'antergos.files.tar.gz'), DB_MEMBERS)
+    alpm_db = AlpmDatabase(repo_dir, 'antergos')
+
+    # Package names are taken from the directory name when desc has no NAME field.
+    assert ['bar-baz', 'foo'] == sorted(alpm_db.entries)
+    assert 'bar-baz-2.0-1-any.pkg.tar.xz' == alpm_db.get_filename('bar-baz')
+    assert DB_MEMBERS[2][1] == alpm_db.entries['foo']['files']
+    assert alpm_db.entries['bar-baz']['files'] is None
+
+
+@pytest.mark.parametrize('desc, field, expected', [
+    ('%NAME%\nfoo\n\n%VERSION%\n1.0-1\n\n', 'VERSION', '1.0-1'),
+    ('%DEPENDS%\nglibc\nbash\n\n', 'DEPENDS', 'glibc'),
+    ('%NAME%\nfoo\n\n', 'VERSION', ''),
+    ('%NAME%', 'NAME', ''),
+])
+def test_get_desc_field(desc, field, expected):
+    assert expected == get_desc_field(desc, field)
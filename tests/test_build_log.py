@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_build_log.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+import pytest
+
+from database.build_log import BuildLog
+
+LINES = ['line {0}'.format(num) for num in range(1200)]
+
+
+@pytest.fixture
+def build_log(redis_db, monkeypatch):
+    """ A log that is stored in redis (archiving disabled). """
+    monkeypatch.setattr(BuildLog, 'archive_dir', '')
+
+    return BuildLog(1)
+
+
+def write_lines(log, lines):
+    with log.writer() as writer:
+        for line in lines:
+            writer.write(line)
+
+    return writer
+
+
+def html_text(html):
+    return re.sub(r'<[^>]+>', '', html)
+
+
+def test_round_trip(build_log, redis_db):
+    write_lines(build_log, LINES)
+
+    assert 3 == redis_db.llen(build_log.chunks_key)
+    assert list(build_log.iter_lines()) == LINES
+    assert len(build_log) == len(LINES)
+    assert build_log.read_lines(498, 503) == LINES[498:503]
+    assert build_log.tail(3) == LINES[-3:]
+    assert [] == build_log.tail(0)
+
+
+def test_rewrite_replaces_log(build_log):
+    write_lines(build_log, LINES)
+    write_lines(build_log, ['new'])
+
+    assert ['new'] == list(build_log.iter_lines())
+
+
+def test_head_and_tail_are_kept(build_log, monkeypatch):
+    monkeypatch.setattr(BuildLog, 'head_bytes', 100)
+    monkeypatch.setattr(BuildLog, 'tail_bytes', 100)
+    writer = write_lines(build_log, LINES)
+    lines = list(build_log.iter_lines())
+    head = lines.index('[...]: {0} lines omitted'.format(writer.omitted))
+    tail = len(lines) - head - 1
+
+    assert writer.omitted > 0
+    assert head > 0 and tail > 0
+    assert len(lines) == len(LINES) - writer.omitted + 1
+    assert lines[:head] == LINES[:head]
+    assert lines[head + 1:] == LINES[-tail:]
+
+
+def test_html_is_cached(build_log, redis_db):
+    assert '' == build_log.html()
+
+    write_lines(build_log, LINES[:10])
+    html = build_log.html()
+
+    assert 'line 9' in html_text(html)
+    assert redis_db.exists(build_log.html_key)
+    assert html == build_log.html()
+
+    write_lines(build_log, LINES[:1])
+
+    assert not redis_db.exists(build_log.html_key)
+
+
+def test_html_of_long_log_has_head_and_tail(build_log, monkeypatch):
+    monkeypatch.setattr(BuildLog, 'html_max_lines', 10)
+    write_lines(build_log, LINES)
+    lines = [line for line in html_text(build_log.html()).splitlines() if line.strip()]
+
+    assert 11 == len(lines)
+    assert lines[4].endswith('line 4')
+    assert lines[5].endswith('1190 lines omitted')
+    assert lines[10].endswith('line 1199')
+
+
+def test_legacy_log(build_log, redis_db):
+    redis_db.rpush('antbs:build:1:log', 'old 1', 'old 2')
+    redis_db.hset('antbs:build:1', 'log_str', '<pre>old</pre>')
+
+    assert build_log
+    assert ['old 1', 'old 2'] == list(build_log.iter_lines())
+    assert '<pre>old</pre>' == build_log.html()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_log_archive.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import pytest
+
+from database.build_log import BuildLog
+from database.log_archive import LogArchiveReader, LogArchiveWriter
+
+LINES = ['line {0}'.format(num) for num in range(25)]
+
+
+@pytest.fixture
+def archive_path(tmpdir):
+    path = os.path.join(str(tmpdir), 'logs', '1.log')
+
+    with LogArchiveWriter(path, block_lines=4) as archive:
+        for line in LINES:
+            archive.write(line)
+
+    return path
+
+
+@pytest.mark.parametrize('start, stop', [
+    (0, None), (0, 1), (3, 4), (3, 9), (4, 8), (7, 25), (24, 30), (-5, None), (-5, -2),
+    (10, 10), (12, 3), (30, 40),
+])
+def test_read_lines(archive_path, start, stop):
+    with LogArchiveReader(archive_path) as archive:
+        assert len(LINES) == len(archive)
+        assert LINES[start:stop] == archive.read_lines(start, stop)
+
+
+def test_empty_archive(tmpdir):
+    path = os.path.join(str(tmpdir), 'empty.log')
+
+    LogArchiveWriter(path).close()
+
+    with LogArchiveReader(path) as archive:
+        assert 0 == len(archive)
+        assert [] == archive.read_lines()
+
+
+def test_archive_is_discarded_on_error(tmpdir):
+    path = os.path.join(str(tmpdir), 'failed.log')
+
+    with pytest.raises(RuntimeError):
+        with LogArchiveWriter(path) as archive:
+            archive.write('line')
+            raise RuntimeError
+
+    assert [] == os.listdir(str(tmpdir))
+
+
+@pytest.mark.parametrize('data', [b'not a log archive', b'ANTBSLOG' + b'\0' * 20])
+def test_invalid_archive(tmpdir, data):
+    path = os.path.join(str(tmpdir), 'invalid.log')
+
+    with open(path, 'wb') as invalid:
+        invalid.write(data)
+
+    with pytest.raises(ValueError):
+        LogArchiveReader(path)
+
+
+def test_build_log_archive(redis_db, tmpdir, monkeypatch):
+    monkeypatch.setattr(BuildLog, 'archive_dir', str(tmpdir))
+    log = BuildLog(1234)
+
+    with log.writer() as writer:
+        for line in LINES:
+            writer.write(line)
+
+    assert log.is_archived
+    assert log.archive_path == os.path.join(str(tmpdir), '1', '1234.log')
+    assert not redis_db.exists(log.chunks_key)
+    assert LINES == list(log.iter_lines())
+    assert LINES[5:7] == log.read_lines(5, 7)
+    assert LINES[-2:] == log.tail(2)
+
+    log.delete()
+
+    assert not log
+
+
+def test_build_log_archive_migration(redis_db, tmpdir, monkeypatch):
+    monkeypatch.setattr(BuildLog, 'archive_dir', '')
+    log = BuildLog(1)
+
+    with log.writer() as writer:
+        for line in LINES:
+            writer.write(line)
+
+    monkeypatch.setattr(BuildLog, 'archive_dir', str(tmpdir))
+    log = BuildLog(1)
+
+    assert log.archive()
+    assert not log.archive()
+    assert not redis_db.exists(log.chunks_key)
+    assert LINES == log.read_lines()
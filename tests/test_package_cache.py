@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_package_cache.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+import pytest
+
+from utils import PacmanPackageCache
+
+FILES = [
+    'foo-1.0-1-x86_64.pkg.tar.xz',
+    'foo-1.0-1-x86_64.pkg.tar.xz.sig',
+    'foo-1.0-2-x86_64.pkg.tar.xz',
+    'foo-1:0.9-1-x86_64.pkg.tar.xz',
+    'foo-1.1-1-any.pkg.tar.xz',
+    'foo-bar-2.0rc1-1-any.pkg.tar.xz',
+    'foo-bar-2.0-1-any.pkg.tar.xz',
+    'foo-bar-2.0-1-any.pkg.tar.xz.sig',
+    'baz-1.0-1-x86_64.pkg.tar.xz.part',
+    'notes.txt',
+]
+KEPT = [
+    'baz-1.0-1-x86_64.pkg.tar.xz.part',
+    'foo-1.1-1-any.pkg.tar.xz',
+    'foo-1:0.9-1-x86_64.pkg.tar.xz',
+    'foo-bar-2.0-1-any.pkg.tar.xz',
+    'foo-bar-2.0-1-any.pkg.tar.xz.sig',
+    'notes.txt',
+]
+
+
+@pytest.fixture
+def pkg_cache(tmpdir, monkeypatch):
+    monkeypatch.setattr(PacmanPackageCache, '_instance', None)
+
+    return PacmanPackageCache(os.path.join(str(tmpdir), 'pkg_cache', 'pkg'))
+
+
+def add_files(cache_dir, filenames):
+    os.makedirs(cache_dir, exist_ok=True)
+
+    before = os.stat(cache_dir).st_mtime_ns
+
+    for filename in filenames:
+        open(os.path.join(cache_dir, filename), 'w').close()
+
+    # Don't depend on the filesystem's timestamp granularity to notice the change.
+    os.utime(cache_dir, ns=(before, before + 10 ** 9))
+
+
+@pytest.mark.parametrize('filename, expected', [
+    ('foo-1.0-1-x86_64.pkg.tar.xz', ('foo', '1.0-1', 'x86_64')),
+    ('foo-bar-1:2.0-3-any.pkg.tar.zst', ('foo-bar', '1:2.0-3', 'any')),
+    ('foo-1.0-1-x86_64.pkg.tar.xz.sig', None),
+    ('foo-1.0-1-x86_64.pkg.tar.xz.part', None),
+    ('foo-x86_64.pkg.tar.xz', None),
+    ('notes.txt', None),
+])
+def test_parse_package_filename(filename, expected):
+    assert expected == PacmanPackageCache.parse_package_filename(filename)
+
+
+def test_removes_outdated_packages(pkg_cache):
+    add_files(pkg_cache.cache, FILES)
+
+    assert 3 == pkg_cache.maybe_do_cache_cleanup()
+    assert KEPT == sorted(os.listdir(pkg_cache.cache))
+    assert os.path.isdir(pkg_cache.cache_i686)
+
+
+def test_index_skips_unchanged_dirs(pkg_cache):
+    add_files(pkg_cache.cache, FILES)
+    pkg_cache.maybe_do_cache_cleanup()
+
+    assert os.path.exists(pkg_cache._get_index_path(pkg_cache.cache))
+    assert 0 == pkg_cache.maybe_do_cache_cleanup()
+
+    add_files(pkg_cache.cache, ['foo-1:1.0-1-x86_64.pkg.tar.xz', 'foo-bar-1.0-1-any.pkg.tar.xz'])
+
+    assert 2 == pkg_cache.maybe_do_cache_cleanup()
+    assert 'foo-1:1.0-1-x86_64.pkg.tar.xz' in os.listdir(pkg_cache.cache)
+    assert 'foo-1:0.9-1-x86_64.pkg.tar.xz' not in os.listdir(pkg_cache.cache)
+    assert 'foo-bar-1.0-1-any.pkg.tar.xz' not in os.listdir(pkg_cache.cache)
+
+
+def test_index_entries_for_removed_files_are_dropped(pkg_cache):
+    add_files(pkg_cache.cache, FILES)
+    pkg_cache.maybe_do_cache_cleanup()
+    os.remove(os.path.join(pkg_cache.cache, 'foo-1.1-1-any.pkg.tar.xz'))
+    add_files(pkg_cache.cache, ['foo-1.0-1-any.pkg.tar.xz'])
+
+    assert 0 == pkg_cache.maybe_do_cache_cleanup()
+    assert 'foo-1.0-1-any.pkg.tar.xz' in os.listdir(pkg_cache.cache)
+
+
+def test_without_index(tmpdir, monkeypatch):
+    monkeypatch.setattr(PacmanPackageCache, '_instance', None)
+    pkg_cache = PacmanPackageCache(os.path.join(str(tmpdir), 'pkg_cache', 'pkg'), False)
+    add_files(pkg_cache.cache, FILES)
+
+    assert 3 == pkg_cache.maybe_do_cache_cleanup()
+    assert KEPT == sorted(os.listdir(pkg_cache.cache))
+    assert not os.path.exists(pkg_cache._get_index_path(pkg_cache.cache))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_redis_chunks.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from database.base_objects import RedisList, RedisZSet
+
+ITEMS = [str(num) for num in range(1, 11)]
+
+
+@pytest.fixture
+def redis_list(redis_db):
+    redis_db.rpush('antbs:test:list', *ITEMS)
+
+    return RedisList('antbs:test:list', item_type=int)
+
+
+@pytest.fixture
+def redis_zset(redis_db):
+    scores_and_members = [value for item in ITEMS for value in (int(item), item)]
+    redis_db.zadd('antbs:test:zset', *scores_and_members)
+
+    return RedisZSet('antbs:test:zset', item_type=int)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 5, 10, 20])
+def test_list_iter_chunks(redis_list, chunk_size):
+    chunks = list(redis_list.iter_chunks(chunk_size))
+
+    assert [item for chunk in chunks for item in chunk] == list(range(1, 11))
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    assert list(redis_list.iter_chunked(chunk_size)) == list(range(1, 11))
+
+
+def test_list_iter_chunks_empty(redis_db):
+    assert [] == list(RedisList('antbs:test:empty').iter_chunks(3))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 20])
+def test_zset_iter_chunks(redis_zset, chunk_size):
+    items = [item for chunk in redis_zset.iter_chunks(chunk_size) for item in chunk]
+
+    assert sorted(items) == list(range(1, 11))
+
+
+@pytest.mark.parametrize('page, reverse, expected', [
+    (1, True, [10, 9, 8, 7]),
+    (2, True, [6, 5, 4, 3]),
+    (3, True, [2, 1]),
+    (1, False, [1, 2, 3, 4]),
+    (3, False, [9, 10]),
+    (0, False, [1, 2, 3, 4]),
+    (9, True, [2, 1]),
+])
+def test_paginate(redis_list, redis_zset, page, reverse, expected):
+    assert (expected, 3) == redis_list.paginate(page, 4, reverse=reverse)
+    assert (expected, 3) == redis_zset.paginate(page, 4, reverse=reverse)
+
+
+def test_paginate_limit(redis_list, redis_zset):
+    assert ([10, 9, 8, 7], 2) == redis_list.paginate(1, 4, limit=5)
+    assert ([6], 2) == redis_list.paginate(2, 4, limit=5)
+    assert ([5], 2) == redis_zset.paginate(2, 4, reverse=False, limit=5)
+
+
+def test_paginate_empty(redis_db):
+    assert ([], 0) == RedisList('antbs:test:empty').paginate(1, 4)
+    assert ([], 0) == RedisZSet('antbs:test:empty').paginate(1, 4)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_redis_indexed_list.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+from collections import Counter
+
+import pytest
+
+from database.base_objects import RedisIndexedList
+
+KEY = 'antbs:test:indexed_list'
+
+
+@pytest.fixture
+def indexed_list(redis_db):
+    return RedisIndexedList(KEY)
+
+
+def assert_index_matches_list(redis_db):
+    expected = Counter(redis_db.lrange(KEY, 0, -1))
+    index = dict((item, int(count)) for item, count in redis_db.hgetall(KEY + ':index').items())
+
+    assert index == dict(expected)
+
+
+def test_push_and_pop_keep_index(indexed_list, redis_db):
+    indexed_list.rpush('b')
+    indexed_list.append('c')
+    indexed_list.lpush('a')
+    indexed_list.rpush('c')
+
+    assert list(indexed_list) == ['a', 'b', 'c', 'c']
+    assert_index_matches_list(redis_db)
+
+    assert 'c' == indexed_list.rpop()
+    assert 'c' in indexed_list
+    assert 'a' == indexed_list.lpop()
+    assert 'a' not in indexed_list
+    assert_index_matches_list(redis_db)
+
+
+def test_pop_from_empty_list(indexed_list, redis_db):
+    assert not indexed_list.lpop()
+    assert not indexed_list.rpop()
+    assert not redis_db.exists(KEY + ':index')
+
+
+def test_remove_drops_every_occurrence(indexed_list, redis_db):
+    indexed_list.extend(['a', 'b', 'a', 'c', 'a'])
+
+    indexed_list.remove('a')
+    indexed_list.remove('missing')
+
+    assert list(indexed_list) == ['b', 'c']
+    assert 'a' not in indexed_list
+    assert_index_matches_list(redis_db)
+
+
+def test_setitem_and_delitem(indexed_list, redis_db):
+    indexed_list.extend(['a', 'b', 'b'])
+
+    indexed_list[0] = 'b'
+    assert 'a' not in indexed_list
+
+    del indexed_list[1]
+    indexed_list[1] = 'c'
+
+    assert list(indexed_list) == ['b', 'c']
+    assert_index_matches_list(redis_db)
+
+
+def test_count_in(indexed_list):
+    indexed_list.extend(['a', 'b', 'b'])
+
+    assert 2 == indexed_list.count_in(['a', 'b', 'c'])
+    assert 0 == indexed_list.count_in([])
+
+
+def test_index_built_for_existing_list(indexed_list, redis_db):
+    redis_db.rpush(KEY, 'a', 'b', 'a')
+
+    assert 'a' in indexed_list
+    assert 'c' not in indexed_list
+    assert_index_matches_list(redis_db)
+
+
+def test_delete_removes_index(indexed_list, redis_db):
+    indexed_list.extend(['a', 'b'])
+    indexed_list.delete()
+
+    assert not redis_db.exists(KEY)
+    assert not redis_db.exists(KEY + ':index')
+    assert 'a' not in indexed_list
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_repo_updates.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+from rq import Queue
+
+from database.repo import get_repo_object
+from redis_connection import get_redis
+
+
+@pytest.fixture
+def repo(redis_db, tmpdir):
+    return get_repo_object('antergos-staging', 'x86_64', path=str(tmpdir))
+
+
+@pytest.fixture
+def repo_queue(redis_db):
+    return Queue('update_repo', connection=get_redis(decode_responses=False))
+
+
+def test_requests_are_coalesced(repo, repo_queue, redis_db):
+    assert 1 == repo.request_update(repo_queue)
+    assert 2 == repo.request_update(repo_queue)
+    assert ['update_repo:antergos-staging:x86_64:1'] == repo_queue.job_ids
+
+    # The update job deletes the pending key when it starts, later requests need a new job.
+    redis_db.delete(repo._update_pending_key)
+
+    assert 3 == repo.request_update(repo_queue)
+    assert 4 == repo.request_update(repo_queue)
+    assert [
+        'update_repo:antergos-staging:x86_64:1', 'update_repo:antergos-staging:x86_64:3'
+    ] == repo_queue.job_ids
+
+
+def test_wait_for_update(repo):
+    repo.update_completed = 2
+    repo.update_succeeded = 2
+
+    assert repo.wait_for_update(1, timeout=1)
+    assert repo.wait_for_update(2, timeout=1)
+
+
+def test_wait_for_failed_update(repo):
+    repo.update_completed = 3
+    repo.update_succeeded = 2
+
+    assert not repo.wait_for_update(3, timeout=1)
+
+
+def test_wait_for_update_timeout(repo):
+    repo.update_completed = 1
+
+    assert not repo.wait_for_update(2, timeout=0)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+#
+#  test_vercmp.py
+#
+#  Copyright © 2017 Antergos
+#
+#  This file is part of The Antergos Build Server, (AntBS).
+#
+#  AntBS is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  AntBS is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  The following additional terms are in effect as per Section 7 of the license:
+#
+#  The preservation of all legal notices and author attributions in
+#  the material or in the Appropriate Legal Notices displayed
+#  by works containing it is required.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with AntBS; If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from utils import vercmp
+
+# The cases from pacman's test/util/vercmptest.sh
+PACMAN_CASES = [
+    # all similar length, no pkgrel
+    ('1.5.0', '1.5.0', 0),
+    ('1.5.1', '1.5.0', 1),
+    # mixed length
+    ('1.5.1', '1.5', 1),
+    # with pkgrel, simple
+    ('1.5.0-1', '1.5.0-1', 0),
+    ('1.5.0-1', '1.5.0-2', -1),
+    ('1.5.0-1', '1.5.1-1', -1),
+    ('1.5.0-2', '1.5.1-1', -1),
+    # with pkgrel, mixed lengths
+    ('1.5-1', '1.5.1-1', -1),
+    ('1.5-2', '1.5.1-1', -1),
+    ('1.5-2', '1.5.1-2', -1),
+    # mixed pkgrel inclusion
+    ('1.5', '1.5-1', 0),
+    ('1.5-1', '1.5', 0),
+    ('1.1-1', '1.1', 0),
+    ('1.0-1', '1.1', -1),
+    ('1.1-1', '1.0', 1),
+    # alphanumeric versions
+    ('1.5b-1', '1.5-1', -1),
+    ('1.5b', '1.5', -1),
+    ('1.5b-1', '1.5', -1),
+    ('1.5b', '1.5.1', -1),
+    # from the manpage
+    ('1.0a', '1.0alpha', -1),
+    ('1.0alpha', '1.0b', -1),
+    ('1.0b', '1.0beta', -1),
+    ('1.0beta', '1.0rc', -1),
+    ('1.0rc', '1.0', -1),
+    # going crazy? alpha-dotted versions
+    ('1.5.a', '1.5', 1),
+    ('1.5.b', '1.5.a', 1),
+    ('1.5.1', '1.5.b', 1),
+    # alpha dots and dashes
+    ('1.5.b-1', '1.5.b', 0),
+    ('1.5-1', '1.5.b', -1),
+    # same/similar content, differing separators
+    ('2.0', '2_0', 0),
+    ('2.0_a', '2_0.a', 0),
+    ('2.0a', '2.0.a', -1),
+    ('2___a', '2_a', 1),
+    # epoch included version comparisons
+    ('0:1.0', '0:1.0', 0),
+    ('0:1.0', '0:1.1', -1),
+    ('1:1.0', '0:1.0', 1),
+    ('1:1.0', '0:1.1', 1),
+    ('1:1.0', '2:1.1', -1),
+    # epoch + sometimes present pkgrel
+    ('1:1.0', '0:1.0-1', 1),
+    ('1:1.0-1', '0:1.1-1', 1),
+    # epoch included on one version
+    ('0:1.0', '1.0', 0),
+    ('0:1.1', '1.0', 1),
+    ('0:1.1', '1.1', 0),
+    ('1.1', '0:1.1', 0),
+    ('1:1.1', '1.1', 1),
+    ('1.1', '1:1.1', -1),
+]
+
+
+@pytest.mark.parametrize('version1, version2, expected', PACMAN_CASES)
+def test_vercmp(version1, version2, expected):
+    assert expected == vercmp(version1, version2)
+    assert -expected == vercmp(version2, version1)